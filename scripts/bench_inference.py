@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config import FINBERT_MODEL_PATH  # noqa: E402
+from src.inference_runtime import (  # noqa: E402
+    ModelRuntime,
+    available_cpus,
+    configure_torch,
+)
+
+SAMPLES = [
+    "Apple reports record quarterly revenue driven by iPhone and services growth.",
+    "Tesla shares fall after deliveries miss analyst expectations for the quarter.",
+    "Vinamilk công bố lợi nhuận quý 3 tăng mạnh nhờ chi phí nguyên liệu giảm.",
+    "FPT ký hợp đồng chuyển đổi số trị giá 100 triệu USD với đối tác Nhật Bản.",
+    "NVIDIA raises guidance as data center demand for AI accelerators surges.",
+    "Ngân hàng Nhà nước giữ nguyên lãi suất điều hành trong tháng này.",
+    "Microsoft cloud revenue beats estimates; Azure growth accelerates.",
+    "Hòa Phát ghi nhận sản lượng thép tiêu thụ giảm do thị trường bất động sản trầm lắng.",
+]
+
+
+def default_sweep(cpus: List[int]) -> List[int]:
+    sweep, n = [], 1
+    while n < len(cpus):
+        sweep.append(n)
+        n *= 2
+    return sweep + [len(cpus)]
+
+
+def measure(
+    runtime: ModelRuntime, fn: Callable[[List[str]], object], texts: List[str], rounds: int
+) -> Dict[str, float]:
+    runtime.call(fn, texts)  # warm-up (cấp phát OpenMP pool, cache tokenizer)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        runtime.call(fn, texts)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "texts_per_s": rounds * len(texts) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def print_row(label: str, result: Dict[str, float]) -> None:
+    print(
+        f"{label:<28} {result['texts_per_s']:>10.1f} texts/s"
+        f" {result['p50_ms']:>9.1f} ms p50 {result['p95_ms']:>9.1f} ms p95"
+    )
+
+
+def load_models(which: str) -> Dict[str, Callable[[List[str]], object]]:
+    models: Dict[str, Callable[[List[str]], object]] = {}
+    if which in ("embedding", "both"):
+        from src.embedding_service import EmbeddingService
+
+        embed = EmbeddingService()
+        models["embedding"] = lambda texts: embed.model.encode(texts, normalize_embeddings=True)
+    if which in ("sentiment", "both"):
+        if FINBERT_MODEL_PATH.exists():
+            from src.sentiment_service import SentimentService
+
+            sentiment = SentimentService()
+            models["sentiment"] = sentiment._analyze
+        else:
+            print(f"⚠️  FinBERT model not found at {FINBERT_MODEL_PATH}; skipping sentiment.")
+    return models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Sweep torch thread / core settings and print throughput and latency per model."
+    )
+    parser.add_argument("--model", choices=["embedding", "sentiment", "both"], default="both")
+    parser.add_argument("--threads", default="", help="Comma list of thread counts (default: 1,2,4..cores).")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Also run both models at once: shared cores vs. split core sets.",
+    )
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    print(f"CPUs available: {len(cpus)} · torch: {configure_torch()}")
+    sweep = [int(t) for t in args.threads.split(",") if t] or default_sweep(cpus)
+    texts = (SAMPLES * (args.batch_size // len(SAMPLES) + 1))[: args.batch_size]
+    models = load_models(args.model)
+
+    for name, fn in models.items():
+        print(f"\n== {name} (batch {len(texts)}) ==")
+        for threads in sweep:
+            runtime = ModelRuntime(name, threads)
+            print_row(f"{threads} threads", measure(runtime, fn, texts, args.rounds))
+            runtime.shutdown()
+
+    if args.concurrent and len(models) == 2:
+        half = max(1, len(cpus) // 2)
+        layouts = {
+            f"shared, {len(cpus)} threads each": (
+                {"threads": len(cpus), "cores": None},
+                {"threads": len(cpus), "cores": None},
+            ),
+            f"split, {half}+{len(cpus) - half} pinned": (
+                {"threads": half, "cores": cpus[:half]},
+                {"threads": max(1, len(cpus) - half), "cores": cpus[half:] or cpus[:half]},
+            ),
+        }
+        print("\n== embedding + sentiment concurrently ==")
+        for label, specs in layouts.items():
+            results: Dict[str, Dict[str, float]] = {}
+            runtimes = [ModelRuntime(name, **spec) for name, spec in zip(models, specs)]
+
+            def run(runtime: ModelRuntime, fn: Callable[[List[str]], object]) -> None:
+                results[runtime.name] = measure(runtime, fn, texts, args.rounds)
+
+            threads = [
+                threading.Thread(target=run, args=(rt, fn)) for rt, fn in zip(runtimes, models.values())
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for runtime in runtimes:
+                print_row(f"{label} · {runtime.name}", results[runtime.name])
+                runtime.shutdown()
+
+
+if __name__ == "__main__":
+    main()
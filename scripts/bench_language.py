@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from langdetect import detect  # noqa: E402
+
+from src.agents import language_agent  # noqa: E402
+from src.agents.language_agent import LanguageAgent  # noqa: E402
+
+SAMPLES = [
+    ("vi", "Tin tức mới nhất về cổ phiếu Apple tuần này"),
+    ("vi", "Phân tích tâm lý thị trường của Vinamilk quý 3"),
+    ("vi", "Giá cổ phiếu FPT hôm nay thế nào?"),
+    ("vi", "tom tat tin tuc ve co phieu HPG"),
+    ("vi", "Tesla có kết quả kinh doanh ra sao?"),
+    ("en", "What is the latest news about Tesla?"),
+    ("en", "Summarize market sentiment for NVDA this week"),
+    ("en", "How did Apple stock react to earnings?"),
+    ("en", "Give me an analysis of Microsoft shares"),
+    ("en", "Amazon Q2 revenue guidance"),
+]
+
+
+def baseline_detect(text: str) -> str:
+    """Cách cũ: gọi langdetect cho mọi message."""
+    try:
+        lang = detect(text.strip())
+    except Exception:
+        return "en"
+    return "vi" if lang.startswith("vi") else "en"
+
+
+def bench(name: str, fn: Callable[[str], str], texts: List[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            fn(text)
+    per_call = (time.perf_counter() - start) / (rounds * len(texts)) * 1e6
+    print(f"{name:<22} {per_call:>10.1f} µs/call")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark LanguageAgent.detect.")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    texts = [text for _, text in SAMPLES]
+    agent = LanguageAgent()
+
+    baseline = bench("langdetect (old)", baseline_detect, texts, args.rounds)
+
+    def uncached(text: str) -> str:
+        language_agent._detect_cached.cache_clear()
+        return agent.detect(text)
+
+    bench("heuristic, cold cache", uncached, texts, args.rounds)
+    agent = LanguageAgent()
+    cached = bench("heuristic, warm cache", agent.detect, texts, args.rounds)
+
+    correct_old = sum(baseline_detect(t) == lang for lang, t in SAMPLES)
+    correct_new = sum(agent.detect(t) == lang for lang, t in SAMPLES)
+    print(f"\nAccuracy on samples: old {correct_old}/{len(SAMPLES)}, new {correct_new}/{len(SAMPLES)}")
+    print(f"Speedup (warm): {baseline / cached:.0f}x · stats: {agent.stats()}")
+
+
+if __name__ == "__main__":
+    main()
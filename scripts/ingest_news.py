@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config import FINBERT_MODEL_PATH, NEWS_ARTIFACTS_DIR, NEWS_RAW_DIR  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Stream raw news files (JSON array / JSONL), validate, dedupe, embed and "
+            "score sentiment, then write memory-mappable index artifacts."
+        )
+    )
+    parser.add_argument(
+        "--input-dir",
+        default=str(NEWS_RAW_DIR),
+        help="Directory containing raw *.json / *.jsonl / *.ndjson files.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(NEWS_ARTIFACTS_DIR),
+        help=(
+            "Destination directory for news.idx (metadata + vectors) and, when "
+            "FinBERT runs, sentiment_series.npz."
+        ),
+    )
+    parser.add_argument("--batch-size", type=int, default=64, help="Articles per embed/FinBERT batch.")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=4,
+        help="Max batches buffered between pipeline stages.",
+    )
+    parser.add_argument(
+        "--no-sentiment",
+        action="store_true",
+        help="Skip precomputing FinBERT sentiment.",
+    )
+    args = parser.parse_args()
+
+    from src.embedding_service import EmbeddingService
+    from src.news_ingest import ingest_news
+
+    sentiment_service = None
+    if not args.no_sentiment:
+        if FINBERT_MODEL_PATH.exists():
+            from src.sentiment_service import SentimentService
+
+            sentiment_service = SentimentService()
+        else:
+            print(f"⚠️  FinBERT model not found at {FINBERT_MODEL_PATH}; skipping sentiment.")
+
+    stats = ingest_news(
+        EmbeddingService(),
+        sentiment_service,
+        raw_dir=args.input_dir,
+        output_dir=args.output_dir,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+    )
+    print(json.dumps(stats.to_dict(), ensure_ascii=False, indent=2))
+    print(
+        f"✅ Đã ingest {stats.written} bài từ {stats.files} file "
+        f"({stats.duplicates} trùng, {stats.rejected} lỗi) vào {args.output_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
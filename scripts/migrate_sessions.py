@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.session_store_sqlite import SqliteSessionStore  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Migrate sessions.json into the SQLite (WAL) session store."
+    )
+    parser.add_argument(
+        "--input",
+        default="sessions/sessions.json",
+        help="Path to the legacy JSON session file.",
+    )
+    parser.add_argument(
+        "--output",
+        default="sessions/sessions.sqlite3",
+        help="Destination SQLite database path.",
+    )
+    args = parser.parse_args()
+
+    store = SqliteSessionStore(Path(args.output))
+    try:
+        count = store.import_json(Path(args.input))
+    finally:
+        store.close()
+    print(f"✅ Đã migrate {count} session vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+TICKER_RE = re.compile(r"^\$?[A-Za-z0-9]{1,5}$")
+TICKER_TEMPLATES = {
+    "vi": "Tóm tắt tin tức và tâm lý thị trường gần đây của {ticker}",
+    "en": "Summarize recent news and market sentiment for {ticker}",
+}
+
+
+def read_questions(path: Path, lang: str) -> List[str]:
+    """Mỗi dòng là một câu hỏi hoặc một ticker (ticker → câu hỏi mẫu)."""
+    questions: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if TICKER_RE.match(line):
+                ticker = line.lstrip("$").upper()
+                line = TICKER_TEMPLATES[lang].format(ticker=ticker)
+            questions.append(line)
+    return questions
+
+
+async def run(questions: List[str], output: Path, concurrency: int) -> int:
+    from src.app import init_dependencies
+
+    orchestrator = init_dependencies()["orchestrator"]
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    errors = 0
+    with output.open("w", encoding="utf-8") as f:
+        async for result in orchestrator.handle_many(
+            questions, concurrency=concurrency
+        ):
+            if result["error"]:
+                errors += 1
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run the orchestrator over a file of questions/tickers and stream JSONL results."
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        help="Text file: one question or ticker per line.",
+    )
+    parser.add_argument(
+        "--output",
+        default="reports/batch_report.jsonl",
+        help="Destination JSONL file path.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Max concurrent LLM requests (extraction + summary).",
+    )
+    parser.add_argument(
+        "--lang",
+        choices=sorted(TICKER_TEMPLATES),
+        default="vi",
+        help="Language of the question template used for bare tickers.",
+    )
+    args = parser.parse_args()
+
+    questions = read_questions(Path(args.input), args.lang)
+    if not questions:
+        print("Không có câu hỏi nào trong file input.")
+        return
+
+    start = time.perf_counter()
+    errors = asyncio.run(run(questions, Path(args.output), args.concurrency))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"✅ Đã xử lý {len(questions)} câu hỏi ({errors} lỗi) trong {elapsed:.1f}s "
+        f"— {len(questions) / elapsed:.2f} câu/s. Kết quả: {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Tên công ty phổ biến → ticker. Alias được so khớp sau khi bỏ dấu + lowercase.
+DEFAULT_COMPANY_ALIASES: Dict[str, Sequence[str]] = {
+    "TSLA": ("tesla", "tesla motors"),
+    "AAPL": ("apple", "iphone maker"),
+    "MSFT": ("microsoft",),
+    "AMZN": ("amazon", "aws", "amazon web services"),
+    "GOOGL": ("google", "alphabet"),
+    "META": ("facebook", "meta platforms"),
+    "NVDA": ("nvidia",),
+    "NFLX": ("netflix",),
+    "INTC": ("intel",),
+    "BYDDY": ("byd",),
+    "VNM": ("vinamilk",),
+    "VIC": ("vingroup",),
+    "VHM": ("vinhomes",),
+    "VCB": ("vietcombank",),
+    "HPG": ("hoa phat",),
+    "FPT": ("fpt",),
+    "MWG": ("the gioi di dong",),
+}
+
+_UNITS = {
+    "ngay": "day", "day": "day", "days": "day", "d": "day",
+    "tuan": "week", "week": "week", "weeks": "week", "w": "week",
+    "thang": "month", "month": "month", "months": "month", "mo": "month",
+    "quy": "quarter", "quarter": "quarter", "quarters": "quarter",
+    "nam": "year", "year": "year", "years": "year", "yr": "year", "y": "year",
+}
+_NUMBER_WORDS = {
+    "mot": 1, "one": 1, "hai": 2, "two": 2, "ba": 3, "three": 3,
+    "bon": 4, "four": 4, "nam": 5, "five": 5, "sau": 6, "six": 6,
+    "chin": 9, "nine": 9, "muoi hai": 12, "twelve": 12,
+}
+_RELATIVE_RE = re.compile(
+    r"\b(\d{1,3}|" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")\s*"
+    r"(" + "|".join(sorted(_UNITS, key=len, reverse=True)) + r")\b"
+)
+_QUARTER_RE = re.compile(r"\b(?:q|quy)\s*([1-4])\b")
+_FIXED_PHRASES: Sequence[Tuple[str, str]] = (
+    ("year to date", "YTD"),
+    ("ytd", "YTD"),
+    ("tu dau nam", "YTD"),
+    ("nam nay", "YTD"),
+    ("this year", "YTD"),
+    ("nua nam", "6 months"),
+    ("half year", "6 months"),
+    ("nam ngoai", "1 year"),
+    ("last year", "1 year"),
+    ("thang nay", "1 month"),
+    ("this month", "1 month"),
+    ("tuan nay", "1 week"),
+    ("this week", "1 week"),
+)
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_TICKER_RE = re.compile(r"[A-Za-z][A-Za-z0-9]{0,4}")
+_SENTENCE_BREAKS = frozenset(".!?:;\n")
+# Dấu hiệu câu so sánh (trên text đã fold); "và"/"and"... chỉ tính khi nằm giữa hai tên.
+_COMPARE_CUES = ("so sanh", "compare", "comparison", "versus", "vs")
+_CONJUNCTIONS = frozenset({"va", "and", "voi", "with", "hay", "or"})
+# Từ hay viết hoa giữa câu nhưng không phải tên công ty, cộng từ vựng thời gian ("6 MONTHS").
+_NON_COMPANY_WORDS = frozenset({
+    "i", "q1", "q2", "q3", "q4", "ytd", "ceo", "cfo", "ai", "ev", "ipo", "eps",
+    "etf", "gdp", "fed", "usd", "vnd", "vn", "index", "my", "us", "eu",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+    "monday", "tuesday", "wednesday", "thursday", "friday",
+}) | frozenset(
+    word
+    for phrase in (*_UNITS, *_NUMBER_WORDS, *(p for p, _ in _FIXED_PHRASES))
+    for word in phrase.split()
+)
+
+
+def fold_text(text: str) -> str:
+    """Lowercase, bỏ dấu tiếng Việt và thay ký tự không phải chữ/số bằng space."""
+    text = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^0-9a-zA-Z]+", " ", text)
+    return " ".join(text.lower().split())
+
+
+@dataclass(slots=True)
+class ExtractionResult:
+    """Kết quả extract local; ``confident`` = đủ chắc để bỏ qua LLM."""
+
+    companies: List[str]
+    time_range: Optional[str]
+    confident: bool
+
+    @property
+    def company(self) -> Optional[str]:
+        return self.companies[0] if self.companies else None
+
+
+@dataclass(slots=True)
+class _Word:
+    """Một từ trong câu gốc cùng dạng fold và vị trí trong câu."""
+
+    raw: str
+    folded: List[str]
+    cashtag: bool
+    sentence_start: bool
+
+    @property
+    def capitalised(self) -> bool:
+        return self.raw[:1].isupper()
+
+
+def _split_words(text: str) -> List[_Word]:
+    words: List[_Word] = []
+    prev_end = 0
+    for match in _WORD_RE.finditer(text):
+        gap = text[prev_end:match.start()]
+        words.append(
+            _Word(
+                raw=match.group(),
+                folded=fold_text(match.group()).split(),
+                cashtag=gap.endswith("$"),
+                sentence_start=not words or any(ch in _SENTENCE_BREAKS for ch in gap),
+            )
+        )
+        prev_end = match.end()
+    return words
+
+
+class _TokenTrie:
+    """Trie theo token để tìm alias dài nhất tại mỗi vị trí trong câu."""
+
+    _END = "\0"
+
+    def __init__(self) -> None:
+        self.root: Dict[str, dict] = {}
+
+    def add(self, phrase: str, value: str) -> None:
+        tokens = fold_text(phrase).split()
+        if not tokens:
+            return
+        node = self.root
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        node[self._END] = value
+
+    def find_spans(self, tokens: Sequence[str]) -> List[Tuple[int, int, str]]:
+        """Các alias khớp dài nhất dạng (token đầu, token cuối + 1, ticker)."""
+        found: List[Tuple[int, int, str]] = []
+        i = 0
+        while i < len(tokens):
+            node = self.root
+            match, match_end = None, i
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if self._END in node:
+                    match, match_end = node[self._END], j
+            if match is not None:
+                found.append((i, match_end, match))
+                i = match_end
+            else:
+                i += 1
+        return found
+
+
+class LocalIntentExtractor:
+    """Rule-based ticker/time-range extractor dùng làm fast path trước LLM."""
+
+    def __init__(
+        self,
+        tickers: Iterable[str] = (),
+        aliases: Dict[str, Sequence[str]] | None = None,
+    ) -> None:
+        self.tickers = {t.strip().upper() for t in tickers if t and t.strip()}
+        self._trie = _TokenTrie()
+        for ticker, names in (aliases or DEFAULT_COMPANY_ALIASES).items():
+            for name in names:
+                self._trie.add(name, ticker.upper())
+
+        self._lock = threading.Lock()
+        self.fast_path_hits = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_news(cls, news: Iterable[object], **kwargs) -> "LocalIntentExtractor":
+        """Lấy danh sách ticker từ các bản tin đã index."""
+        tickers = {getattr(item, "ticker", None) for item in news}
+        return cls(tickers=[t for t in tickers if isinstance(t, str)], **kwargs)
+
+    def refresh_tickers(self, news: Iterable[object]) -> None:
+        """Cập nhật tập ticker sau khi index tin tức được reload."""
+        tickers = {getattr(item, "ticker", None) for item in news}
+        self.tickers = {t.upper() for t in tickers if isinstance(t, str) and t}
+
+    def extract(self, text: str) -> ExtractionResult:
+        folded = fold_text(text)
+        words = _split_words(text)
+        companies, covered = self._find_companies(words)
+        time_range = self.extract_time_range(folded)
+
+        # Chỉ bỏ qua LLM khi mọi tên công ty trong câu đều khớp ticker/alias đã
+        # biết: câu so sánh cần >= 2 ticker ("So sánh Tesla và Rivian" chỉ ra
+        # TSLA → LLM), và không còn từ viết hoa nào giữa câu chưa được giải.
+        unresolved = [
+            w.raw
+            for i, w in enumerate(words)
+            if i not in covered
+            and not w.sentence_start
+            and w.capitalised
+            and " ".join(w.folded) not in _NON_COMPANY_WORDS
+        ]
+        compare = self._is_comparison(folded, words, covered)
+        confident = bool(companies) and not unresolved and not (compare and len(companies) < 2)
+        with self._lock:
+            if confident:
+                self.fast_path_hits += 1
+            else:
+                self.fallbacks += 1
+
+        return ExtractionResult(
+            companies=companies, time_range=time_range, confident=confident
+        )
+
+    def _find_companies(self, words: Sequence[_Word]) -> Tuple[List[str], Set[int]]:
+        """Ticker theo thứ tự xuất hiện + chỉ số các từ đã khớp ticker/alias."""
+        found: List[Tuple[int, str]] = []
+        covered: Set[int] = set()
+
+        # Ticker viết hoa (TSLA) hoặc dạng cashtag ($tsla) có trong index.
+        for i, word in enumerate(words):
+            upper = word.raw.upper()
+            if (
+                _TICKER_RE.fullmatch(word.raw)
+                and upper in self.tickers
+                and (word.cashtag or word.raw.isupper())
+            ):
+                found.append((i, upper))
+                covered.add(i)
+
+        tokens: List[str] = []
+        owner: List[int] = []
+        for i, word in enumerate(words):
+            tokens.extend(word.folded)
+            owner.extend([i] * len(word.folded))
+        for start, end, ticker in self._trie.find_spans(tokens):
+            found.append((owner[start], ticker))
+            covered.update(owner[start:end])
+
+        # Giữ thứ tự xuất hiện đầu tiên, bỏ trùng.
+        found.sort(key=lambda pair: pair[0])
+        return list(dict.fromkeys(ticker for _, ticker in found)), covered
+
+    def resolve_name(self, name: str) -> Optional[str]:
+        """Ticker cho một tên công ty / ticker (vd. LLM trả "Tesla", "Apple Inc."); None nếu không biết."""
+        upper = name.strip().lstrip("$").upper()
+        if upper in self.tickers:
+            return upper
+        spans = self._trie.find_spans(fold_text(name).split())
+        return spans[0][2] if spans else None
+
+    @staticmethod
+    def _is_comparison(folded: str, words: Sequence[_Word], covered: Set[int]) -> bool:
+        padded = f" {folded} "
+        if any(f" {cue} " in padded for cue in _COMPARE_CUES):
+            return True
+
+        def is_name(i: int) -> bool:
+            return 0 <= i < len(words) and (i in covered or words[i].capitalised)
+
+        return any(
+            " ".join(w.folded) in _CONJUNCTIONS and is_name(i - 1) and is_name(i + 1)
+            for i, w in enumerate(words)
+        )
+
+    @staticmethod
+    def extract_time_range(folded: str) -> Optional[str]:
+        """Nhận diện cụm thời gian phổ biến (vi/en) trên text đã fold."""
+        quarter = _QUARTER_RE.search(folded)
+        if quarter:
+            return f"Q{quarter.group(1)}"
+
+        relative = _RELATIVE_RE.search(folded)
+        if relative:
+            raw_n, raw_unit = relative.groups()
+            n = int(raw_n) if raw_n.isdigit() else _NUMBER_WORDS[raw_n]
+            unit = _UNITS[raw_unit]
+            if n > 0:
+                return f"{n} {unit}" + ("s" if n > 1 else "")
+
+        padded = f" {folded} "
+        for phrase, value in _FIXED_PHRASES:
+            if f" {phrase} " in padded:
+                return value
+
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, fallbacks = self.fast_path_hits, self.fallbacks
+        total = hits + fallbacks
+        return {
+            "fast_path_hits": hits,
+            "llm_fallbacks": fallbacks,
+            "fast_path_rate": (hits / total) if total else 0.0,
+        }
@@ -1,23 +1,120 @@
 from __future__ import annotations
 
-from langdetect import detect
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Optional
+
+from langdetect import DetectorFactory, detect
+
+# langdetect là thuật toán xác suất; seed cố định để cùng input → cùng output.
+DetectorFactory.seed = 0
+
+# Chữ chỉ có trong tiếng Việt (ă â đ ê ô ơ ư và dấu nặng/hỏi/ngã).
+VI_ONLY_CHARS = frozenset(
+    "ăâđêôơư"
+    "ạảãặẳẵậẩẫẹẻẽệểễịỉĩọỏõộổỗợởỡụủũựửữỵỷỹ"
+    "ằắầấềếồốờớừứỳ"
+)
+# Dấu có cả trong tiếng Việt lẫn từ mượn tiếng Anh/Pháp (café, résumé...).
+SHARED_ACCENT_CHARS = frozenset("àáèéìíòóùúý")
+EN_STOPWORDS = frozenset(
+    "the a an and or of to in on for with about what how why is are was were "
+    "news latest recent stock stocks price market sentiment summarize summary "
+    "tell me show give analyze analysis company share shares this that".split()
+)
+VI_ASCII_STOPWORDS = frozenset(
+    "cua va cho ve tin tuc gia co phieu thi truong hom nay nhu the nao "
+    "phan tich tom tat cong ty khong duoc nhung".split()
+)
+
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+MAX_DETECT_CHARS = 512
+LANGUAGE_CACHE_SIZE = 4096
+
+
+def heuristic_language(text: str) -> Optional[str]:
+    """
+    Đoán vi/en bằng bộ ký tự, không cần model.
+
+    Returns:
+        "vi" / "en" nếu chắc chắn, None nếu mơ hồ (cần fallback langdetect)
+    """
+    lowered = unicodedata.normalize("NFC", text).lower()
+    words = _WORD_RE.findall(lowered)
+    if not words:
+        return "en"
+
+    letters = vi_only = shared = non_latin = 0
+    for ch in lowered:
+        if not ch.isalpha():
+            continue
+        letters += 1
+        if ch in VI_ONLY_CHARS:
+            vi_only += 1
+        elif ch in SHARED_ACCENT_CHARS:
+            shared += 1
+        elif not ("a" <= ch <= "z"):
+            non_latin += 1
+
+    if vi_only:
+        return "vi"
+    if non_latin > letters // 2:
+        return "en"  # chữ không phải Latin: ngoài phạm vi vi/en
+
+    en_hits = sum(1 for w in words if w in EN_STOPWORDS)
+    vi_hits = sum(1 for w in words if w in VI_ASCII_STOPWORDS)
+    if shared and shared * 10 >= letters and en_hits == 0:
+        return "vi"
+    if en_hits and en_hits >= 2 * vi_hits:
+        return "en"
+    if vi_hits and vi_hits >= 2 * en_hits and not shared:
+        return "vi"
+    return None
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def _detect_cached(text: str) -> tuple[str, bool]:
+    """Trả về (lang, fast_path)."""
+    lang = heuristic_language(text)
+    if lang is not None:
+        return lang, True
+    try:
+        detected = detect(text)
+    except Exception:
+        return "en", False
+    return ("vi" if detected.startswith("vi") else "en"), False
 
 
 class LanguageAgent:
     """Simple language detection helper with user preference override."""
 
+    def __init__(self) -> None:
+        self._fast_path_hits = 0
+        self._fallbacks = 0
+
     def detect(self, text: str, user_preference: str | None = None) -> str:
         if user_preference in {"vi", "en"}:
             return user_preference
 
-        text = text.strip()
+        text = " ".join(text.split())[:MAX_DETECT_CHARS]
         if not text:
             return "en"
 
-        try:
-            lang = detect(text)
-        except Exception:
-            return "en"
-
-        return "vi" if lang.startswith("vi") else "en"
+        lang, fast_path = _detect_cached(text)
+        if fast_path:
+            self._fast_path_hits += 1
+        else:
+            self._fallbacks += 1
+        return lang
 
+    def stats(self) -> Dict[str, float]:
+        total = self._fast_path_hits + self._fallbacks
+        cache = _detect_cached.cache_info()
+        return {
+            "fast_path_hits": self._fast_path_hits,
+            "langdetect_fallbacks": self._fallbacks,
+            "fast_path_rate": self._fast_path_hits / total if total else 0.0,
+            "cache_hits": cache.hits,
+            "cache_size": cache.currsize,
+        }
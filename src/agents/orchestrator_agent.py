@@ -2,14 +2,156 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, Dict, Tuple
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
+import requests
+
+from src.agents.intent_extractor import LocalIntentExtractor
 from src.agents.language_agent import LanguageAgent
 from src.agents.retrieval_agent import RetrievalAgent
-from src.agents.summarizer_agent import SummarizerAgent
+from src.agents.summarizer_agent import FallbackSummary, SummarizerAgent
+from src.config import (
+    LLM_MODEL_NAME,
+    LLM_TEMPERATURE,
+    RAG_SPECULATIVE_CACHE_GRACE,
+    RAG_SPECULATIVE_FACTOR,
+    REQUEST_DEADLINE,
+    SUMMARY_MIN_BUDGET,
+)
 from src.llm_client import call_llm
+from src.rag_news import NewsItem
+from src.response_cache import ResponseCache, make_key, make_llm_key, normalize_text
+from src.sentiment_series import SentimentTrend
 from src.sentiment_service import SentimentService
 from src.session_store import SessionStore
+from src.utils.deadline import Deadline
+from src.utils.logging_utils import count, span
+from src.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Phần thời gian còn lại (sau khi chừa SUMMARY_MIN_BUDGET) dành cho từng stage
+EXTRACT_BUDGET_FRACTION = 0.3
+SENTIMENT_BUDGET_FRACTION = 0.5
+# Dưới ngưỡng này thì không gọi LLM extraction nữa, chỉ dùng fast path local
+EXTRACT_MIN_BUDGET = 1.0
+SENTIMENT_CACHE_SIZE = 4096
+# Câu so sánh: tối đa số ticker fan-out, và số tin tối thiểu cho mỗi ticker
+MAX_COMPARE_TICKERS = 4
+COMPARE_MIN_PER_TICKER = 2
+
+
+async def _timed(
+    stage: str,
+    awaitable: Awaitable[T],
+    timings: Dict[str, float] | None = None,
+) -> T:
+    """Await ``awaitable`` bên trong span của stage; ghi thời gian (ms) vào ``timings``."""
+    start = time.perf_counter()
+    try:
+        with span("orchestrator_stage", stage=stage):
+            return await awaitable
+    finally:
+        if timings is not None:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+@dataclass(slots=True)
+class ArticleResult:
+    """Một bản tin đã dùng để trả lời, kèm similarity và sentiment FinBERT."""
+
+    item: NewsItem
+    score: float | None
+    sentiment: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.item.id,
+            "title": self.item.title,
+            "content": self.item.content,
+            "date": self.item.date,
+            "ticker": self.item.ticker,
+            "score": self.score,
+            "sentiment": {
+                "label": self.sentiment.get("label"),
+                "score": self.sentiment.get("score"),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ArticleResult":
+        item = NewsItem(
+            id=data["id"],
+            title=data["title"],
+            content=data["content"],
+            date=data["date"],
+            ticker=data["ticker"],
+        )
+        return cls(item=item, score=data.get("score"), sentiment=data.get("sentiment") or {})
+
+
+@dataclass(slots=True)
+class OrchestratorResult:
+    """Kết quả có cấu trúc của một lượt hỏi: summary + mọi thứ đã dùng để tạo ra nó."""
+
+    summary: str
+    language: str
+    company: str | None = None
+    ticker: str | None = None
+    tickers: List[str] = field(default_factory=list)  # > 1 phần tử = câu so sánh
+    time_range: str | None = None
+    articles: List[ArticleResult] = field(default_factory=list)
+    trends: List[Dict[str, Any]] = field(default_factory=list)  # SentimentTrend.to_dict()
+    timings: Dict[str, float] = field(default_factory=dict)
+    cached: bool = False
+    degraded: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "summary": str(self.summary),
+            "language": self.language,
+            "company": self.company,
+            "ticker": self.ticker,
+            "tickers": list(self.tickers),
+            "time_range": self.time_range,
+            "articles": [a.to_dict() for a in self.articles],
+            "trends": list(self.trends),
+            "timings": dict(self.timings),
+            "cached": self.cached,
+            "degraded": self.degraded,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OrchestratorResult":
+        return cls(
+            summary=data["summary"],
+            language=data["language"],
+            company=data.get("company"),
+            ticker=data.get("ticker"),
+            tickers=list(data.get("tickers") or []),
+            time_range=data.get("time_range"),
+            articles=[ArticleResult.from_dict(a) for a in data.get("articles", [])],
+            trends=list(data.get("trends") or []),
+            timings=dict(data.get("timings", {})),
+            cached=bool(data.get("cached", False)),
+            degraded=bool(data.get("degraded", False)),
+        )
 
 
 class OrchestratorAgent:
@@ -22,61 +164,629 @@ class OrchestratorAgent:
         retrieval_agent: RetrievalAgent,
         summarizer_agent: SummarizerAgent,
         sentiment_service: SentimentService,
+        llm_cache: ResponseCache | None = None,
+        singleflight: SingleFlight | None = None,
+        intent_extractor: LocalIntentExtractor | None = None,
+        answer_cache: ResponseCache | None = None,
     ) -> None:
         self.session_store = session_store
         self.language_agent = language_agent
         self.retrieval_agent = retrieval_agent
         self.summarizer_agent = summarizer_agent
         self.sentiment_service = sentiment_service
+        self.llm_cache = llm_cache
+        # Gộp các extraction/retrieval giống hệt nhau đang chạy song song.
+        self.singleflight = singleflight or SingleFlight()
+        self.intent_extractor = intent_extractor
+        self.answer_cache = answer_cache
+        # Sentiment theo article id, dùng khi hết thời gian chạy FinBERT.
+        self._sentiment_cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._sentiment_lock = threading.Lock()
 
-    async def handle(self, session_id: str, user_message: str) -> str:
-        session = self.session_store.get_session(session_id)
-        lang = self.language_agent.detect(
-            user_message, session.get("preferences", {}).get("language")
-            if isinstance(session, dict)
-            else None
-        )
+    async def handle(
+        self,
+        session_id: str,
+        user_message: str,
+        deadline: Deadline | float | None = None,
+    ) -> str:
+        """
+        Trả lời một câu hỏi trong giới hạn deadline end-to-end.
 
-        company, time_range = await self._extract_company_and_range(user_message)
+        Args:
+            session_id: ID phiên hội thoại
+            user_message: Câu hỏi của người dùng
+            deadline: ``Deadline`` hoặc số giây (mặc định REQUEST_DEADLINE)
+        """
+        result = await self.handle_detailed(session_id, user_message, deadline)
+        return result.summary
 
-        query_for_rag = (
-            user_message if not company else f"{company} {user_message}"
+    async def handle_detailed(
+        self,
+        session_id: str,
+        user_message: str,
+        deadline: Deadline | float | None = None,
+        ticker: str | None = None,
+    ) -> OrchestratorResult:
+        """
+        Như `handle` nhưng trả về `OrchestratorResult` (tin đã dùng, score,
+        sentiment, thời gian từng stage) để UI render mà không chạy lại RAG.
+
+        Args:
+            ticker: Ticker do người dùng chỉ định, ưu tiên hơn ticker extract được
+        """
+        if not isinstance(deadline, Deadline):
+            deadline = Deadline.after(
+                REQUEST_DEADLINE if deadline is None else deadline
+            )
+        start = time.perf_counter()
+        with span("orchestrator_handle"):
+            result = await self._handle(session_id, user_message, deadline, ticker)
+        result.timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    async def _handle(
+        self,
+        session_id: str,
+        user_message: str,
+        deadline: Deadline,
+        ticker_override: str | None = None,
+    ) -> OrchestratorResult:
+        top_k = 5
+        timings: Dict[str, float] = {}
+
+        # Các stage độc lập chạy song song: session/lang, extraction, và
+        # retrieval đầu cơ trên câu hỏi gốc (không chờ LLM trả ticker).
+        extract_budget = deadline.budget(
+            EXTRACT_BUDGET_FRACTION, reserve=SUMMARY_MIN_BUDGET
         )
-        ticker_filter = self._normalize_ticker(company)
-        news = self.retrieval_agent.get_relevant_news(
-            query_for_rag, ticker=ticker_filter, top_k=5
+        extract_task = asyncio.create_task(
+            _timed(
+                "extract",
+                self._extract_companies_and_range(
+                    user_message, deadline=deadline.child(extract_budget)
+                ),
+                timings,
+            )
+        )
+        cache_checked = asyncio.Event()
+        if self.answer_cache is None:
+            cache_checked.set()
+        speculative_task = asyncio.create_task(
+            self._speculative_retrieve(user_message, top_k, cache_checked, timings)
+        )
+        try:
+            session = await _timed(
+                "session_load",
+                asyncio.to_thread(self.session_store.get_session, session_id),
+                timings,
+            )
+            preference = (
+                session.get("preferences", {}).get("language")
+                if isinstance(session, dict)
+                else None
+            )
+            lang = await _timed(
+                "language",
+                asyncio.to_thread(
+                    self.language_agent.detect, user_message, preference
+                ),
+                timings,
+            )
+
+            degraded = False
+            try:
+                companies, time_range = await asyncio.wait_for(
+                    extract_task, timeout=extract_budget
+                )
+            except asyncio.TimeoutError:
+                count("orchestrator_degraded", stage="extract")
+                companies, time_range = [], None
+                degraded = True
+            if self._normalize_ticker(ticker_override):
+                companies = [self._normalize_ticker(ticker_override)]
+            company = companies[0] if companies else None
+            tickers = self._compare_tickers(companies)
+
+            answer_key = None
+            cached = None
+            if self.answer_cache is not None:
+                answer_key = self._answer_key(user_message, companies, time_range, lang)
+                cached = await asyncio.to_thread(self.answer_cache.get, answer_key)
+            if cached is None:
+                cache_checked.set()
+            else:
+                speculative_task.cancel()  # đã có câu trả lời, không cần tin
+
+            scored: List[Tuple[NewsItem, float]] = []
+            if cached is None:
+                try:
+                    scored = await _timed(
+                        "retrieve_refine",
+                        asyncio.wait_for(
+                            (
+                                self._refine_retrieval_many(
+                                    speculative_task, user_message, tickers, top_k
+                                )
+                                if len(tickers) > 1
+                                else self._refine_retrieval(
+                                    speculative_task, user_message, company, top_k
+                                )
+                            ),
+                            # Không chừa phần cho summary: thiếu tin thì summary
+                            # template cũng vô nghĩa, còn template thì tốn ~0s.
+                            timeout=deadline.remaining(),
+                        ),
+                        timings,
+                    )
+                except asyncio.TimeoutError:
+                    count("orchestrator_degraded", stage="retrieve")
+                    degraded = True
+        finally:
+            for task in (extract_task, speculative_task):
+                if not task.done():
+                    task.cancel()
+
+        if cached is not None:
+            result = OrchestratorResult.from_dict(json.loads(cached))
+            result.cached = True
+            result.timings = timings
+        else:
+            news = [item for item, _ in scored]
+            trends = self._sentiment_trends(
+                tickers or companies[:1], time_range, timings
+            )
+            sentiments, summary, summary_degraded = await self._summarize_within(
+                news, lang, deadline, timings, trends, tickers
+            )
+            result = OrchestratorResult(
+                summary=str(summary),
+                language=lang,
+                company=company,
+                ticker=self._normalize_ticker(company),
+                tickers=tickers,
+                time_range=time_range,
+                articles=[
+                    ArticleResult(item=item, score=score, sentiment=sentiment)
+                    for (item, score), sentiment in zip(scored, sentiments)
+                ],
+                trends=[t.to_dict() for t in trends],
+                timings=timings,
+                degraded=degraded or summary_degraded,
+            )
+            if answer_key is not None and not result.degraded:
+                payload = json.dumps(result.to_dict(), ensure_ascii=False)
+                await asyncio.to_thread(self.answer_cache.set, answer_key, payload)
+
+        await _timed(
+            "session_save",
+            asyncio.to_thread(
+                self.session_store.update_session,
+                session_id=session_id,
+                user_msg=user_message,
+                assistant_msg=result.summary,
+                summary=result.summary,
+            ),
+            timings,
         )
 
+        return result
+
+    async def _summarize_within(
+        self,
+        news: List[NewsItem],
+        lang: str,
+        deadline: Deadline,
+        timings: Dict[str, float] | None = None,
+        trends: Sequence[SentimentTrend] = (),
+        compare: Sequence[str] = (),
+    ) -> Tuple[List[dict], str, bool]:
+        """Sentiment + summary trong deadline; trả về (sentiments, summary, degraded).
+
+        Câu so sánh đưa tin của mọi ticker vào cùng một batch FinBERT và một prompt.
+        """
         sentiments = (
-            self.sentiment_service.analyze([n.content for n in news])
+            await _timed(
+                "sentiment",
+                self._score_sentiment(
+                    news,
+                    deadline.budget(
+                        SENTIMENT_BUDGET_FRACTION, reserve=SUMMARY_MIN_BUDGET
+                    ),
+                ),
+                timings,
+            )
             if news
             else []
         )
+        degraded = any(not s for s in sentiments)
+
+        try:
+            summary = await _timed(
+                "summarize",
+                asyncio.wait_for(
+                    self.summarizer_agent.summarize_news_and_sentiment(
+                        news,
+                        sentiments,
+                        lang,
+                        deadline=deadline,
+                        trends=trends,
+                        compare=compare,
+                    ),
+                    timeout=deadline.remaining(),
+                ),
+                timings,
+            )
+        except asyncio.TimeoutError:
+            count("orchestrator_degraded", stage="summarize")
+            summary = self.summarizer_agent.fallback_summary(
+                news, sentiments, lang, trends=trends, compare=compare
+            )
+
+        return sentiments, summary, degraded or isinstance(summary, FallbackSummary)
+
+    def _sentiment_trends(
+        self,
+        companies: Sequence[str | None],
+        time_range: str | None,
+        timings: Dict[str, float] | None = None,
+    ) -> List[SentimentTrend]:
+        """Xu hướng sentiment tính sẵn lúc ingest (vài binary search, không gọi FinBERT)."""
+        tickers = [t for t in map(self._normalize_ticker, companies) if t]
+        lookup = getattr(self.retrieval_agent, "sentiment_trend", None)
+        if not tickers or not callable(lookup):
+            return []
+        start = time.perf_counter()
+        trends: List[SentimentTrend] = []
+        try:
+            with span("orchestrator_stage", stage="trend"):
+                for ticker in tickers:
+                    trend = lookup(ticker, time_range)
+                    if trend is not None:
+                        trends.append(trend)
+        except Exception as e:  # series chỉ là phần bổ sung cho prompt
+            logger.warning("Sentiment trend lookup failed for %s: %s", tickers, e)
+        finally:
+            if timings is not None:
+                timings["trend"] = round((time.perf_counter() - start) * 1000, 2)
+        return trends
+
+    def _compare_tickers(self, companies: Sequence[str]) -> List[str]:
+        """Các ticker (duy nhất, theo thứ tự) để fan-out khi câu hỏi nêu nhiều công ty."""
+        tickers = [t for t in map(self._normalize_ticker, companies) if t]
+        return list(dict.fromkeys(tickers))[:MAX_COMPARE_TICKERS]
+
+    def _answer_key(
+        self,
+        user_message: str,
+        companies: Sequence[str],
+        time_range: str | None,
+        lang: str,
+    ) -> str:
+        """Key cho answer cache; đổi index/threshold → key mới (tự invalidate)."""
+        return make_key(
+            "answer",
+            normalize_text(user_message),
+            ",".join(self._normalize_ticker(c) or c.casefold() for c in companies),
+            (time_range or "").casefold(),
+            lang,
+            self.retrieval_agent.index_version(),
+        )
+
+    async def handle_many(
+        self,
+        questions: Sequence[str],
+        concurrency: int = 4,
+        top_k: int = 5,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Xử lý nhiều câu hỏi offline (không ghi session), stream kết quả.
+
+        Embedding cho mọi query (câu so sánh: một query mỗi ticker) được
+        encode một lần và FinBERT chạy một lần trên tập tin duy nhất của cả
+        job; extraction và summary chạy song song tối đa ``concurrency``
+        request LLM.
+
+        Yields:
+            dict: {"index", "question", "company", "companies", "time_range",
+            "language", "articles", "sentiments", "trends", "summary", "error"}
+            theo thứ tự hoàn thành
+        """
+        questions = list(questions)
+        if not questions:
+            return
+        limiter = asyncio.Semaphore(max(1, concurrency))
+
+        async def bounded(awaitable: Awaitable[T]) -> T:
+            async with limiter:
+                return await awaitable
+
+        with span("orchestrator_batch", stage="extract"):
+            langs = await asyncio.to_thread(
+                lambda: [self.language_agent.detect(q, None) for q in questions]
+            )
+            extracted = await asyncio.gather(
+                *(bounded(self._extract_companies_and_range(q)) for q in questions)
+            )
+
+        # Một query cho mỗi (câu hỏi, ticker); ``owners`` map kết quả về câu hỏi.
+        compare = [self._compare_tickers(companies) for companies, _ in extracted]
+        owners: List[int] = []
+        queries: List[str] = []
+        tickers: List[str | None] = []
+        for index, (question, (companies, _)) in enumerate(zip(questions, extracted)):
+            if len(compare[index]) > 1:
+                for ticker in compare[index]:
+                    owners.append(index)
+                    queries.append(f"{ticker} {question}")
+                    tickers.append(ticker)
+            else:
+                company = companies[0] if companies else None
+                owners.append(index)
+                queries.append(question if not company else f"{company} {question}")
+                tickers.append(self._normalize_ticker(company))
+        with span("orchestrator_batch", stage="retrieve"):
+            results = await asyncio.to_thread(
+                self.retrieval_agent.get_relevant_news_many,
+                queries,
+                tickers,
+                top_k,
+            )
+        news_lists: List[List[NewsItem]] = [[] for _ in questions]
+        for owner, news in zip(owners, results):
+            limit = (
+                self._per_ticker_top_k(top_k, len(compare[owner]))
+                if len(compare[owner]) > 1
+                else top_k
+            )
+            news_lists[owner].extend(news[:limit])
+
+        # Một lần FinBERT cho các tin (duy nhất) chưa có trong cache.
+        with span("orchestrator_batch", stage="sentiment"):
+            unique = list({n.id: n for news in news_lists for n in news}.values())
+            scores = await self._score_sentiment(unique, budget=None)
+            sentiment_by_id = {n.id: score for n, score in zip(unique, scores)}
+
+        async def summarize(index: int) -> Dict[str, Any]:
+            news = news_lists[index]
+            sentiments = [sentiment_by_id.get(n.id, {}) for n in news]
+            companies, time_range = extracted[index]
+            trends = self._sentiment_trends(compare[index] or companies[:1], time_range)
+            result: Dict[str, Any] = {
+                "index": index,
+                "question": questions[index],
+                "company": companies[0] if companies else None,
+                "companies": list(companies),
+                "time_range": time_range,
+                "language": langs[index],
+                "articles": [n.id for n in news],
+                "sentiments": [
+                    {"label": s.get("label"), "score": s.get("score")}
+                    for s in sentiments
+                ],
+                "trends": [t.to_dict() for t in trends],
+                "summary": None,
+                "error": None,
+            }
+            try:
+                with span("orchestrator_batch", stage="summarize"):
+                    result["summary"] = await bounded(
+                        self.summarizer_agent.summarize_news_and_sentiment(
+                            news,
+                            sentiments,
+                            langs[index],
+                            trends=trends,
+                            compare=compare[index],
+                        )
+                    )
+            except Exception as e:  # một item lỗi không làm hỏng cả job
+                result["error"] = f"{type(e).__name__}: {e}"
+            return result
+
+        for next_done in asyncio.as_completed(
+            [summarize(i) for i in range(len(questions))]
+        ):
+            yield await next_done
+
+    async def _score_sentiment(
+        self, news: List[NewsItem], budget: float | None
+    ) -> List[dict]:
+        """FinBERT cho các tin chưa có trong cache; hết budget → dùng cache.
+
+        ``budget=None`` nghĩa là không giới hạn thời gian (batch job).
+        """
+        # Sentiment tính sẵn lúc ingest → không cần chạy FinBERT.
+        cached = {n.id: n.sentiment for n in news if n.sentiment}
+        with self._sentiment_lock:
+            cached.update(
+                (n.id, self._sentiment_cache[n.id])
+                for n in news
+                if n.id not in cached and n.id in self._sentiment_cache
+            )
+        missing = [n for n in news if n.id not in cached]
+
+        if missing:
+            if budget is None or budget > 0:
+                try:
+                    cached.update(
+                        await asyncio.wait_for(
+                            asyncio.to_thread(self._analyze_and_cache, missing),
+                            timeout=budget,
+                        )
+                    )
+                except asyncio.TimeoutError:
+                    # Thread vẫn chạy tiếp và làm ấm cache cho lần sau.
+                    count("orchestrator_degraded", stage="sentiment")
+            else:
+                count("orchestrator_degraded", stage="sentiment")
+
+        return [cached.get(n.id, {}) for n in news]
+
+    def _analyze_and_cache(self, news: List[NewsItem]) -> Dict[str, dict]:
+        results = self.sentiment_service.analyze([n.content for n in news])
+        scored = {n.id: r for n, r in zip(news, results)}
+        with self._sentiment_lock:
+            for article_id, result in scored.items():
+                self._sentiment_cache[article_id] = result
+                self._sentiment_cache.move_to_end(article_id)
+            while len(self._sentiment_cache) > SENTIMENT_CACHE_SIZE:
+                self._sentiment_cache.popitem(last=False)
+        return scored
+
+    async def _speculative_retrieve(
+        self,
+        user_message: str,
+        top_k: int,
+        cache_checked: asyncio.Event,
+        timings: Dict[str, float],
+    ) -> List[Tuple[NewsItem, float]]:
+        """
+        Retrieval đầu cơ trên câu hỏi gốc (chưa có ticker).
+
+        Có answer cache thì chờ kết quả tra cache trước (tối đa
+        ``RAG_SPECULATIVE_CACHE_GRACE``) để cache hit không tốn một lần search;
+        extraction đi LLM lâu hơn thế thì search song song như bình thường.
+        """
+        try:
+            await asyncio.wait_for(cache_checked.wait(), RAG_SPECULATIVE_CACHE_GRACE)
+        except asyncio.TimeoutError:
+            pass
+        return await _timed(
+            "retrieve_speculative",
+            self._retrieve(user_message, None, top_k * RAG_SPECULATIVE_FACTOR),
+            timings,
+        )
+
+    async def _retrieve(
+        self, query: str, ticker: str | None, top_k: int
+    ) -> List[Tuple[NewsItem, float]]:
+        return await self.singleflight.do_async(
+            ("retrieve", query, ticker, top_k),
+            lambda: self.retrieval_agent.get_relevant_news_scored(
+                query, ticker=ticker, top_k=top_k
+            ),
+        )
+
+    async def _refine_retrieval(
+        self,
+        speculative_task: "asyncio.Task[List[Tuple[NewsItem, float]]]",
+        user_message: str,
+        company: str | None,
+        top_k: int,
+    ) -> List[Tuple[NewsItem, float]]:
+        """Lọc kết quả đầu cơ theo ticker; chỉ search lại khi cửa sổ ứng viên không đủ."""
+        window = top_k * RAG_SPECULATIVE_FACTOR
+        ticker_filter = self._normalize_ticker(company)
+        candidates = await speculative_task
+
+        if ticker_filter:
+            filtered = [
+                (n, score)
+                for n, score in candidates
+                if n.ticker.upper() == ticker_filter
+            ]
+        else:
+            filtered = list(candidates)
+
+        # Nếu search đầu cơ chưa chạm trần window thì nó đã trả về mọi tin
+        # vượt ngưỡng tương đồng → kết quả lọc là đầy đủ, không cần search lại.
+        if len(filtered) >= top_k or len(candidates) < window:
+            return filtered[:top_k]
 
-        summary = await self.summarizer_agent.summarize_news_and_sentiment(
-            news, sentiments, lang
+        query_for_rag = (
+            user_message if not company else f"{company} {user_message}"
         )
+        return await self._retrieve(query_for_rag, ticker_filter, top_k)
 
-        self.session_store.update_session(
-            session_id=session_id,
-            user_msg=user_message,
-            assistant_msg=summary,
-            summary=summary,
+    async def _retrieve_many(
+        self, queries: Sequence[str], tickers: Sequence[str | None], top_k: int
+    ) -> List[List[Tuple[NewsItem, float]]]:
+        """Search nhiều (query, ticker) với một lần encode batch."""
+        return await self.singleflight.do_async(
+            ("retrieve_many", tuple(queries), tuple(tickers), top_k),
+            lambda: self.retrieval_agent.get_relevant_news_many_scored(
+                queries, tickers, top_k=top_k
+            ),
         )
 
-        return summary
+    @staticmethod
+    def _per_ticker_top_k(top_k: int, n_tickers: int) -> int:
+        """Chia ``top_k`` cho các ticker để prompt so sánh dài cỡ prompt một ticker."""
+        return max(COMPARE_MIN_PER_TICKER, -(-top_k // max(1, n_tickers)))
+
+    async def _refine_retrieval_many(
+        self,
+        speculative_task: "asyncio.Task[List[Tuple[NewsItem, float]]]",
+        user_message: str,
+        tickers: Sequence[str],
+        top_k: int,
+    ) -> List[Tuple[NewsItem, float]]:
+        """
+        Fan-out retrieval cho câu so sánh: mỗi ticker lấy tin từ kết quả đầu
+        cơ, các ticker còn thiếu được search lại chung một lần encode batch.
+
+        Returns:
+            Tin của các ticker nối theo thứ tự ``tickers``
+        """
+        window = top_k * RAG_SPECULATIVE_FACTOR
+        per_ticker = self._per_ticker_top_k(top_k, len(tickers))
+        candidates = await speculative_task
+
+        by_ticker = {
+            ticker: [(n, score) for n, score in candidates if n.ticker.upper() == ticker][
+                :per_ticker
+            ]
+            for ticker in tickers
+        }
+        missing = [
+            ticker
+            for ticker in tickers
+            if len(by_ticker[ticker]) < per_ticker and len(candidates) >= window
+        ]
+        if missing:
+            refined = await self._retrieve_many(
+                [f"{ticker} {user_message}" for ticker in missing], missing, per_ticker
+            )
+            by_ticker.update(zip(missing, refined))
+        return [pair for ticker in tickers for pair in by_ticker[ticker]]
+
+    async def _extract_companies_and_range(
+        self, user_message: str, deadline: Deadline | None = None
+    ) -> Tuple[List[str], str | None]:
+        """Extract các công ty + time_range: fast path local, chỉ gọi LLM khi chưa chắc.
 
-    async def _extract_company_and_range(
-        self, user_message: str
-    ) -> Tuple[str | None, str | None]:
-        """Gọi LLM để extract company + time_range, fallback an toàn."""
+        Câu so sánh ("So sánh Tesla và BYD") trả về mọi công ty theo thứ tự xuất hiện.
+        """
+        local_time_range = None
+        if self.intent_extractor is not None:
+            local = self.intent_extractor.extract(user_message)
+            if local.confident:
+                return list(local.companies), local.time_range
+            local_time_range = local.time_range
+
+        if deadline is not None and deadline.remaining() < EXTRACT_MIN_BUDGET:
+            count("orchestrator_degraded", stage="extract")
+            return [], local_time_range
+
+        companies, time_range = await self._extract_with_llm(user_message, deadline)
+        if self.intent_extractor is not None:
+            # LLM thường trả tên công ty ("Tesla") chứ không phải ticker → map qua alias.
+            companies = list(
+                dict.fromkeys(self.intent_extractor.resolve_name(c) or c for c in companies)
+            )
+        return companies, time_range or local_time_range
+
+    async def _extract_with_llm(
+        self, user_message: str, deadline: Deadline | None = None
+    ) -> Tuple[List[str], str | None]:
+        """Gọi LLM để extract các công ty + time_range, fallback an toàn."""
         parse_prompt = (
             "User query:\n"
             f"{user_message}\n\n"
             "Extract:\n"
-            "- company (stock ticker or organization, short form if possible)\n"
+            "- companies (every stock ticker or organization mentioned, in order, "
+            "short form if possible)\n"
             "- time_range (e.g. '6 months', '1 year', 'YTD')\n\n"
-            'Return strict JSON like: {"company": "...", "time_range": "..."}'
+            'Return strict JSON like: {"companies": ["..."], "time_range": "..."}'
         )
 
         messages = [
@@ -87,16 +797,48 @@ class OrchestratorAgent:
             {"role": "user", "content": parse_prompt},
         ]
 
-        raw_response = await asyncio.to_thread(call_llm, messages)
+        cache_key = make_llm_key(messages, LLM_MODEL_NAME, LLM_TEMPERATURE)
+        try:
+            raw_response = await self.singleflight.do_async(
+                ("extract", cache_key),
+                lambda: self._call_llm_cached(cache_key, messages, deadline),
+            )
+        except (requests.RequestException, ValueError) as e:
+            # Extraction chỉ là tối ưu: LLM lỗi/circuit mở → RAG trên câu hỏi gốc.
+            logger.warning("Intent extraction degraded: %s", e)
+            return [], None
         return self._safe_parse_structured_response(raw_response)
 
+    def _call_llm_cached(
+        self, cache_key: str, messages: list, deadline: Deadline | None = None
+    ) -> str:
+        """Đọc cache trước khi gọi LLM; chạy trong worker thread."""
+        if self.llm_cache is not None:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        raw_response = call_llm(messages, deadline=deadline)
+
+        # Chỉ cache response parse được, tránh "đóng băng" output lỗi của LLM.
+        if (
+            self.llm_cache is not None
+            and self._safe_parse_structured_response(raw_response) != ([], None)
+        ):
+            self.llm_cache.set(cache_key, raw_response)
+
+        return raw_response
+
     @staticmethod
     def _safe_parse_structured_response(
         raw_response: str,
-    ) -> Tuple[str | None, str | None]:
-        """Parse JSON safely, tolerant với JSON trong code-blocks."""
+    ) -> Tuple[List[str], str | None]:
+        """Parse JSON safely, tolerant với JSON trong code-blocks.
+
+        Nhận cả ``"companies": [...]`` lẫn ``"company": "..."`` (dạng cũ).
+        """
         if not raw_response:
-            return None, None
+            return [], None
 
         candidate = raw_response.strip()
 
@@ -108,22 +850,24 @@ class OrchestratorAgent:
         try:
             data: Dict[str, Any] = json.loads(candidate)
         except json.JSONDecodeError:
-            return None, None
+            return [], None
+        if not isinstance(data, dict):
+            return [], None
 
-        company = data.get("company")
+        raw_companies = data.get("companies")
+        if not isinstance(raw_companies, list):
+            raw_companies = [data.get("company")]
+        companies = [
+            c.strip() for c in raw_companies if isinstance(c, str) and c.strip()
+        ]
         time_range = data.get("time_range")
 
-        if isinstance(company, str):
-            company = company.strip() or None
-        else:
-            company = None
-
         if isinstance(time_range, str):
             time_range = time_range.strip() or None
         else:
             time_range = None
 
-        return company, time_range
+        return list(dict.fromkeys(companies)), time_range
 
     @staticmethod
     def _normalize_ticker(candidate: str | None) -> str | None:
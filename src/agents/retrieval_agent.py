@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
 from src.rag_news import NewsItem, NewsRAG
+from src.sentiment_series import SentimentTrend
 
 
 class RetrievalAgent:
@@ -11,6 +12,20 @@ class RetrievalAgent:
     def __init__(self, rag: NewsRAG) -> None:
         self.rag = rag
 
+    def index_version(self) -> str:
+        """Version của snapshot tin tức + ngưỡng đang dùng (ảnh hưởng kết quả)."""
+        version = getattr(self.rag, "version", "unknown")
+        return f"{version}:{self.rag.similarity_threshold:.4f}"
+
+    def sentiment_trend(
+        self, ticker: Optional[str], time_range: Optional[str] = None
+    ) -> Optional[SentimentTrend]:
+        """Xu hướng sentiment tính sẵn của ticker (None nếu backend không có series)."""
+        trend = getattr(self.rag, "sentiment_trend", None)
+        if not ticker or not callable(trend):
+            return None
+        return trend(ticker, time_range)
+
     def get_relevant_news(
         self,
         query: str,
@@ -33,3 +48,42 @@ class RetrievalAgent:
 
         return self.rag.search(query=query, ticker=ticker, top_k=top_k)
 
+
+    def get_relevant_news_scored(
+        self,
+        query: str,
+        ticker: Optional[str] = None,
+        top_k: int | None = None,
+    ) -> List[Tuple[NewsItem, float]]:
+        """Như `get_relevant_news` nhưng trả về cặp (tin, similarity)."""
+        if not query.strip():
+            return []
+
+        if top_k is None:
+            return self.rag.search_scored(query=query, ticker=ticker)
+
+        return self.rag.search_scored(query=query, ticker=ticker, top_k=top_k)
+
+    def get_relevant_news_many(
+        self,
+        queries: Sequence[str],
+        tickers: Sequence[Optional[str]] | None = None,
+        top_k: int | None = None,
+    ) -> List[List[NewsItem]]:
+        """Batch version của `get_relevant_news`: một lần encode cho mọi query."""
+        if top_k is None:
+            return self.rag.search_many(queries, tickers)
+
+        return self.rag.search_many(queries, tickers, top_k=top_k)
+
+    def get_relevant_news_many_scored(
+        self,
+        queries: Sequence[str],
+        tickers: Sequence[Optional[str]] | None = None,
+        top_k: int | None = None,
+    ) -> List[List[Tuple[NewsItem, float]]]:
+        """Như `get_relevant_news_many` nhưng trả về cặp (tin, similarity)."""
+        if top_k is None:
+            return self.rag.search_many_scored(queries, tickers)
+
+        return self.rag.search_many_scored(queries, tickers, top_k=top_k)
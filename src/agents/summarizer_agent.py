@@ -1,10 +1,19 @@
 from __future__ import annotations
 
 import asyncio
-from typing import List, Sequence
+from typing import List, Sequence, Tuple
 
+import requests
+
+from src.config import SUMMARY_MIN_BUDGET
 from src.llm_client import call_llm
 from src.rag_news import NewsItem
+from src.sentiment_series import SentimentTrend
+from src.utils.deadline import Deadline
+
+
+class FallbackSummary(str):
+    """Summary dạng template (không qua LLM); caller không nên cache nó."""
 
 
 class SummarizerAgent:
@@ -21,16 +30,124 @@ class SummarizerAgent:
         news: List[NewsItem],
         sentiments: Sequence[dict],
         lang: str,
+        deadline: Deadline | None = None,
+        trends: Sequence[SentimentTrend] = (),
+        compare: Sequence[str] = (),
     ) -> str:
+        """
+        Args:
+            trends: Xu hướng sentiment tính sẵn theo ngày (``SentimentSeries``)
+                của từng ticker, đưa vào prompt cạnh các tin
+            compare: Các ticker cần so sánh (>= 2 → prompt so sánh, tin nhóm theo ticker)
+        """
         lang = "vi" if lang == "vi" else "en"
 
-        if not news:
+        if not news and not any(t.articles for t in trends):
             return (
                 "Không tìm thấy tin tức phù hợp."
                 if lang == "vi"
                 else "No relevant news found."
             )
 
+        news, sentiments = self._order_for_compare(news, sentiments, compare)
+        bullets = self._build_bullets(news, sentiments, with_ticker=len(compare) > 1)
+        if deadline is not None and deadline.remaining() < SUMMARY_MIN_BUDGET:
+            # Không đủ thời gian cho một LLM round trip → template ngay.
+            return self.build_fallback_summary(bullets, sentiments, lang, trends)
+
+        news_text = "\n".join(bullets)
+        trend_text = "\n\n".join(t.describe(lang) for t in trends)
+
+        if len(compare) > 1:
+            names = ", ".join(compare)
+            prompt_vi = (
+                f"Bạn là chuyên gia tài chính. Người dùng muốn so sánh {names}.\n\n"
+                + (f"Thống kê cảm xúc FinBERT theo từng mã:\n{trend_text}\n\n" if trends else "")
+                + "Tin tức và cảm xúc (FinBERT), nhóm theo mã:\n\n"
+                f"{news_text}\n\n"
+                f"Hãy so sánh ngắn gọn (5–7 câu) tình hình và tâm lý thị trường của "
+                f"{names}, nêu rõ điểm khác biệt chính, bằng tiếng Việt, dễ hiểu "
+                "cho nhà đầu tư cá nhân."
+            )
+            prompt_en = (
+                f"You are a financial analyst. The user wants to compare {names}.\n\n"
+                + (f"FinBERT sentiment statistics per ticker:\n{trend_text}\n\n" if trends else "")
+                + "News items with their sentiment (FinBERT), grouped by ticker:\n\n"
+                f"{news_text}\n\n"
+                f"Compare the situation and market sentiment of {names} in 5–7 "
+                "sentences in English, highlighting the key differences, suitable "
+                "for a retail investor."
+            )
+        else:
+            prompt_vi = (
+                "Bạn là chuyên gia tài chính. "
+                + (f"Thống kê cảm xúc FinBERT trên toàn bộ tin trong giai đoạn:\n{trend_text}\n\n" if trends else "")
+                + "Dưới đây là danh sách tin tức và cảm xúc (FinBERT):\n\n"
+                f"{news_text}\n\n"
+                "Hãy tóm tắt ngắn gọn (5–7 câu) tình hình chung và tâm lý thị "
+                "trường, bằng tiếng Việt, dễ hiểu cho nhà đầu tư cá nhân."
+            )
+            prompt_en = (
+                "You are a financial analyst. "
+                + (f"FinBERT sentiment statistics over all news in the period:\n{trend_text}\n\n" if trends else "")
+                + "Below are news items with their sentiment (FinBERT):\n\n"
+                f"{news_text}\n\n"
+                "Summarize the overall situation and market sentiment in 5–7 "
+                "sentences in English, suitable for a retail investor."
+            )
+
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {
+                "role": "user",
+                "content": prompt_vi if lang == "vi" else prompt_en,
+            },
+        ]
+
+        try:
+            return await asyncio.to_thread(call_llm, messages, deadline=deadline)
+        except requests.RequestException:
+            # Breaker mở / bị throttle / hết deadline / hết lượt retry → tóm tắt dạng template.
+            return self.build_fallback_summary(bullets, sentiments, lang, trends)
+
+    def fallback_summary(
+        self,
+        news: List[NewsItem],
+        sentiments: Sequence[dict],
+        lang: str,
+        trends: Sequence[SentimentTrend] = (),
+        compare: Sequence[str] = (),
+    ) -> str:
+        """Tóm tắt template (không gọi LLM) từ danh sách tin + sentiment."""
+        lang = "vi" if lang == "vi" else "en"
+        if not news and not any(t.articles for t in trends):
+            return (
+                "Không tìm thấy tin tức phù hợp."
+                if lang == "vi"
+                else "No relevant news found."
+            )
+        news, sentiments = self._order_for_compare(news, sentiments, compare)
+        bullets = self._build_bullets(news, sentiments, with_ticker=len(compare) > 1)
+        return self.build_fallback_summary(bullets, sentiments, lang, trends)
+
+    @staticmethod
+    def _order_for_compare(
+        news: List[NewsItem], sentiments: Sequence[dict], compare: Sequence[str]
+    ) -> Tuple[List[NewsItem], List[dict]]:
+        """Nhóm tin theo thứ tự ticker trong ``compare`` (ổn định trong từng nhóm)."""
+        paired = [
+            (item, sentiments[idx] if idx < len(sentiments) else {})
+            for idx, item in enumerate(news)
+        ]
+        if len(compare) > 1:
+            rank = {ticker.upper(): i for i, ticker in enumerate(compare)}
+            paired.sort(key=lambda pair: rank.get(pair[0].ticker.upper(), len(rank)))
+        return [item for item, _ in paired], [sentiment for _, sentiment in paired]
+
+    @staticmethod
+    def _build_bullets(
+        news: List[NewsItem], sentiments: Sequence[dict], with_ticker: bool = False
+    ) -> List[str]:
         bullets: List[str] = []
         for idx, item in enumerate(news):
             sentiment = sentiments[idx] if idx < len(sentiments) else {}
@@ -41,35 +158,38 @@ class SummarizerAgent:
                 if isinstance(score, (float, int))
                 else "n/a"
             )
+            ticker = f"{item.ticker} · " if with_ticker else ""
             bullets.append(
-                f"- [{item.date}] {item.title} ({label} / {score_str})"
+                f"- [{item.date}] {ticker}{item.title} ({label} / {score_str})"
             )
+        return bullets
 
-        news_text = "\n".join(bullets)
-
-        prompt_vi = (
-            "Bạn là chuyên gia tài chính. Dưới đây là danh sách tin tức và "
-            "cảm xúc (FinBERT):\n\n"
-            f"{news_text}\n\n"
-            "Hãy tóm tắt ngắn gọn (5–7 câu) tình hình chung và tâm lý thị "
-            "trường, bằng tiếng Việt, dễ hiểu cho nhà đầu tư cá nhân."
-        )
-
-        prompt_en = (
-            "You are a financial analyst. Below are news items with their "
-            "sentiment (FinBERT):\n\n"
-            f"{news_text}\n\n"
-            "Summarize the overall situation and market sentiment in 5–7 "
-            "sentences in English, suitable for a retail investor."
-        )
-
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {
-                "role": "user",
-                "content": prompt_vi if lang == "vi" else prompt_en,
-            },
-        ]
+    @staticmethod
+    def build_fallback_summary(
+        bullets: List[str],
+        sentiments: Sequence[dict],
+        lang: str,
+        trends: Sequence[SentimentTrend] = (),
+    ) -> FallbackSummary:
+        """Tóm tắt không cần LLM: xu hướng (nếu có) + đếm nhãn sentiment + liệt kê các tin."""
+        counts: dict = {}
+        for sentiment in sentiments:
+            label = str(sentiment.get("label", "neutral")).lower()
+            counts[label] = counts.get(label, 0) + 1
+        tally = ", ".join(f"{label}: {n}" for label, n in sorted(counts.items()))
 
-        return await asyncio.to_thread(call_llm, messages)
+        if lang == "vi":
+            header = (
+                f"Tổng hợp nhanh {len(bullets)} tin tức liên quan"
+                + (f" (cảm xúc FinBERT — {tally})" if tally else "")
+                + ":"
+            )
+        else:
+            header = (
+                f"Quick digest of {len(bullets)} relevant news items"
+                + (f" (FinBERT sentiment — {tally})" if tally else "")
+                + ":"
+            )
+        prefix = "".join(f"{t.describe(lang)}\n\n" for t in trends)
+        return FallbackSummary(prefix + header + "\n" + "\n".join(bullets))
 
@@ -0,0 +1,366 @@
+"""Headless asyncio HTTP API cho orchestrator (chạy song song với Streamlit).
+
+Endpoints:
+
+* ``POST /ask``        ``{"question", "session_id"?, "ticker"?, "deadline"?, "stream"?}``
+* ``POST /search``     ``{"query", "ticker"?, "top_k"?}``
+* ``POST /sentiment``  ``{"texts": [...]}``
+* ``GET  /healthz``    process còn sống
+* ``GET  /readyz``     dependencies (model, index) đã load xong
+* ``GET  /metrics``    Prometheus text
+
+Dùng chung dependency graph với Streamlit (``src.app.init_dependencies``) và
+một event loop sống suốt vòng đời process.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.config import (
+    API_HEARTBEAT_INTERVAL,
+    API_HOST,
+    API_MAX_BODY_BYTES,
+    API_MAX_CONCURRENCY,
+    API_MAX_QUEUE,
+    API_PORT,
+    TOP_K_RESULTS,
+)
+from src.utils.http_utils import (
+    ChunkedResponse,
+    HTTPError,
+    Request,
+    read_request,
+    write_json,
+    write_response,
+)
+from src.utils.logging_utils import configure_logging, count, metrics, span
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Request, asyncio.StreamWriter], Awaitable[Optional[Tuple[int, Any]]]]
+
+
+def _default_dependencies() -> Dict[str, Any]:
+    from src.app import init_dependencies
+
+    return init_dependencies()
+
+
+class ConcurrencyLimiter:
+    """Giới hạn request xử lý đồng thời; hàng chờ đầy thì từ chối ngay (503)."""
+
+    def __init__(self, limit: int, max_queue: int) -> None:
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self._waiting = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            count("api_rejected")
+            raise HTTPError(503, "Server busy, retry later", {"Retry-After": "1"})
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        in_flight = self.limit - self._semaphore._value  # noqa: SLF001
+        return {"in_flight": in_flight, "waiting": self._waiting}
+
+
+class APIServer:
+    """HTTP/1.1 server (keep-alive) trên ``asyncio.start_server``."""
+
+    def __init__(
+        self,
+        dependencies_factory: Callable[[], Dict[str, Any]] = _default_dependencies,
+        host: str = API_HOST,
+        port: int = API_PORT,
+        max_concurrency: int = API_MAX_CONCURRENCY,
+        max_queue: int = API_MAX_QUEUE,
+        max_body: int = API_MAX_BODY_BYTES,
+        heartbeat_interval: float = API_HEARTBEAT_INTERVAL,
+    ) -> None:
+        self.dependencies_factory = dependencies_factory
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.heartbeat_interval = heartbeat_interval
+        self.deps: Optional[Dict[str, Any]] = None
+        self.startup_error: Optional[BaseException] = None
+        self._limiter: Optional[ConcurrencyLimiter] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._startup: Optional[asyncio.Task] = None
+        self._routes: Dict[Tuple[str, str], Handler] = {
+            ("GET", "/healthz"): self._healthz,
+            ("GET", "/readyz"): self._readyz,
+            ("GET", "/metrics"): self._metrics,
+            ("POST", "/ask"): self._ask,
+            ("POST", "/search"): self._search,
+            ("POST", "/sentiment"): self._sentiment,
+        }
+
+    # --------------------------------------------------------------- lifecycle
+    async def start(self) -> None:
+        """Mở socket ngay (``/healthz`` trả lời được), load models ở background."""
+        self._limiter = ConcurrencyLimiter(self.max_concurrency, self.max_queue)
+        metrics.register_collector("api", self._limiter.stats)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._startup = asyncio.create_task(self._load_dependencies())
+        logger.info("API listening on http://%s:%s", self.host, self.port)
+
+    async def _load_dependencies(self) -> None:
+        try:
+            self.deps = await asyncio.to_thread(self.dependencies_factory)
+            logger.info("API dependencies ready")
+        except Exception as e:  # readyz báo lỗi thay vì làm chết process
+            self.startup_error = e
+            logger.exception("Failed to initialise API dependencies")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._startup is not None and not self._startup.done():
+            self._startup.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @property
+    def ready(self) -> bool:
+        return self.deps is not None
+
+    # -------------------------------------------------------------- transport
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                await self._dispatch(request, writer)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client đóng giữa chừng
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        start = time.perf_counter()
+        status = 500
+        handler = self._routes.get((request.method, request.path))
+        try:
+            with span("api_request", path=request.path):
+                if handler is None:
+                    allowed = [m for (m, p) in self._routes if p == request.path]
+                    raise HTTPError(405 if allowed else 404)
+                result = await handler(request, writer)
+            if result is None:  # handler đã tự stream response
+                status = 200
+                return
+            status, payload = result
+            if isinstance(payload, str):
+                await write_response(
+                    writer, status, payload.encode("utf-8"),
+                    "text/plain; version=0.0.4; charset=utf-8", request.keep_alive,
+                )
+            else:
+                await write_json(writer, status, payload, request.keep_alive)
+        except HTTPError as e:
+            status = e.status
+            await write_json(writer, status, {"error": e.message}, request.keep_alive, e.headers)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            logger.exception("Unhandled error on %s %s", request.method, request.path)
+            await write_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, request.keep_alive)
+        finally:
+            count("api_requests", path=request.path, status=status)
+            logger.debug(
+                "%s %s -> %s (%.1f ms)", request.method, request.path, status,
+                (time.perf_counter() - start) * 1000,
+            )
+
+    def _require(self) -> Dict[str, Any]:
+        if self.deps is None:
+            raise HTTPError(503, "Service is starting up", {"Retry-After": "5"})
+        return self.deps
+
+    # --------------------------------------------------------------- handlers
+    async def _healthz(self, request: Request, writer: asyncio.StreamWriter) -> Tuple[int, Any]:
+        return 200, {"status": "ok"}
+
+    async def _readyz(self, request: Request, writer: asyncio.StreamWriter) -> Tuple[int, Any]:
+        if self.deps is not None:
+            return 200, {"status": "ready", "news": len(self.deps["rag"].news)}
+        if self.startup_error is not None:
+            return 503, {"status": "failed", "error": str(self.startup_error)}
+        return 503, {"status": "starting"}
+
+    async def _metrics(self, request: Request, writer: asyncio.StreamWriter) -> Tuple[int, Any]:
+        return 200, metrics.render_prometheus()
+
+    @staticmethod
+    def _json_object(request: Request) -> Dict[str, Any]:
+        """Body JSON phải là object; ``[1]`` / ``null`` → 400 thay vì lỗi 500."""
+        body = request.json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _ticker(body: Dict[str, Any]) -> Optional[str]:
+        ticker = body.get("ticker")
+        if ticker is not None and not isinstance(ticker, str):
+            raise HTTPError(400, "'ticker' must be a string")
+        return ticker or None
+
+    async def _ask(
+        self, request: Request, writer: asyncio.StreamWriter
+    ) -> Optional[Tuple[int, Any]]:
+        deps = self._require()
+        body = self._json_object(request)
+        question = str(body.get("question", "")).strip()
+        if not question:
+            raise HTTPError(400, "'question' is required")
+        session_id = str(body.get("session_id") or uuid.uuid4())
+        ticker = self._ticker(body)
+        deadline = body.get("deadline")
+        if deadline is not None and not isinstance(deadline, (int, float)):
+            raise HTTPError(400, "'deadline' must be a number of seconds")
+
+        orchestrator = deps["orchestrator"]
+        assert self._limiter is not None
+        async with self._limiter.slot():
+            call = orchestrator.handle_detailed(session_id, question, deadline, ticker=ticker)
+            if not body.get("stream"):
+                result = await call
+                return 200, {"session_id": session_id, **result.to_dict()}
+            await self._stream_answer(request, writer, session_id, call)
+            return None
+
+    async def _stream_answer(
+        self,
+        request: Request,
+        writer: asyncio.StreamWriter,
+        session_id: str,
+        call: Awaitable[Any],
+    ) -> None:
+        """NDJSON: accepted → heartbeat* → articles → summary → done (hoặc error)."""
+        stream = await ChunkedResponse.start(writer, keep_alive=request.keep_alive)
+        await stream.send_json({"event": "accepted", "session_id": session_id})
+        task = asyncio.ensure_future(call)
+        try:
+            while not task.done():
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if not done:
+                    await stream.send_json({"event": "heartbeat"})
+            result = task.result()
+        except (ConnectionError, asyncio.CancelledError):
+            task.cancel()
+            raise
+        except Exception as e:
+            logger.exception("Streaming /ask failed")
+            await stream.send_json({"event": "error", "error": f"{type(e).__name__}: {e}"})
+        else:
+            data = result.to_dict()
+            await stream.send_json({"event": "articles", "articles": data.pop("articles")})
+            timings = data.pop("timings")
+            await stream.send_json({"event": "summary", **data})
+            await stream.send_json({"event": "done", "timings": timings})
+        await stream.close()
+
+    async def _search(self, request: Request, writer: asyncio.StreamWriter) -> Tuple[int, Any]:
+        deps = self._require()
+        body = self._json_object(request)
+        query = str(body.get("query", "")).strip()
+        if not query:
+            raise HTTPError(400, "'query' is required")
+        try:
+            top_k = max(1, min(50, int(body.get("top_k", TOP_K_RESULTS))))
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, "'top_k' must be an integer") from e
+
+        assert self._limiter is not None
+        async with self._limiter.slot():
+            scored = await asyncio.to_thread(
+                deps["retrieval"].get_relevant_news_scored,
+                query,
+                ticker=self._ticker(body),
+                top_k=top_k,
+            )
+        return 200, {
+            "results": [
+                {
+                    "id": item.id,
+                    "title": item.title,
+                    "content": item.content,
+                    "date": item.date,
+                    "ticker": item.ticker,
+                    "score": score,
+                }
+                for item, score in scored
+            ]
+        }
+
+    async def _sentiment(self, request: Request, writer: asyncio.StreamWriter) -> Tuple[int, Any]:
+        deps = self._require()
+        texts = self._json_object(request).get("texts")
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            raise HTTPError(400, "'texts' must be a non-empty list of strings")
+        assert self._limiter is not None
+        async with self._limiter.slot():
+            results = await asyncio.to_thread(deps["sentiment"].analyze, texts)
+        return 200, {
+            "results": [{"label": r["label"], "score": r["score"]} for r in results]
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the orchestrator over HTTP.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    configure_logging()
+    server = APIServer(host=args.host, port=args.port, max_concurrency=args.max_concurrency)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-import asyncio
+import atexit
 import uuid
 
+import requests
 import streamlit as st
 
 from pathlib import Path
@@ -12,45 +13,108 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.agents.intent_extractor import LocalIntentExtractor
 from src.agents.language_agent import LanguageAgent
-from src.agents.orchestrator_agent import OrchestratorAgent
+from src.agents.orchestrator_agent import OrchestratorAgent, OrchestratorResult
 from src.agents.retrieval_agent import RetrievalAgent
 from src.agents.summarizer_agent import SummarizerAgent
 from src.embedding_service import EmbeddingService
+from src.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_FILE,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    API_BASE_URL,
+    LLM_CACHE_ENABLED,
+    MODEL_SERVER_SOCKET,
+    REQUEST_DEADLINE,
+    SESSION_BACKEND,
+)
+from src.model_server import RemoteEmbeddingService, RemoteSentimentService
 from src.rag_news import NewsRAG
+from src.response_cache import ResponseCache
 from src.sentiment_service import SentimentService
-from src.session_store import SessionStore
+from src.session_store import create_session_store, start_session_sweeper
+from src.utils.async_runner import BackgroundLoop
+from src.utils.logging_utils import is_enabled as metrics_enabled
+from src.utils.logging_utils import metrics
+from src.utils.singleflight import SingleFlight
 
 
 @st.cache_resource
 def init_dependencies() -> dict:
-    """Khởi tạo và cache toàn bộ services / agents."""
-    embed_service = EmbeddingService()
+    """Khởi tạo và cache toàn bộ services / agents (và event loop nền dùng chung)."""
+    event_loop = BackgroundLoop()
+    atexit.register(event_loop.close)
+    # Có MODEL_SERVER_SOCKET → dùng chung model của scripts/serve_models.py
+    embed_service = (
+        RemoteEmbeddingService(MODEL_SERVER_SOCKET) if MODEL_SERVER_SOCKET else EmbeddingService()
+    )
     rag = NewsRAG(embed_service)
-    session_store = SessionStore()
-    sentiment_service = SentimentService()
+    session_store = create_session_store(SESSION_BACKEND)
+    start_session_sweeper(session_store)
+    sentiment_service = (
+        RemoteSentimentService(MODEL_SERVER_SOCKET) if MODEL_SERVER_SOCKET else SentimentService()
+    )
     language_agent = LanguageAgent()
     retrieval_agent = RetrievalAgent(rag)
     summarizer_agent = SummarizerAgent()
+    llm_cache = ResponseCache() if LLM_CACHE_ENABLED else None
+    answer_cache = (
+        ResponseCache(
+            path=ANSWER_CACHE_FILE,
+            namespace="answers",
+            ttl=ANSWER_CACHE_TTL,
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        )
+        if ANSWER_CACHE_ENABLED
+        else None
+    )
+    intent_extractor = LocalIntentExtractor.from_news(rag.news)
+    singleflight = SingleFlight()
     orchestrator = OrchestratorAgent(
         session_store=session_store,
         language_agent=language_agent,
         retrieval_agent=retrieval_agent,
         summarizer_agent=summarizer_agent,
         sentiment_service=sentiment_service,
+        llm_cache=llm_cache,
+        singleflight=singleflight,
+        intent_extractor=intent_extractor,
+        answer_cache=answer_cache,
     )
 
+    metrics.register_collector("intent_fast_path", intent_extractor.stats)
+    metrics.register_collector("singleflight", singleflight.stats)
+    if llm_cache is not None:
+        metrics.register_collector("llm_cache", llm_cache.stats)
+    if answer_cache is not None:
+        metrics.register_collector("answer_cache", answer_cache.stats)
+
     return {
         "orchestrator": orchestrator,
         "rag": rag,
         "retrieval": retrieval_agent,
         "sentiment": sentiment_service,
+        "intent_extractor": intent_extractor,
+        "event_loop": event_loop,
     }
 
 
+def ask_api(session_id: str, prompt: str, ticker: str | None) -> OrchestratorResult:
+    """Chế độ client mỏng: gửi câu hỏi tới ``API_BASE_URL/ask``."""
+    response = requests.post(
+        f"{API_BASE_URL}/ask",
+        json={"session_id": session_id, "question": prompt, "ticker": ticker},
+        timeout=REQUEST_DEADLINE + 10,
+    )
+    response.raise_for_status()
+    return OrchestratorResult.from_dict(response.json())
+
+
 def main() -> None:
-    deps = init_dependencies()
-    orchestrator: OrchestratorAgent = deps["orchestrator"]
+    # Có API_BASE_URL → không load model trong process Streamlit.
+    deps = None if API_BASE_URL else init_dependencies()
 
     st.set_page_config(page_title="Multi-Agent Financial Assistant", layout="wide")
     st.title("📊 Multi-Agent Financial Research Assistant (Phase 1 MVP)")
@@ -65,49 +129,94 @@ def main() -> None:
         st.header("Bộ lọc nâng cao")
         manual_ticker = st.text_input("Ticker (optional)", "")
         preview_count = st.slider("Số tin hiển thị", 1, 10, 3)
-        similarity_threshold = st.slider(
-            "Ngưỡng tương đồng (RAG)",
-            min_value=0.1,
-            max_value=0.95,
-            value=float(deps["rag"].similarity_threshold),
-            step=0.05,
-        )
-        deps["rag"].set_similarity_threshold(similarity_threshold)
-        if st.button("Tải lại dữ liệu tin tức"):
-            deps["rag"].reload()
-            st.success("Đã tải lại news_index.jsonl")
+        if deps is not None:
+            similarity_threshold = st.slider(
+                "Ngưỡng tương đồng (RAG)",
+                min_value=0.1,
+                max_value=0.95,
+                value=float(deps["rag"].similarity_threshold),
+                step=0.05,
+            )
+            deps["rag"].set_similarity_threshold(similarity_threshold)
+            if st.button("Tải lại dữ liệu tin tức"):
+                deps["rag"].reload()
+                deps["intent_extractor"].refresh_tickers(deps["rag"].news)
+                st.success("Đã tải lại news_index.jsonl")
         st.markdown("---")
         st.subheader("Trạng thái hệ thống")
-        st.write(f"- Tin tức: {len(deps['rag'].news)} bản ghi")
+        if deps is None:
+            st.write(f"- API: {API_BASE_URL}")
+        else:
+            st.write(f"- Tin tức: {len(deps['rag'].news)} bản ghi")
+            extractor_stats = deps["intent_extractor"].stats()
+            st.write(
+                f"- Extract không cần LLM: {extractor_stats['fast_path_rate']:.0%}"
+            )
+        if deps is not None and metrics_enabled():
+            with st.expander("Metrics (Prometheus)"):
+                st.code(metrics.render_prometheus(), language="text")
 
     user_input = st.text_area("Nhập câu hỏi về tài chính (Vi/En)", height=100)
     submit = st.button("Phân tích", type="primary")
 
-    async def run_orchestrator(prompt: str) -> str:
-        return await orchestrator.handle(st.session_state["session_id"], prompt)
+    # Coroutine chạy trên thread của BackgroundLoop (không có ScriptRunContext,
+    # st.session_state ở đó rỗng) → mọi giá trị session đọc ở script thread.
+    async def run_orchestrator(
+        session_id: str, prompt: str, ticker: str | None
+    ) -> OrchestratorResult:
+        orchestrator: OrchestratorAgent = deps["orchestrator"]
+        return await orchestrator.handle_detailed(session_id, prompt, ticker=ticker)
 
     if submit and user_input.strip():
+        session_id = st.session_state["session_id"]
+        ticker = manual_ticker or None
         with st.spinner("Đang phân tích..."):
-            answer = asyncio.run(run_orchestrator(user_input))
+            if deps is None:
+                result = ask_api(session_id, user_input, ticker)
+            else:
+                # Loop nền sống qua các lần rerun: không tạo/huỷ loop mỗi click.
+                result = deps["event_loop"].run(
+                    run_orchestrator(session_id, user_input, ticker)
+                )
+        answer = result.summary
 
         st.session_state["history"].append(
             {"question": user_input, "answer": answer}
         )
 
-        st.success("Hoàn tất phân tích 🎯")
+        st.success("Hoàn tất phân tích 🎯" + (" (từ cache)" if result.cached else ""))
         st.markdown("### Trả lời")
         st.write(answer)
 
-        preview_query = manual_ticker or user_input
-        rag_preview = deps["retrieval"].get_relevant_news(
-            preview_query, ticker=manual_ticker or None, top_k=preview_count
-        )
-        if rag_preview:
+        for trend in result.trends:
+            if not trend.get("articles"):
+                continue
+            with st.expander(
+                f"Xu hướng cảm xúc {trend['ticker']} ({trend['start']} → {trend['end']})"
+            ):
+                st.caption(
+                    f"{trend['articles']} tin · chỉ số ròng {trend['net']:+.2f} · "
+                    f"hướng: {trend['direction']}"
+                )
+                st.bar_chart(
+                    {b["start"]: b["net"] or 0.0 for b in trend["buckets"]}
+                )
+
+        # Render đúng các tin orchestrator đã dùng, không chạy lại RAG.
+        if result.articles:
             st.markdown("### Tin tức đã sử dụng")
-            for item in rag_preview:
+            for article in result.articles[:preview_count]:
+                item = article.item
                 with st.expander(f"{item.date} · {item.title}"):
                     st.write(item.content)
-                    st.caption(f"Ticker: {item.ticker} · ID: {item.id}")
+                    score = f"{article.score:.2f}" if article.score is not None else "n/a"
+                    sentiment = article.sentiment.get("label", "n/a")
+                    st.caption(
+                        f"Ticker: {item.ticker} · ID: {item.id} · "
+                        f"Similarity: {score} · Sentiment: {sentiment}"
+                    )
+        with st.expander("Thời gian xử lý (ms)"):
+            st.json(result.timings)
     else:
         st.info("Nhập câu hỏi rồi bấm Phân tích để bắt đầu.")
 
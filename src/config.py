@@ -15,6 +15,7 @@ PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 MODELS_DIR = PROJECT_ROOT / "models"
 SESSIONS_DIR = PROJECT_ROOT / "sessions"
+CACHE_DIR = PROJECT_ROOT / "cache"
 
 # ============================================================================
 # LLM API Configuration
@@ -27,6 +28,14 @@ LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "")  # Tên model, ví dụ: gpt-4,
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "2000"))
 
+# LLM traffic governor (0 = không giới hạn)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "10.0"))  # seconds
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30.0"))  # seconds
+
 # ============================================================================
 # Embedding Configuration
 # ============================================================================
@@ -49,19 +58,48 @@ FINBERT_DEVICE = os.getenv("FINBERT_DEVICE", "cpu")  # cpu or cuda
 FINBERT_MAX_LENGTH = int(os.getenv("FINBERT_MAX_LENGTH", "512"))
 FINBERT_BATCH_SIZE = int(os.getenv("FINBERT_BATCH_SIZE", "16"))
 
+# ============================================================================
+# CPU Inference Runtime (src/inference_runtime.py)
+# ============================================================================
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))  # 0 = mặc định torch
+TORCH_INTER_OP_THREADS = int(os.getenv("TORCH_INTER_OP_THREADS", "1"))
+# Thread intra-op cho mỗi model (0 = chia đều số core khả dụng giữa các model)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+FINBERT_THREADS = int(os.getenv("FINBERT_THREADS", "0"))
+# Pin model vào tập core, cú pháp taskset (vd "0-3,8"); rỗng = không pin
+EMBEDDING_CPU_CORES = os.getenv("EMBEDDING_CPU_CORES", "")
+FINBERT_CPU_CORES = os.getenv("FINBERT_CPU_CORES", "")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))  # forward đồng thời mỗi model
+INFERENCE_RUNTIME_ENABLED = os.getenv("INFERENCE_RUNTIME_ENABLED", "true").lower() == "true"
+
 # ============================================================================
 # Data Configuration
 # ============================================================================
 NEWS_INDEX_FILE = DATA_DIR / "news_index.jsonl"
 NEWS_RAW_DIR = DATA_DIR / "news_raw"
+NEWS_ARTIFACTS_DIR = DATA_DIR / "index"  # output của scripts/ingest_news.py
+NEWS_INDEX_VERIFY = os.getenv("NEWS_INDEX_VERIFY", "true").lower() == "true"  # crc32 khi load
+NEWS_INDEX_REBUILD_ON_MISMATCH = os.getenv("NEWS_INDEX_REBUILD_ON_MISMATCH", "true").lower() == "true"
 NEWS_INDEX_TYPE = os.getenv("NEWS_INDEX_TYPE", "faiss")  # faiss, json
+# Chuỗi sentiment theo ngày / ticker (src/sentiment_series.py)
+SENTIMENT_TREND_ENABLED = os.getenv("SENTIMENT_TREND_ENABLED", "true").lower() == "true"
+SENTIMENT_TREND_DEFAULT_RANGE = os.getenv("SENTIMENT_TREND_DEFAULT_RANGE", "3 months")  # khi không extract được time_range
+SENTIMENT_TREND_BUCKETS = int(os.getenv("SENTIMENT_TREND_BUCKETS", "6"))  # số giai đoạn trong prompt
 
 # ============================================================================
 # Session Configuration
 # ============================================================================
 SESSIONS_FILE = SESSIONS_DIR / "sessions.json"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "json")  # json, sqlite, journal (chỉ 1 process)
+SESSIONS_DB_FILE = SESSIONS_DIR / "sessions.sqlite3"
+SESSION_COMPACT_INTERVAL = float(os.getenv("SESSION_COMPACT_INTERVAL", "300"))  # seconds
+SESSION_COMPACT_MIN_ENTRIES = int(os.getenv("SESSION_COMPACT_MIN_ENTRIES", "1000"))
+SESSION_JOURNAL_FSYNC = os.getenv("SESSION_JOURNAL_FSYNC", "false").lower() == "true"
 SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", "3600"))  # seconds
 MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "100"))
+MAX_SESSION_HISTORY = int(os.getenv("MAX_SESSION_HISTORY", "50"))  # messages per session
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))  # seconds
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "1.0"))  # 0 = write-through
 
 # ============================================================================
 # Application Configuration
@@ -71,16 +109,62 @@ APP_VERSION = "1.0.0"
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+# Metrics / tracing (tắt mặc định; overhead ~0 khi tắt)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+METRICS_JSON_LOGS = os.getenv("METRICS_JSON_LOGS", "False").lower() == "true"
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))  # số mẫu giữ cho p50/p95/p99
+
 # Streamlit Configuration
 STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", "8501"))
 STREAMLIT_HOST = os.getenv("STREAMLIT_HOST", "localhost")
 
+# ============================================================================
+# HTTP API Configuration
+# ============================================================================
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))  # request xử lý đồng thời
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "32"))  # request chờ tối đa, vượt → 503
+API_MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", str(1024 * 1024)))
+API_HEARTBEAT_INTERVAL = float(os.getenv("API_HEARTBEAT_INTERVAL", "5"))  # seconds (stream)
+# Đặt URL (vd. http://127.0.0.1:8000) để Streamlit chỉ là client mỏng của API
+API_BASE_URL = os.getenv("API_BASE_URL", "").rstrip("/")
+
+# ============================================================================
+# Model Server Configuration
+# ============================================================================
+# Đặt đường dẫn Unix socket để mọi worker dùng chung BGE-M3 + FinBERT của
+# scripts/serve_models.py thay vì tự load model (rỗng = load trong process)
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "")  # bắt buộc khi dùng model server
+MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "64"))  # texts mỗi lần forward
+MODEL_SERVER_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_MAX_WAIT_MS", "5"))  # cửa sổ gộp batch
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "60"))  # seconds
+
 # ============================================================================
 # Agent Configuration
 # ============================================================================
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
 RETRY_DELAY = float(os.getenv("RETRY_DELAY", "1.0"))  # seconds
 AGENT_TIMEOUT = int(os.getenv("AGENT_TIMEOUT", "30"))  # seconds
+# Deadline end-to-end cho một câu hỏi (chia cho extract → RAG → sentiment → summary)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "25"))  # seconds
+# Thời gian tối thiểu để còn gọi LLM tóm tắt; ít hơn → tóm tắt dạng template
+SUMMARY_MIN_BUDGET = float(os.getenv("SUMMARY_MIN_BUDGET", "3"))  # seconds
+
+# ============================================================================
+# Cache Configuration
+# ============================================================================
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+LLM_CACHE_FILE = Path(os.getenv("LLM_CACHE_FILE", str(CACHE_DIR / "llm_cache.sqlite3")))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Cache câu trả lời end-to-end (dùng chung giữa các Streamlit worker qua SQLite)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+ANSWER_CACHE_FILE = Path(os.getenv("ANSWER_CACHE_FILE", str(CACHE_DIR / "answer_cache.sqlite3")))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "900"))  # seconds
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
 
 # ============================================================================
 # RAG Configuration
@@ -88,6 +172,11 @@ AGENT_TIMEOUT = int(os.getenv("AGENT_TIMEOUT", "30"))  # seconds
 RAG_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
 RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "50"))
 RAG_SIMILARITY_THRESHOLD = float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.7"))
+# Retrieval đầu cơ trên câu hỏi gốc lấy top_k * factor ứng viên rồi lọc theo ticker
+RAG_SPECULATIVE_FACTOR = int(os.getenv("RAG_SPECULATIVE_FACTOR", "4"))
+# Có answer cache: retrieval đầu cơ chờ tối đa chừng này (giây) cho lần tra cache,
+# cache hit thì bỏ hẳn search; extraction chậm hơn (đi LLM) thì vẫn search song song
+RAG_SPECULATIVE_CACHE_GRACE = float(os.getenv("RAG_SPECULATIVE_CACHE_GRACE", "0.1"))
 
 # ============================================================================
 # Validation
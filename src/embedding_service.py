@@ -4,7 +4,9 @@ Embedding Service - Sử dụng BGE-M3 model để tạo embeddings
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from typing import List, Union
-from src.config import EMBEDDING_MODEL, EMBEDDING_DEVICE, DEBUG
+from src.config import EMBEDDING_MODEL, EMBEDDING_DEVICE, DEBUG, INFERENCE_RUNTIME_ENABLED
+from src.inference_runtime import get_runtime
+from src.utils.logging_utils import span
 
 
 class EmbeddingService:
@@ -32,6 +34,13 @@ class EmbeddingService:
                 print(f"Embedding model loaded successfully. Dimension: {self.model.get_sentence_embedding_dimension()}")
         except Exception as e:
             raise RuntimeError(f"Failed to load embedding model {self.model_name}: {str(e)}") from e
+
+        # Trên CPU, forward chạy trên executor riêng với số thread/core cố định
+        self.runtime = (
+            get_runtime("embedding")
+            if INFERENCE_RUNTIME_ENABLED and str(self.device) == "cpu"
+            else None
+        )
     
     def encode(
         self, 
@@ -60,13 +69,15 @@ class EmbeddingService:
             raise ValueError("Texts list cannot be empty")
         
         try:
-            embeddings = self.model.encode(
-                texts,
-                normalize_embeddings=normalize_embeddings,
-                batch_size=batch_size,
-                show_progress_bar=show_progress_bar,
-                convert_to_numpy=True
-            )
+            with span("embedding_encode"):
+                encode = self.model.encode if self.runtime is None else self._encode_on_runtime
+                embeddings = encode(
+                    texts,
+                    normalize_embeddings=normalize_embeddings,
+                    batch_size=batch_size,
+                    show_progress_bar=show_progress_bar,
+                    convert_to_numpy=True
+                )
             
             if DEBUG and len(texts) > 1:
                 print(f"Encoded {len(texts)} texts into embeddings of shape {embeddings.shape}")
@@ -76,6 +87,9 @@ class EmbeddingService:
         except Exception as e:
             raise RuntimeError(f"Failed to encode texts: {str(e)}") from e
     
+    def _encode_on_runtime(self, texts: List[str], **kwargs) -> np.ndarray:
+        return self.runtime.call(self.model.encode, texts, **kwargs)
+
     def encode_single(self, text: str, normalize_embeddings: bool = True) -> np.ndarray:
         """
         Encode một text duy nhất
@@ -0,0 +1,437 @@
+"""Versioned binary on-disk format cho news index (metadata + vectors).
+
+Layout của một file ``.idx`` (little-endian)::
+
+    magic      8 bytes   b"FNEWSIDX"
+    header_len uint32
+    header     JSON utf-8: format_version, model, dim, dtype, rows, version,
+               columns, vectors, data_nbytes, crc32
+    padding    tới bội số ALIGN
+    data       các section (mỗi section align ALIGN):
+               - cột string: offsets uint64 (rows + 1) + blob utf-8
+               - cột float:  float64[rows]
+               - vectors:    float32[rows, dim] liền mạch
+
+Offset trong header tính từ đầu vùng data. Khi đọc, file được ``mmap``:
+vectors là ``np.frombuffer`` trên mmap (zero-copy), cột string chỉ decode từng
+dòng khi được truy cập; ``crc32`` phủ toàn bộ
+vùng data để kiểm tra nhanh file hỏng / ghi dở.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import operator
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, overload
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FNEWSIDX"
+FORMAT_VERSION = 1
+ALIGN = 64
+VECTOR_DTYPE = "<f4"
+STRING_COLUMNS = ("id", "title", "content", "date", "ticker", "source", "sentiment_label")
+FLOAT_COLUMNS = ("sentiment_score",)
+_PREFIX = struct.Struct("<8sI")
+_CRC_PLACEHOLDER = "00000000"
+_WRITE_CHUNK_ROWS = 4096
+_COPY_BLOCK_BYTES = 1 << 20
+
+
+class IndexFormatError(ValueError):
+    """File index hỏng, sai magic hoặc format version không hỗ trợ."""
+
+
+class ModelMismatchError(IndexFormatError):
+    """Index được build bằng embedding model / dimension khác."""
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+class StringColumn(Sequence[str]):
+    """Cột string trên mmap: chỉ decode phần tử được truy cập (không copy blob)."""
+
+    def __init__(self, offsets: np.ndarray, blob: memoryview) -> None:
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[str]: ...
+
+    def __getitem__(self, i: int | slice) -> str | List[str]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("column index out of range")
+        return str(self._blob[int(self._offsets[i]):int(self._offsets[i + 1])], "utf-8")
+
+
+@dataclass
+class NewsIndex:
+    """Index đã load: header, các cột metadata và ma trận vectors (view trên mmap)."""
+
+    header: Dict[str, Any]
+    columns: Dict[str, Any]
+    vectors: np.ndarray
+
+    @property
+    def rows(self) -> int:
+        return int(self.header["rows"])
+
+    @property
+    def model(self) -> str:
+        return self.header["model"]
+
+    @property
+    def version(self) -> str:
+        return self.header["version"]
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Dựng lại record thứ ``i`` dạng dict (schema của ``news_ingest``), decode lazy."""
+        record = {name: self.columns[name][i] for name in ("id", "title", "content", "date", "ticker")}
+        source = self.columns["source"][i]
+        if source:
+            record["source"] = source
+        label = self.columns["sentiment_label"][i]
+        if label:
+            record["sentiment"] = {"label": label, "score": float(self.columns["sentiment_score"][i])}
+        return record
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Dựng lại mọi record (decode toàn bộ cột; chỉ dùng cho rebuild / export)."""
+        return [self.record(i) for i in range(self.rows)]
+
+
+def _column_values(records: Sequence[Dict[str, Any]], name: str) -> List[str]:
+    if name == "sentiment_label":
+        return [(r.get("sentiment") or {}).get("label") or "" for r in records]
+    return [str(r.get(name) or "") for r in records]
+
+
+class IndexWriter:
+    """
+    Ghi index theo từng chunk record để RAM chỉ giữ một chunk.
+
+    Mỗi section metadata được spool ra file tạm cạnh ``path``. ``finish``
+    chép các section vào file index (atomic như ``write_index``) rồi xoá
+    file tạm; ``close`` dọn file tạm nếu bỏ dở. Cách dùng::
+
+        with IndexWriter(path) as writer:
+            for chunk in chunks:
+                writer.append(chunk)
+            writer.finish(vectors, model=..., version=...)
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows = 0
+        self._spool = Path(tempfile.mkdtemp(prefix=f".{self.path.name}.", dir=self.path.parent))
+        # Section theo đúng thứ tự layout: offsets + blob từng cột string, rồi cột float.
+        self._sections: Dict[str, Any] = {}
+        for name in STRING_COLUMNS:
+            self._sections[f"{name}.offsets"] = (self._spool / f"{name}.offsets").open("wb")
+            self._sections[f"{name}.data"] = (self._spool / f"{name}.data").open("wb")
+        for name in FLOAT_COLUMNS:
+            self._sections[name] = (self._spool / name).open("wb")
+        self._blob_len = {name: 0 for name in STRING_COLUMNS}
+        for name in STRING_COLUMNS:
+            self._sections[f"{name}.offsets"].write(np.zeros(1, dtype="<u8").tobytes())
+
+    def append(self, records: Sequence[Dict[str, Any]]) -> None:
+        """Thêm metadata của một chunk record (theo thứ tự dòng của vectors)."""
+        if not records:
+            return
+        for name in STRING_COLUMNS:
+            encoded = [value.encode("utf-8") for value in _column_values(records, name)]
+            offsets = self._blob_len[name] + np.cumsum([len(b) for b in encoded], dtype="<u8")
+            self._sections[f"{name}.offsets"].write(offsets.astype("<u8").tobytes())
+            blob = b"".join(encoded)
+            self._sections[f"{name}.data"].write(blob)
+            self._blob_len[name] += len(blob)
+        for name in FLOAT_COLUMNS:
+            scores = np.array(
+                [float((r.get("sentiment") or {}).get("score", np.nan)) for r in records],
+                dtype="<f8",
+            )
+            self._sections[name].write(scores.tobytes())
+        self.rows += len(records)
+
+    def finish(
+        self,
+        vectors: np.ndarray,
+        model: str,
+        version: str,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ghi file index từ metadata đã ``append`` và ``vectors``.
+
+        Args:
+            vectors: float32 (rows × dim); có thể là ``np.memmap``, được copy theo chunk
+            model: Tên embedding model đã tạo vectors
+            version: Content version (invalidate cache khi đổi)
+            extra: Thông tin thêm lưu trong header (vd. thống kê ingest)
+
+        Returns:
+            Header đã ghi
+        """
+        rows = self.rows
+        if vectors.ndim != 2 or vectors.shape[0] != rows:
+            raise ValueError(f"vectors shape {vectors.shape} does not match {rows} records")
+        dim = int(vectors.shape[1])
+        for f in self._sections.values():
+            f.close()
+
+        # Layout các section (offset tính từ đầu vùng data) từ kích thước file spool.
+        layout: List[tuple[int, Path]] = []
+        cursor = 0
+
+        def add_section(key: str) -> List[int]:
+            nonlocal cursor
+            spool_path = self._spool / key
+            size = spool_path.stat().st_size
+            start = _align(cursor)
+            layout.append((start - cursor, spool_path))
+            cursor = start + size
+            return [start, size]
+
+        columns: Dict[str, Any] = {}
+        for name in STRING_COLUMNS:
+            columns[name] = {
+                "kind": "str",
+                "offsets": add_section(f"{name}.offsets"),
+                "data": add_section(f"{name}.data"),
+            }
+        for name in FLOAT_COLUMNS:
+            columns[name] = {"kind": "float64", "data": add_section(name)}
+
+        vector_offset = _align(cursor)
+        vector_nbytes = rows * dim * 4
+        header: Dict[str, Any] = {
+            "format_version": FORMAT_VERSION,
+            "model": model,
+            "dim": dim,
+            "dtype": "float32",
+            "rows": rows,
+            "version": version,
+            "columns": columns,
+            "vectors": [vector_offset, vector_nbytes],
+            "data_nbytes": vector_offset + vector_nbytes,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "crc32": _CRC_PLACEHOLDER,
+            **({"extra": extra} if extra else {}),
+        }
+        header_len = len(json.dumps(header).encode("utf-8"))
+        data_start = _align(_PREFIX.size + header_len)
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        crc = 0
+        with tmp_path.open("wb") as f:
+            f.seek(data_start)
+            for pad, spool_path in layout:
+                padding = b"\0" * pad
+                f.write(padding)
+                crc = zlib.crc32(padding, crc)
+                with spool_path.open("rb") as src:
+                    while block := src.read(_COPY_BLOCK_BYTES):
+                        f.write(block)
+                        crc = zlib.crc32(block, crc)
+            padding = b"\0" * (vector_offset - cursor)
+            f.write(padding)
+            crc = zlib.crc32(padding, crc)
+            for start in range(0, rows, _WRITE_CHUNK_ROWS):
+                chunk = np.ascontiguousarray(
+                    vectors[start:start + _WRITE_CHUNK_ROWS], dtype=VECTOR_DTYPE
+                ).tobytes()
+                f.write(chunk)
+                crc = zlib.crc32(chunk, crc)
+
+            # crc32 dạng 8 ký tự hex nên header giữ nguyên độ dài sau khi điền.
+            header["crc32"] = f"{crc:08x}"
+            header_bytes = json.dumps(header).encode("utf-8")
+            f.seek(0)
+            f.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.close()
+        return header
+
+    def close(self) -> None:
+        """Xoá các file spool tạm (gọi lại nhiều lần không sao)."""
+        for f in self._sections.values():
+            f.close()
+        shutil.rmtree(self._spool, ignore_errors=True)
+
+    def __enter__(self) -> "IndexWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def write_index(
+    path: str | Path,
+    records: Sequence[Dict[str, Any]],
+    vectors: np.ndarray,
+    model: str,
+    version: str,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Ghi index ra file (atomic qua file tạm + ``os.replace``).
+
+    Args:
+        records: Metadata theo thứ tự dòng của ``vectors``
+        vectors: float32 (rows × dim); có thể là ``np.memmap``, được copy theo chunk
+        model: Tên embedding model đã tạo vectors
+        version: Content version (invalidate cache khi đổi)
+        extra: Thông tin thêm lưu trong header (vd. thống kê ingest)
+
+    Returns:
+        Header đã ghi
+    """
+    if vectors.ndim != 2 or vectors.shape[0] != len(records):
+        raise ValueError(f"vectors shape {vectors.shape} does not match {len(records)} records")
+    with IndexWriter(path) as writer:
+        writer.append(records)
+        return writer.finish(vectors, model=model, version=version, extra=extra)
+
+
+def _read_header(mm: mmap.mmap, path: Path) -> tuple[Dict[str, Any], int]:
+    if len(mm) < _PREFIX.size:
+        raise IndexFormatError(f"{path} is too small to be a news index")
+    magic, header_len = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise IndexFormatError(f"{path} is not a news index (bad magic)")
+    try:
+        header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_len])
+    except ValueError as e:
+        raise IndexFormatError(f"{path} has a corrupt header") from e
+    if header.get("format_version") != FORMAT_VERSION:
+        raise IndexFormatError(
+            f"{path} has unsupported format version {header.get('format_version')}"
+        )
+    data_start = _align(_PREFIX.size + header_len)
+    if len(mm) < data_start + int(header["data_nbytes"]):
+        raise IndexFormatError(f"{path} is truncated")
+    return header, data_start
+
+
+def read_header(path: str | Path) -> Dict[str, Any]:
+    """Chỉ đọc header (không map vectors) — dùng để kiểm tra model/version."""
+    path = Path(path)
+    with path.open("rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            raise IndexFormatError(f"{path} is empty") from e
+    with mm:
+        return _read_header(mm, path)[0]
+
+
+def read_index(
+    path: str | Path,
+    model: Optional[str] = None,
+    dim: Optional[int] = None,
+    verify: bool = True,
+) -> NewsIndex:
+    """
+    Load index bằng mmap; vectors và các cột metadata không bị copy (string
+    chỉ được decode khi truy cập từng dòng).
+
+    Args:
+        model: Nếu có, phải khớp model trong header
+        dim: Nếu có, phải khớp dimension trong header
+        verify: Kiểm tra crc32 của vùng data
+
+    Raises:
+        ModelMismatchError: Khác model / dimension
+        IndexFormatError: File hỏng hoặc không đúng format
+    """
+    path = Path(path)
+    with path.open("rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # file rỗng
+            raise IndexFormatError(f"{path} is empty") from e
+    header, data_start = _read_header(mm, path)
+
+    if model is not None and header["model"] != model:
+        raise ModelMismatchError(f"{path} was built with {header['model']}, not {model}")
+    if dim is not None and int(header["dim"]) != int(dim):
+        raise ModelMismatchError(f"{path} has dimension {header['dim']}, expected {dim}")
+    if verify:
+        data = memoryview(mm)[data_start:data_start + int(header["data_nbytes"])]
+        try:
+            if f"{zlib.crc32(data):08x}" != header["crc32"]:
+                raise IndexFormatError(f"{path} failed checksum validation")
+        finally:
+            data.release()
+
+    rows, dim_ = int(header["rows"]), int(header["dim"])
+    columns: Dict[str, Any] = {}
+    for name, spec in header["columns"].items():
+        data_off, data_len = spec["data"]
+        if spec["kind"] == "str":
+            off, _ = spec["offsets"]
+            offsets = np.frombuffer(mm, dtype="<u8", count=rows + 1, offset=data_start + off)
+            blob = memoryview(mm)[data_start + data_off:data_start + data_off + data_len]
+            columns[name] = StringColumn(offsets, blob)
+        else:
+            columns[name] = np.frombuffer(mm, dtype="<f8", count=rows, offset=data_start + data_off)
+
+    vector_offset, _ = header["vectors"]
+    vectors = np.frombuffer(
+        mm, dtype=VECTOR_DTYPE, count=rows * dim_, offset=data_start + vector_offset
+    ).reshape(rows, dim_)
+    return NewsIndex(header=header, columns=columns, vectors=vectors)
+
+
+def rebuild_index(
+    path: str | Path,
+    embed_service: Any,
+    batch_size: int = 256,
+) -> NewsIndex:
+    """Encode lại cột ``content`` bằng ``embed_service`` hiện tại và ghi đè index."""
+    path = Path(path)
+    old = read_index(path)
+    records = old.records()
+    model = getattr(embed_service, "model_name", "unknown")
+    logger.warning("Rebuilding %s with %s (was %s)", path, model, old.model)
+    contents = [r["content"] for r in records]
+    if contents:
+        vectors = np.vstack(
+            [
+                np.asarray(embed_service.encode(contents[i:i + batch_size]), dtype=np.float32)
+                for i in range(0, len(contents), batch_size)
+            ]
+        )
+    else:
+        vectors = np.zeros((0, old.vectors.shape[1]), dtype=np.float32)
+    write_index(path, records, vectors, model, old.version, old.header.get("extra"))
+    return read_index(path, model=model)
@@ -0,0 +1,228 @@
+"""CPU inference runtime: phân bổ thread torch và core cho từng model.
+
+Mặc định torch cho mỗi lời gọi dùng toàn bộ core cho intra-op; khi
+BGE-M3 và FinBERT chạy cùng lúc từ các worker ``to_thread`` thì hai pool
+OpenMP tranh nhau và oversubscribe. Module này:
+
+* đặt số intra-/inter-op thread toàn cục một lần (``configure_torch``);
+* cho mỗi model một ``ModelRuntime`` = executor riêng (số worker cố định),
+  trong đó mỗi worker thread đặt ``torch.set_num_threads`` của nó và, nếu
+  cấu hình, pin vào một tập core bằng ``os.sched_setaffinity``.
+
+Với build OpenMP (mặc định của torch trên Linux) số thread intra-op là
+thiết lập theo từng thread gọi, và thread OpenMP con kế thừa affinity của
+thread tạo ra chúng, nên hai model giữ trong phần core của mình.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from src.config import (
+    EMBEDDING_CPU_CORES,
+    EMBEDDING_THREADS,
+    FINBERT_CPU_CORES,
+    FINBERT_THREADS,
+    INFERENCE_WORKERS,
+    TORCH_INTER_OP_THREADS,
+    TORCH_INTRA_OP_THREADS,
+)
+from src.utils.logging_utils import metrics
+
+try:  # torch là dependency của cả hai model, nhưng module này không bắt buộc nó
+    import torch
+except ImportError:  # pragma: no cover
+    torch = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# (threads, core list) cấu hình cho từng model; 0 / rỗng = tự chia.
+MODEL_SETTINGS = {
+    "embedding": (EMBEDDING_THREADS, EMBEDDING_CPU_CORES),
+    "sentiment": (FINBERT_THREADS, FINBERT_CPU_CORES),
+}
+
+_torch_configured = False
+_runtimes: Dict[str, "ModelRuntime"] = {}
+_lock = threading.Lock()
+
+
+def available_cpus() -> List[int]:
+    """Các core process được phép chạy (tôn trọng cgroup/taskset nếu có)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """``"0-3,6"`` → ``[0, 1, 2, 3, 6]`` (cú pháp giống ``taskset -c``)."""
+    cores: set[int] = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            low, high = part.split("-", 1)
+            if int(high) < int(low):
+                raise ValueError(f"Invalid CPU range: {part!r}")
+            cores.update(range(int(low), int(high) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def configure_torch(
+    intra_op_threads: int = TORCH_INTRA_OP_THREADS,
+    inter_op_threads: int = TORCH_INTER_OP_THREADS,
+) -> Dict[str, int]:
+    """
+    Đặt số thread torch toàn cục (0 = giữ mặc định của torch).
+
+    ``set_num_interop_threads`` chỉ gọi được trước khi torch chạy công việc
+    song song đầu tiên; gọi muộn thì bỏ qua và giữ giá trị hiện tại.
+    """
+    global _torch_configured
+    if torch is None:
+        return {}
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0 and not _torch_configured:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.debug("Inter-op threads already fixed: %s", e)
+    _torch_configured = True
+    return {
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+    }
+
+
+class ModelRuntime:
+    """Executor riêng cho một model, với số thread intra-op và core cố định."""
+
+    def __init__(
+        self,
+        name: str,
+        threads: int,
+        cores: Optional[Sequence[int]] = None,
+        workers: int = 1,
+    ) -> None:
+        self.name = name
+        self.threads = max(1, threads)
+        self.cores = sorted(cores) if cores else None
+        self.workers = max(1, workers)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix=f"inference-{name}",
+            initializer=self._init_worker,
+        )
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.busy_seconds = 0.0
+        self.queued = 0
+
+    def _init_worker(self) -> None:
+        self._local.in_runtime = True
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cores)  # Linux: 0 = thread hiện tại
+            except OSError as e:
+                logger.warning("Cannot pin %s runtime to cores %s: %s", self.name, self.cores, e)
+        if torch is not None:
+            torch.set_num_threads(self.threads)
+            # Torch giữ số thread toàn cục và chỉ áp cho thread ở op song song
+            # đầu tiên: chạy ngay một op song song để giá trị của runtime này
+            # "dính" vào worker, trước khi runtime khác kịp đổi giá trị toàn
+            # cục. Tensor phải vượt grain size (32k phần tử) thì mới chạy song song.
+            warm = torch.ones(256, 256)
+            (warm @ warm).sum()
+
+    def _timed(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._stats_lock:
+            self.queued -= 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._stats_lock:
+                self.calls += 1
+                self.busy_seconds += time.perf_counter() - start
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        with self._stats_lock:
+            self.queued += 1
+        return self._executor.submit(self._timed, fn, *args, **kwargs)
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Chạy ``fn`` trên executor của model và chờ kết quả (gọi lồng nhau chạy luôn)."""
+        if getattr(self._local, "in_runtime", False):
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "threads": self.threads,
+            "workers": self.workers,
+            "cores": len(self.cores) if self.cores else 0,
+            "calls": self.calls,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "queued": max(0, self.queued),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+def plan_allocation(
+    settings: Dict[str, tuple] = MODEL_SETTINGS,
+    cpus: Optional[Sequence[int]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Tính thread/core cho mỗi model.
+
+    Model có core riêng (``*_CPU_CORES``) dùng đúng số core đó; model còn
+    lại chia đều số core khả dụng để tổng thread không vượt số core.
+    """
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    share = max(1, len(cpus) // max(1, len(settings)))
+    plan: Dict[str, Dict[str, Any]] = {}
+    for name, (threads, core_spec) in settings.items():
+        cores = parse_cpu_list(core_spec) if core_spec else None
+        if cores:
+            cores = [c for c in cores if c in cpus] or None
+        auto = len(cores) if cores else share
+        plan[name] = {"threads": threads if threads > 0 else auto, "cores": cores}
+    return plan
+
+
+def get_runtime(name: str) -> ModelRuntime:
+    """Runtime dùng chung trong process cho ``"embedding"`` hoặc ``"sentiment"``."""
+    with _lock:
+        runtime = _runtimes.get(name)
+        if runtime is None:
+            if not _torch_configured:
+                configure_torch()
+            spec = plan_allocation().get(name, {"threads": 1, "cores": None})
+            runtime = ModelRuntime(name, spec["threads"], spec["cores"], INFERENCE_WORKERS)
+            _runtimes[name] = runtime
+            metrics.register_collector(f"inference_{name}", runtime.stats)
+            logger.info(
+                "Inference runtime %s: %d threads, cores=%s, workers=%d",
+                name, runtime.threads, runtime.cores or "all", runtime.workers,
+            )
+        return runtime
+
+
+def shutdown_runtimes() -> None:
+    with _lock:
+        runtimes = list(_runtimes.values())
+        _runtimes.clear()
+    for runtime in runtimes:
+        runtime.shutdown()
@@ -2,7 +2,9 @@
 LLM Client - Gọi LLM API (hosted)
 """
 import requests
+import threading
 import time
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Optional
 from src.config import (
     LLM_API_URL,
@@ -10,18 +12,49 @@ from src.config import (
     LLM_MODEL_NAME,
     LLM_TEMPERATURE,
     LLM_MAX_TOKENS,
+    LLM_MAX_CONCURRENCY,
     MAX_RETRIES,
-    RETRY_DELAY,
     AGENT_TIMEOUT,
     DEBUG
 )
+from src.llm_governor import LLMThrottledError, estimate_tokens, get_llm_governor
+from src.utils.deadline import Deadline
+from src.utils.logging_utils import span
+
+
+class LLMDeadlineExceeded(requests.exceptions.Timeout):
+    """Raised khi deadline của request hết trước khi LLM trả lời."""
+
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session() -> requests.Session:
+    """
+    Session dùng chung cho cả process để tái sử dụng kết nối (keep-alive)
+    
+    Pool size theo LLM_MAX_CONCURRENCY để các batch job song song không
+    phải mở kết nối TLS mới cho mỗi request.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            pool_size = max(LLM_MAX_CONCURRENCY, 1)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
 
 
 def call_llm(
     messages: List[Dict],
     temperature: float = None,
     max_tokens: int = None,
-    timeout: int = None
+    timeout: int = None,
+    deadline: Optional[Deadline] = None
 ) -> str:
     """
     Gọi LLM API để nhận response
@@ -32,6 +65,7 @@ def call_llm(
         temperature: Temperature cho generation (mặc định từ config)
         max_tokens: Max tokens cho response (mặc định từ config)
         timeout: Request timeout in seconds (mặc định từ config)
+        deadline: Deadline tổng cho mọi attempt (timeout/backoff bị cắt theo nó)
     
     Returns:
         str: Response content từ LLM
@@ -39,6 +73,7 @@ def call_llm(
     Raises:
         ValueError: Nếu config không hợp lệ
         requests.RequestException: Nếu API call thất bại
+        LLMDeadlineExceeded: Nếu hết deadline trước khi có response
     """
     # Validate config
     if not LLM_API_URL:
@@ -71,55 +106,83 @@ def call_llm(
     if LLM_API_KEY:
         headers["Authorization"] = f"Bearer {LLM_API_KEY}"
     
-    # Retry logic
+    # Retry logic (qua governor: concurrency, rate limit, circuit breaker)
+    governor = get_llm_governor()
+    prompt_tokens = estimate_tokens(messages)
     last_exception = None
     for attempt in range(MAX_RETRIES):
+        attempt_timeout = timeout
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded(
+                    f"LLM deadline exceeded before attempt {attempt + 1}. "
+                    f"Last error: {last_exception}"
+                )
+            attempt_timeout = min(timeout, remaining)
+
+        # Fail fast nếu provider đang lỗi liên tục
+        governor.check_circuit()
         try:
             if DEBUG and attempt > 0:
                 print(f"Retrying LLM API call (attempt {attempt + 1}/{MAX_RETRIES})...")
             
             # Make API request
-            resp = requests.post(
-                LLM_API_URL,
-                json=payload,
-                headers=headers,
-                timeout=timeout
-            )
+            with governor.slot(prompt_tokens, timeout=attempt_timeout), span("llm_attempt"):
+                resp = _get_http_session().post(
+                    LLM_API_URL,
+                    json=payload,
+                    headers=headers,
+                    timeout=attempt_timeout
+                )
             resp.raise_for_status()
             data = resp.json()
+            governor.record_success()
             
             # Extract response content (hỗ trợ nhiều format)
             content = _extract_content(data)
+            governor.record_usage(len(content) // 4)
             
             if DEBUG:
                 print(f"LLM API call successful (tokens: ~{len(content.split())})")
             
             return content
             
+        except LLMThrottledError:
+            # Hết budget chờ slot/rate limit: không retry, không tính lỗi provider
+            governor.breaker.release_probe()
+            raise
+            
         except requests.exceptions.Timeout:
-            last_exception = f"Request timeout after {timeout}s"
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY * (attempt + 1))  # Exponential backoff
-            continue
+            last_exception = f"Request timeout after {attempt_timeout}s"
+            governor.record_failure()
             
         except requests.exceptions.HTTPError as e:
             last_exception = f"HTTP error {e.response.status_code}: {e.response.text}"
-            # Don't retry on client errors (4xx)
-            if 400 <= e.response.status_code < 500:
+            # 429: provider đang throttle → backoff rồi thử lại, không mở breaker
+            if e.response.status_code == 429:
+                governor.record_throttled()
+            # Don't retry on other client errors (4xx)
+            elif 400 <= e.response.status_code < 500:
+                governor.record_client_error()
                 raise requests.RequestException(last_exception) from e
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY * (attempt + 1))
-            continue
+            else:
+                governor.record_failure()
             
         except requests.exceptions.RequestException as e:
             last_exception = f"Request error: {str(e)}"
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY * (attempt + 1))
-            continue
+            governor.record_failure()
             
         except (KeyError, IndexError) as e:
             last_exception = f"Unexpected response format: {str(e)}"
             raise ValueError(f"Failed to parse LLM response: {last_exception}") from e
+        
+        if attempt < MAX_RETRIES - 1:
+            delay = governor.backoff_delay(attempt)  # Exponential backoff + jitter
+            if deadline is not None:
+                # Không ngủ quá deadline; vòng lặp kế tiếp sẽ raise nếu hết giờ
+                delay = min(delay, deadline.remaining())
+            time.sleep(delay)
     
     # All retries failed
     raise requests.RequestException(
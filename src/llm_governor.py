@@ -0,0 +1,289 @@
+"""
+LLM Governor - Giới hạn concurrency, rate limit và circuit breaker cho LLM API
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import requests
+
+from src.config import (
+    LLM_BACKOFF_MAX,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    RETRY_DELAY,
+)
+from src.utils.logging_utils import metrics
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised khi circuit breaker đang mở: provider lỗi liên tục, fail fast."""
+
+
+class LLMThrottledError(requests.RequestException):
+    """Raised khi không lấy được slot/rate budget trong thời gian cho phép."""
+
+
+class TokenBucket:
+    """Token bucket theo phút; ``rate_per_minute <= 0`` nghĩa là không giới hạn."""
+
+    def __init__(self, rate_per_minute: float) -> None:
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = max(self.rate_per_minute, 0.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(
+            self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0
+        )
+
+    def acquire(self, amount: float = 1.0, timeout: float | None = None) -> float:
+        """
+        Chờ đến khi đủ token rồi trừ đi.
+
+        Returns:
+            float: Thời gian đã phải chờ (giây)
+
+        Raises:
+            TimeoutError: Nếu không đủ token trong ``timeout`` giây
+        """
+        if not self.enabled:
+            return 0.0
+
+        # Một request lớn hơn capacity vẫn phải đi được (chờ bucket đầy).
+        amount = min(float(amount), self.capacity)
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return now - start
+                wait = (amount - self._tokens) * 60.0 / self.rate_per_minute
+
+            if timeout is not None and (now - start) + wait > timeout:
+                raise TimeoutError("Rate limit wait exceeds timeout")
+            time.sleep(min(wait, 1.0))
+
+    def debit(self, amount: float) -> None:
+        """Trừ token sau khi biết usage thực tế (có thể âm → request sau chờ)."""
+        if not self.enabled or amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+
+
+class CircuitBreaker:
+    """Closed → open sau N lỗi liên tiếp → half-open (1 probe) sau reset_timeout."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Trả lại lượt probe half-open khi request không thực sự được gửi."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Ghi nhận lỗi; trả về True nếu breaker vừa chuyển sang open."""
+        if self.failure_threshold <= 0:
+            return False
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class LLMGovernor:
+    """Shared guard around the LLM transport: slots, rate buckets, breaker, backoff."""
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = LLM_CIRCUIT_RESET_TIMEOUT,
+        backoff_base: float = RETRY_DELAY,
+        backoff_max: float = LLM_BACKOFF_MAX,
+    ) -> None:
+        self.max_concurrency = int(max_concurrency)
+        self._slots = (
+            threading.BoundedSemaphore(self.max_concurrency)
+            if self.max_concurrency > 0
+            else None
+        )
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.counters: Dict[str, float] = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "throttled": 0,
+            "client_errors": 0,
+            "retries": 0,
+            "concurrency_waits": 0,
+            "rate_limited_waits": 0,
+            "rate_limited_wait_seconds": 0.0,
+            "circuit_opened": 0,
+            "circuit_rejections": 0,
+        }
+
+    def _incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def check_circuit(self) -> None:
+        """Raise CircuitOpenError nếu breaker không cho request đi qua."""
+        if not self.breaker.allow():
+            self._incr("circuit_rejections")
+            raise CircuitOpenError(
+                "LLM circuit breaker is open; provider is failing, skipping call"
+            )
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0, timeout: float | None = None) -> Iterator[None]:
+        """Giữ một slot concurrency sau khi qua các rate bucket."""
+        try:
+            waited = self.request_bucket.acquire(1, timeout=timeout)
+            waited += self.token_bucket.acquire(estimated_tokens, timeout=timeout)
+        except TimeoutError as e:
+            raise LLMThrottledError(f"LLM rate limit: {e}") from e
+        if waited > 0:
+            self._incr("rate_limited_waits")
+            self._incr("rate_limited_wait_seconds", waited)
+
+        if self._slots is not None:
+            if not self._slots.acquire(blocking=False):
+                self._incr("concurrency_waits")
+                if not self._slots.acquire(timeout=timeout):
+                    raise LLMThrottledError(
+                        "Timed out waiting for an LLM concurrency slot"
+                    )
+
+        with self._lock:
+            self._in_flight += 1
+            self.counters["requests"] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+        self._incr("successes")
+
+    def record_usage(self, completion_tokens: int) -> None:
+        """Trừ completion tokens thực tế khỏi bucket tokens/phút."""
+        self.token_bucket.debit(completion_tokens)
+
+    def record_failure(self) -> None:
+        self._incr("failures")
+        if self.breaker.record_failure():
+            self._incr("circuit_opened")
+
+    def record_throttled(self) -> None:
+        """Provider trả 429: không phải thành công, cũng không reset chuỗi lỗi của breaker."""
+        self.breaker.release_probe()
+        self._incr("throttled")
+
+    def record_client_error(self) -> None:
+        """Provider từ chối request (4xx khác 429): lỗi phía client, không tính vào breaker."""
+        self.breaker.release_probe()
+        self._incr("client_errors")
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff với full jitter để tránh retry storm đồng bộ."""
+        self._incr("retries")
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def stats(self) -> Dict[str, float | str]:
+        with self._lock:
+            snapshot: Dict[str, float | str] = dict(self.counters)
+            snapshot["in_flight"] = self._in_flight
+        snapshot["circuit_state"] = self.breaker.state
+        return snapshot
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Ước lượng thô ~4 ký tự / token cho prompt."""
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+
+
+_default_governor: LLMGovernor | None = None
+_default_lock = threading.Lock()
+
+
+def get_llm_governor() -> LLMGovernor:
+    """Governor dùng chung cho cả process."""
+    global _default_governor
+    with _default_lock:
+        if _default_governor is None:
+            _default_governor = LLMGovernor()
+            metrics.register_collector("llm_governor", _default_governor.stats)
+        return _default_governor
@@ -0,0 +1,397 @@
+"""Load test end-to-end: bắn câu hỏi vào orchestrator (in-process) hoặc HTTP API.
+
+Tải mở (open-loop): request đến theo lịch ``rps`` cố định hoặc Poisson, không
+chờ request trước xong, nên đo được điểm bão hoà thật của một máy. Request
+vượt ``max_in_flight`` bị tính là ``dropped`` thay vì xếp hàng vô hạn.
+
+Báo cáo: throughput đạt được, tỉ lệ lỗi theo loại, latency p50/p99 tổng và
+từng stage (``OrchestratorResult.timings``), tỉ lệ degraded / cached.
+
+Kết hợp ``--mock-llm`` (``src.mock_llm_server``) và ``--deps stub`` (embedder +
+FinBERT giả) để chạy hoàn toàn offline, chỉ đo phần orchestrator + I/O.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import API_BASE_URL, API_PORT, NEWS_INDEX_FILE, PROJECT_ROOT, REQUEST_DEADLINE
+from src.utils.logging_utils import configure_logging
+
+Sender = Callable[[str, str], Awaitable[Dict[str, Any]]]
+
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / "reports" / "bench"
+DEFAULT_QUESTIONS = (
+    "Tin tức mới nhất về AAPL tuần này?",
+    "Phân tích tâm lý thị trường của TSLA 3 tháng gần đây",
+    "What is the latest news about NVDA?",
+    "Summarize market sentiment for MSFT this month",
+    "Giá cổ phiếu FPT hôm nay thế nào?",
+    "How did AMZN stock react to earnings?",
+    "Tình hình Vinamilk quý này ra sao?",
+    "Any recent news on GOOGL?",
+)
+
+
+@dataclass
+class RequestRecord:
+    ok: bool
+    latency: float  # seconds
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    degraded: bool = False
+    cached: bool = False
+
+
+@dataclass
+class LoadResult:
+    records: List[RequestRecord]
+    dropped: int
+    wall_seconds: float
+    offered_rps: float
+    duration: float
+
+
+# ------------------------------------------------------------------ senders
+def orchestrator_sender(orchestrator: Any, deadline: Optional[float] = None) -> Sender:
+    """Gọi thẳng ``OrchestratorAgent.handle_detailed`` trên loop hiện tại."""
+
+    async def send(session_id: str, question: str) -> Dict[str, Any]:
+        result = await orchestrator.handle_detailed(session_id, question, deadline)
+        return result.to_dict()
+
+    return send
+
+
+class HTTPStatusError(RuntimeError):
+    """API trả status >= 400 (ghi vào báo cáo dưới dạng ``"HTTP <status>"``)."""
+
+
+def _error_label(error: BaseException) -> str:
+    return str(error) if isinstance(error, HTTPStatusError) else type(error).__name__
+
+
+class HTTPSender:
+    """POST ``/ask`` của ``src.api_server``; connection pool cỡ ``max_in_flight``."""
+
+    def __init__(self, base_url: str, max_in_flight: int, timeout: float) -> None:
+        self.url = f"{base_url.rstrip('/')}/ask"
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_in_flight))
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="load")
+
+    async def __call__(self, session_id: str, question: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor,
+            partial(
+                self._session.post,
+                self.url,
+                json={"session_id": session_id, "question": question},
+                timeout=self.timeout,
+            ),
+        )
+        if response.status_code >= 400:
+            raise HTTPStatusError(f"HTTP {response.status_code}")
+        return response.json()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+
+# ---------------------------------------------------------------- load loop
+async def run_load(
+    send: Sender,
+    questions: Sequence[str] = DEFAULT_QUESTIONS,
+    rps: float = 5.0,
+    duration: float = 30.0,
+    max_in_flight: int = 64,
+    arrival: str = "poisson",
+    users: int = 50,
+    seed: int = 0,
+) -> LoadResult:
+    """Phát request theo lịch trong ``duration`` giây rồi chờ các request còn dở."""
+    if rps <= 0 or duration <= 0:
+        raise ValueError("rps and duration must be positive")
+    if arrival not in ("poisson", "constant"):
+        raise ValueError("arrival must be 'poisson' or 'constant'")
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    records: List[RequestRecord] = []
+    tasks: List["asyncio.Task[None]"] = []
+    in_flight = 0
+    dropped = 0
+
+    async def one(index: int, question: str) -> None:
+        nonlocal in_flight
+        start = time.perf_counter()
+        try:
+            result = await send(f"load-{index % max(1, users)}", question)
+        except Exception as e:  # noqa: BLE001 - lỗi là một phần của số đo
+            records.append(RequestRecord(False, time.perf_counter() - start, _error_label(e)))
+        else:
+            records.append(
+                RequestRecord(
+                    ok=True,
+                    latency=time.perf_counter() - start,
+                    timings=dict(result.get("timings") or {}),
+                    degraded=bool(result.get("degraded")),
+                    cached=bool(result.get("cached")),
+                )
+            )
+        finally:
+            in_flight -= 1
+
+    started = loop.time()
+    next_at = started
+    index = 0
+    while next_at - started < duration:
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        if in_flight >= max_in_flight:
+            dropped += 1
+        else:
+            in_flight += 1
+            tasks.append(asyncio.create_task(one(index, questions[rng.randrange(len(questions))])))
+        index += 1
+        next_at += rng.expovariate(rps) if arrival == "poisson" else 1.0 / rps
+    if tasks:
+        await asyncio.gather(*tasks)
+    return LoadResult(records, dropped, loop.time() - started, rps, duration)
+
+
+def _percentiles(values: Sequence[float], scale: float = 1.0) -> Dict[str, float]:
+    if not values:
+        return {"p50": None, "p99": None, "mean": None}
+    data = np.asarray(values, dtype=float) * scale
+    return {
+        "p50": round(float(np.percentile(data, 50)), 2),
+        "p99": round(float(np.percentile(data, 99)), 2),
+        "mean": round(float(data.mean()), 2),
+    }
+
+
+def summarize_load(result: LoadResult) -> Dict[str, Any]:
+    ok = [r for r in result.records if r.ok]
+    failed = [r for r in result.records if not r.ok]
+    offered = len(result.records) + result.dropped
+    stages: Dict[str, List[float]] = {}
+    for record in ok:
+        for stage, ms in record.timings.items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        "offered_rps": result.offered_rps,
+        "duration_s": result.duration,
+        "wall_s": round(result.wall_seconds, 3),
+        "requests": offered,
+        "completed": len(ok),
+        "failed": len(failed),
+        "dropped": result.dropped,
+        "throughput_rps": round(len(ok) / result.wall_seconds, 2) if result.wall_seconds else 0.0,
+        "error_rate": round((len(failed) + result.dropped) / offered, 4) if offered else 0.0,
+        "errors": dict(Counter(r.error for r in failed)),
+        "degraded_rate": round(sum(r.degraded for r in ok) / len(ok), 4) if ok else None,
+        "cached_rate": round(sum(r.cached for r in ok) / len(ok), 4) if ok else None,
+        "latency_ms": _percentiles([r.latency for r in ok], 1000),
+        "stages_ms": {stage: _percentiles(values) for stage, values in sorted(stages.items())},
+    }
+
+
+# ------------------------------------------------------------ dependencies
+class StubSentiment:
+    """FinBERT giả, tất định theo nội dung (để load test không cần model)."""
+
+    LABELS = ("positive", "negative", "neutral")
+
+    def analyze(self, texts: Sequence[str]) -> List[Dict[str, Any]]:
+        results = []
+        for text in texts:
+            digest = zlib.crc32(text.encode("utf-8"))
+            results.append(
+                {"text": text, "label": self.LABELS[digest % 3], "score": 0.5 + (digest % 500) / 1000}
+            )
+        return results
+
+
+def build_stub_dependencies(
+    news_path: str | Path = NEWS_INDEX_FILE, workdir: str | Path | None = None
+) -> Dict[str, Any]:
+    """Orchestrator thật với embedder / FinBERT giả và session store tạm."""
+    from src.agents.intent_extractor import LocalIntentExtractor
+    from src.agents.language_agent import LanguageAgent
+    from src.agents.orchestrator_agent import OrchestratorAgent
+    from src.agents.retrieval_agent import RetrievalAgent
+    from src.agents.summarizer_agent import SummarizerAgent
+    from src.rag_news import NewsRAG
+    from src.retrieval_bench import StubEmbedder
+    from src.session_store import SessionStore
+    from src.utils.singleflight import SingleFlight
+
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="load-test-"))
+    rag = NewsRAG(StubEmbedder(), news_path, similarity_threshold=0.0, artifacts_dir=workdir / "no-index")
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(workdir / "sessions.json"),
+        language_agent=LanguageAgent(),
+        retrieval_agent=RetrievalAgent(rag),
+        summarizer_agent=SummarizerAgent(),
+        sentiment_service=StubSentiment(),
+        singleflight=SingleFlight(),
+        intent_extractor=LocalIntentExtractor.from_news(rag.news),
+    )
+    return {"orchestrator": orchestrator, "rag": rag}
+
+
+def build_app_dependencies(mock_llm: bool = False) -> Dict[str, Any]:
+    """``init_dependencies()`` của app; với mock LLM thì bỏ cache LLM/answer persistent."""
+    from src.app import init_dependencies
+
+    deps = init_dependencies()
+    if mock_llm:
+        # Extraction / summary của mock LLM không được ghi vào cache production
+        # (key LLM cache theo tên model thật, answer cache không có model).
+        deps["orchestrator"].llm_cache = None
+        deps["orchestrator"].answer_cache = None
+    return deps
+
+
+def use_llm_endpoint(url: str, model: str) -> None:
+    """Trỏ ``llm_client`` của process này tới endpoint khác (vd. mock LLM)."""
+    from src import llm_client
+
+    llm_client.LLM_API_URL = url
+    llm_client.LLM_MODEL_NAME = model
+
+
+# --------------------------------------------------------------------- CLI
+def print_report(summary: Dict[str, Any]) -> None:
+    latency = summary["latency_ms"]
+    print(
+        f"\nOffered {summary['offered_rps']} rps for {summary['duration_s']}s → "
+        f"{summary['throughput_rps']} rps completed "
+        f"({summary['completed']} ok, {summary['failed']} failed, {summary['dropped']} dropped)"
+    )
+    print(f"Latency ms: p50 {latency['p50']} · p99 {latency['p99']} · mean {latency['mean']}")
+    print(f"Degraded {summary['degraded_rate']} · cached {summary['cached_rate']} · errors {summary['errors']}")
+    print(f"\n{'stage':<22}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, values in summary["stages_ms"].items():
+        print(f"{stage:<22}{values['p50']:>10}{values['p99']:>10}")
+
+
+async def _main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.mock_llm_server import MockLLMServer, config_from_args
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        lines = Path(args.questions).read_text(encoding="utf-8").splitlines()
+        questions = tuple(line.strip() for line in lines if line.strip())
+
+    mock = None
+    if args.mock_llm:
+        mock = MockLLMServer(config_from_args(args, prefix="mock-"))
+        await mock.start()
+        use_llm_endpoint(f"{mock.url}/v1/chat/completions", mock.config.model)
+
+    http_sender: Optional[HTTPSender] = None
+    try:
+        if args.target == "http":
+            http_sender = HTTPSender(args.base_url, args.max_in_flight, args.deadline + 10)
+            send: Sender = http_sender
+        else:
+            if args.deps == "stub":
+                deps = build_stub_dependencies(args.news)
+            else:
+                deps = build_app_dependencies(mock_llm=mock is not None)
+            send = orchestrator_sender(deps["orchestrator"], args.deadline)
+
+        result = await run_load(
+            send,
+            questions,
+            rps=args.rps,
+            duration=args.duration,
+            max_in_flight=args.max_in_flight,
+            arrival=args.arrival,
+            users=args.users,
+            seed=args.seed,
+        )
+        summary = summarize_load(result)
+        if mock is not None:
+            summary["mock_llm"] = mock.stats()
+        return summary
+    finally:
+        if http_sender is not None:
+            http_sender.close()
+        if mock is not None:
+            await mock.close()
+
+
+def main() -> None:
+    from src.mock_llm_server import add_config_arguments
+
+    parser = argparse.ArgumentParser(description="Open-loop load test for the orchestrator or the HTTP API.")
+    parser.add_argument("--target", choices=["inproc", "http"], default="inproc")
+    parser.add_argument(
+        "--deps", choices=["stub", "app"], default="stub",
+        help="inproc only: stub embedder/FinBERT, or the real init_dependencies().",
+    )
+    parser.add_argument("--news", default=str(NEWS_INDEX_FILE), help="News JSONL for --deps stub.")
+    parser.add_argument("--base-url", default=API_BASE_URL or f"http://127.0.0.1:{API_PORT}")
+    parser.add_argument("--rps", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--users", type=int, default=50, help="Distinct session ids.")
+    parser.add_argument("--deadline", type=float, default=REQUEST_DEADLINE)
+    parser.add_argument("--questions", default="", help="Text file, one question per line.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="", help="Result JSON (default: reports/bench/load-<ts>.json).")
+    parser.add_argument(
+        "--mock-llm", action="store_true",
+        help="inproc only: start a local mock LLM and point the LLM client at it "
+        "(with --deps app the persistent LLM/answer caches are disabled).",
+    )
+    add_config_arguments(parser, prefix="mock-")
+    args = parser.parse_args()
+    if args.target == "http" and args.mock_llm:
+        parser.error("--mock-llm only applies to --target inproc; start scripts/mock_llm_server.py "
+                     "and set LLM_API_URL for the API server instead")
+
+    configure_logging()
+    summary = asyncio.run(_main_async(args))
+    summary["meta"] = {
+        "target": args.target,
+        "deps": args.deps if args.target == "inproc" else None,
+        "arrival": args.arrival,
+        "max_in_flight": args.max_in_flight,
+        "mock_llm": args.mock_llm,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    print_report(summary)
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"load-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
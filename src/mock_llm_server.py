@@ -0,0 +1,312 @@
+"""Mock LLM server cục bộ cho load test (không cần ``LLM_API_URL`` thật).
+
+Trả response theo đúng shape mà ``llm_client._extract_content`` parse:
+
+* ``POST /v1/chat/completions`` (và mọi path khác) → OpenAI
+* ``POST /v1/messages``                          → Anthropic
+* ``POST /api/generate``, ``/api/chat``           → Ollama (``response``)
+
+Có thể cấu hình latency (thời gian tới token đầu + jitter), tốc độ sinh
+token, và tỉ lệ lỗi 500 / 429 / treo request. Prompt extraction (yêu cầu
+"strict JSON") nhận JSON ``{"companies", "time_range"}`` nên orchestrator đi
+đúng luồng thật. ``GET /stats`` trả số request theo status, ``POST
+/admin/config`` đổi cấu hình khi đang chạy.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+from src.utils.http_utils import HTTPError, Request, read_request, write_json
+from src.utils.logging_utils import configure_logging
+
+logger = logging.getLogger(__name__)
+
+STYLES = ("auto", "openai", "anthropic", "ollama")
+_TICKER_RE = re.compile(r"\b[A-Z]{2,5}\b")
+_FILLER = (
+    "Market sentiment remains mixed as investors weigh recent earnings, guidance "
+    "and macro signals. Analysts note that momentum depends on upcoming results "
+    "while risk appetite tracks interest rate expectations and sector rotation."
+).split()
+
+
+@dataclass
+class MockLLMConfig:
+    style: str = "auto"
+    latency_ms: float = 300.0  # thời gian tới token đầu
+    jitter_ms: float = 100.0  # cộng thêm ngẫu nhiên đều trong [0, jitter]
+    tokens_per_second: float = 50.0  # 0 = sinh toàn bộ tức thì
+    response_tokens: int = 120
+    error_rate: float = 0.0  # HTTP 500
+    rate_limit_rate: float = 0.0  # HTTP 429 + Retry-After
+    timeout_rate: float = 0.0  # treo ``hang_seconds`` rồi 504
+    hang_seconds: float = 60.0
+    model: str = "mock-llm"
+    seed: Optional[int] = None
+
+    def update(self, values: Dict[str, Any]) -> None:
+        known = {f.name for f in fields(self)}
+        for key, value in values.items():
+            if key not in known:
+                raise HTTPError(400, f"Unknown config field: {key}")
+            current = getattr(self, key)
+            setattr(self, key, type(current)(value) if current is not None else value)
+        if self.style not in STYLES:
+            raise HTTPError(400, f"style must be one of {', '.join(STYLES)}")
+
+
+def style_for_path(path: str, default: str = "openai") -> str:
+    if path.startswith("/v1/messages"):
+        return "anthropic"
+    if path.startswith("/api/generate") or path.startswith("/api/chat"):
+        return "ollama"
+    return default
+
+
+def _prompt_text(payload: Dict[str, Any]) -> str:
+    messages = payload.get("messages")
+    if isinstance(messages, list):
+        return "\n".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+    return str(payload.get("prompt", ""))
+
+
+def completion_text(prompt: str, max_tokens: int, rng: random.Random) -> str:
+    """Nội dung giả: JSON cho prompt extraction, đoạn văn ``max_tokens`` từ cho phần còn lại."""
+    if "strict JSON" in prompt:
+        query = prompt.split("User query:", 1)[-1].split("Extract:", 1)[0]
+        companies = list(dict.fromkeys(_TICKER_RE.findall(query)))
+        return json.dumps({"companies": companies, "time_range": None})
+    start = rng.randrange(len(_FILLER))
+    words = [_FILLER[(start + i) % len(_FILLER)] for i in range(max(1, max_tokens))]
+    return " ".join(words)
+
+
+def render_response(style: str, model: str, text: str, prompt_tokens: int, tokens: int) -> Dict[str, Any]:
+    if style == "anthropic":
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": prompt_tokens, "output_tokens": tokens},
+        }
+    if style == "ollama":
+        return {
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "response": text,
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": tokens,
+        }
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": tokens,
+            "total_tokens": prompt_tokens + tokens,
+        },
+    }
+
+
+class MockLLMServer:
+    """HTTP server giả lập LLM provider trên ``asyncio.start_server``."""
+
+    def __init__(
+        self,
+        config: MockLLMConfig | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or MockLLMConfig()
+        self.host = host
+        self.port = port
+        self._rng = random.Random(self.config.seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.StreamWriter, "asyncio.Task[None]"] = {}
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses: Dict[int, int] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Mock LLM listening on %s (%s)", self.url, asdict(self.config))
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Client (requests pool) giữ connection keep-alive: đóng để handler tự thoát.
+            handlers = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.close()
+            if handlers:
+                await asyncio.wait(handlers, timeout=1.0)
+            await self._server.wait_closed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+        }
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, 8 * 1024 * 1024)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, payload, headers = await self._dispatch(request)
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                await write_json(writer, status, payload, request.keep_alive, headers)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, request: Request) -> Tuple[int, Any, Dict[str, str]]:
+        try:
+            if request.method == "GET" and request.path == "/healthz":
+                return 200, {"status": "ok"}, {}
+            if request.method == "GET" and request.path == "/stats":
+                return 200, self.stats(), {}
+            if request.method == "POST" and request.path == "/admin/config":
+                self.config.update(request.json())
+                return 200, asdict(self.config), {}
+            if request.method != "POST":
+                raise HTTPError(405)
+            return await self._complete(request)
+        except HTTPError as e:
+            return e.status, {"error": {"message": e.message}}, e.headers
+
+    async def _complete(self, request: Request) -> Tuple[int, Any, Dict[str, str]]:
+        payload = request.json()
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        config = self.config
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            roll = self._rng.random()
+            if roll < config.error_rate:
+                await asyncio.sleep(config.latency_ms / 1000)
+                raise HTTPError(500, "Injected upstream error")
+            roll -= config.error_rate
+            if roll < config.rate_limit_rate:
+                raise HTTPError(429, "Injected rate limit", {"Retry-After": "1"})
+            roll -= config.rate_limit_rate
+            if roll < config.timeout_rate:
+                await asyncio.sleep(config.hang_seconds)
+                raise HTTPError(504, "Injected timeout")
+
+            prompt = _prompt_text(payload)
+            prompt_tokens = max(1, len(prompt) // 4)
+            max_tokens = int(payload.get("max_tokens") or config.response_tokens)
+            text = completion_text(prompt, min(max_tokens, config.response_tokens), self._rng)
+            tokens = len(text.split())
+            delay = (config.latency_ms + self._rng.random() * config.jitter_ms) / 1000
+            if config.tokens_per_second > 0:
+                delay += tokens / config.tokens_per_second
+            await asyncio.sleep(delay)
+
+            style = config.style if config.style != "auto" else style_for_path(request.path)
+            model = str(payload.get("model") or config.model)
+            return 200, render_response(style, model, text, prompt_tokens, tokens), {}
+        finally:
+            self.in_flight -= 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local mock LLM server (OpenAI/Anthropic/Ollama shapes).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_config_arguments(parser)
+    return parser
+
+
+def add_config_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    """Thêm flag cho ``MockLLMConfig`` (dùng lại trong scripts/run_load_test.py)."""
+    defaults = MockLLMConfig()
+    parser.add_argument(f"--{prefix}style", choices=STYLES, default=defaults.style)
+    parser.add_argument(f"--{prefix}latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument(f"--{prefix}jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument(f"--{prefix}tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument(f"--{prefix}response-tokens", type=int, default=defaults.response_tokens)
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument(f"--{prefix}rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument(f"--{prefix}timeout-rate", type=float, default=defaults.timeout_rate)
+    parser.add_argument(f"--{prefix}seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace, prefix: str = "") -> MockLLMConfig:
+    attr = prefix.replace("-", "_")
+    return MockLLMConfig(
+        **{
+            name: getattr(args, f"{attr}{name}")
+            for name in (
+                "style", "latency_ms", "jitter_ms", "tokens_per_second", "response_tokens",
+                "error_rate", "rate_limit_rate", "timeout_rate", "seed",
+            )
+        }
+    )
+
+
+def main() -> None:
+    args = _parser().parse_args()
+    configure_logging()
+    server = MockLLMServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"Set LLM_API_URL=http://{args.host}:{args.port}/v1/chat/completions and LLM_MODEL_NAME=mock-llm")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Model server dùng chung: một process giữ BGE-M3 + FinBERT, phục vụ qua Unix socket.
+
+N worker Streamlit / API dùng ``RemoteEmbeddingService`` / ``RemoteSentimentService``
+(cùng interface ``encode`` / ``analyze``) thay vì tự load model, nên chỉ có
+một bộ weights trong RAM và một hàng đợi batching cho mỗi model. Request
+đến trong cửa sổ ``max_wait_ms`` được gộp thành một lần forward.
+
+Transport là ``multiprocessing.connection`` (AF_UNIX, pickle) nên authkey là
+bắt buộc: payload pickle có thể chạy code trong process giữ model, vì vậy
+server/client từ chối chạy khi ``MODEL_SERVER_AUTHKEY`` rỗng. Socket được tạo
+dưới umask 0077 (không có lúc nào user khác truy cập được) rồi chmod 0600.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.config import (
+    FINBERT_MODEL_PATH,
+    MODEL_SERVER_AUTHKEY,
+    MODEL_SERVER_MAX_BATCH,
+    MODEL_SERVER_MAX_WAIT_MS,
+    MODEL_SERVER_SOCKET,
+    MODEL_SERVER_TIMEOUT,
+)
+from src.utils.logging_utils import configure_logging, count, span
+
+logger = logging.getLogger(__name__)
+
+Reply = Callable[[bool, Any], None]
+
+
+def _authkey(value: str | bytes | None) -> bytes:
+    if not value:
+        raise ValueError(
+            "Model server authkey (MODEL_SERVER_AUTHKEY) is required: the transport "
+            "unpickles requests, so an unauthenticated socket allows code execution"
+        )
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+@dataclass
+class _Job:
+    texts: List[str]
+    options: Tuple[Tuple[str, Any], ...]
+    reply: Reply
+
+
+class _Batcher:
+    """Gộp các request cùng model (và cùng options) thành một lần gọi model."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        max_batch: int,
+        max_wait: float,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._carry: Deque[_Job] = deque()
+        self.batches = 0
+        self.requests = 0
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str], options: Dict[str, Any], reply: Reply) -> None:
+        self._queue.put(_Job(texts, tuple(sorted(options.items())), reply))
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _next(self, timeout: Optional[float]) -> Optional[_Job]:
+        if self._carry:
+            return self._carry.popleft()
+        return self._queue.get(timeout=timeout) if timeout is None or timeout > 0 else self._queue.get_nowait()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._next(None)
+            if first is None:
+                return
+            jobs = [first]
+            size = len(first.texts)
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while size < self.max_batch:
+                try:
+                    job = self._next(deadline - time.monotonic())
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                if job.options != first.options or size + len(job.texts) > self.max_batch:
+                    self._carry.append(job)  # để dành cho batch sau
+                    break
+                jobs.append(job)
+                size += len(job.texts)
+            self._run(jobs)
+            if stop:
+                return
+
+    def _run(self, jobs: List[_Job]) -> None:
+        texts = [t for job in jobs for t in job.texts]
+        self.batches += 1
+        self.requests += len(jobs)
+        try:
+            with span("model_server_batch", model=self.name):
+                results = self.fn(texts, **dict(jobs[0].options))
+        except Exception as e:
+            logger.exception("Model server %s batch failed", self.name)
+            for job in jobs:
+                job.reply(False, f"{type(e).__name__}: {e}")
+            return
+        start = 0
+        for job in jobs:
+            end = start + len(job.texts)
+            job.reply(True, results[start:end])
+            start = end
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "queued": self._queue.qsize() + len(self._carry),
+        }
+
+
+class ModelServer:
+    """Phục vụ ``encode`` / ``analyze`` cho nhiều client qua một Unix socket."""
+
+    def __init__(
+        self,
+        embed_service: Any = None,
+        sentiment_service: Any = None,
+        address: str | Path = MODEL_SERVER_SOCKET,
+        authkey: str | bytes | None = MODEL_SERVER_AUTHKEY,
+        max_batch: int = MODEL_SERVER_MAX_BATCH,
+        max_wait_ms: float = MODEL_SERVER_MAX_WAIT_MS,
+    ) -> None:
+        if not address:
+            raise ValueError("Model server address (MODEL_SERVER_SOCKET) is required")
+        self.address = str(address)
+        self.authkey = _authkey(authkey)
+        self.embed_service = embed_service
+        self.sentiment_service = sentiment_service
+        self._batchers: Dict[str, _Batcher] = {}
+        if embed_service is not None:
+            self._batchers["encode"] = _Batcher(
+                "embedding", self._encode, max_batch, max_wait_ms / 1000
+            )
+        if sentiment_service is not None:
+            self._batchers["analyze"] = _Batcher(
+                "sentiment", sentiment_service.analyze, max_batch, max_wait_ms / 1000
+            )
+        self._listener: Optional[Listener] = None
+        self._closed = threading.Event()
+        self.ready = threading.Event()
+
+    def _encode(self, texts: List[str], **options: Any) -> np.ndarray:
+        return self.embed_service.encode(texts, **options)
+
+    def info(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "embedding": self.embed_service is not None,
+            "sentiment": self.sentiment_service is not None,
+            "pid": os.getpid(),
+        }
+        if self.embed_service is not None:
+            info["model_name"] = getattr(self.embed_service, "model_name", None)
+            get_dim = getattr(self.embed_service, "get_embedding_dimension", None)
+            info["dimension"] = int(get_dim()) if callable(get_dim) else None
+        return info
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: batcher.stats() for name, batcher in self._batchers.items()}
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # socket cũ từ lần chạy trước
+        # umask chặt ngay lúc bind: socket chưa bao giờ mở cho user khác.
+        old_umask = os.umask(0o077)
+        try:
+            self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.address, 0o600)
+        logger.info("Model server listening on %s (%s)", self.address, self.info())
+        self.ready.set()
+        try:
+            while not self._closed.is_set():
+                try:
+                    conn = self._listener.accept()
+                except (AuthenticationError, EOFError, OSError) as e:
+                    if self._closed.is_set():
+                        break
+                    logger.warning("Model server rejected connection: %s", e)
+                    continue
+                threading.Thread(
+                    target=self._serve_connection, args=(conn,), daemon=True
+                ).start()
+        finally:
+            self.close()
+
+    def _serve_connection(self, conn: Connection) -> None:
+        send_lock = threading.Lock()
+
+        def reply(ok: bool, payload: Any) -> None:
+            with send_lock:
+                try:
+                    conn.send((ok, payload))
+                except OSError:
+                    pass  # client đã ngắt
+
+        with conn:
+            while not self._closed.is_set():
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    reply(False, f"Bad request: {e}")
+                    continue
+                count("model_server_requests", op=op)
+                if op == "info":
+                    reply(True, self.info())
+                elif op == "stats":
+                    reply(True, self.stats())
+                elif op in self._batchers:
+                    texts, options = args
+                    self._batchers[op].submit(list(texts), dict(options), reply)
+                else:
+                    reply(False, f"Unsupported operation: {op}")
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._listener is not None:
+            # accept() không bị ngắt khi đóng fd từ thread khác → tự kết nối để đánh thức.
+            try:
+                with socket.socket(socket.AF_UNIX) as wake:
+                    wake.connect(self.address)
+            except OSError:
+                pass
+            self._listener.close()
+        for batcher in self._batchers.values():
+            batcher.stop()
+        if os.path.exists(self.address):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+
+class ModelServerClient:
+    """Pool connection tới model server; mỗi connection một request tại một thời điểm."""
+
+    def __init__(
+        self,
+        address: str | Path = MODEL_SERVER_SOCKET,
+        authkey: str | bytes | None = MODEL_SERVER_AUTHKEY,
+        timeout: float = MODEL_SERVER_TIMEOUT,
+        pool_size: int = 8,
+    ) -> None:
+        if not address:
+            raise ValueError("Model server address (MODEL_SERVER_SOCKET) is required")
+        self.address = str(address)
+        self.authkey = _authkey(authkey)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue(maxsize=max(1, pool_size))
+
+    def _connect(self) -> Connection:
+        return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+
+    def call(self, op: str, *args: Any) -> Any:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send((op, args))
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"Model server did not answer {op} within {self.timeout}s")
+            ok, payload = conn.recv()
+        except BaseException:
+            conn.close()  # trạng thái connection không còn tin được
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        if not ok:
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemoteEmbeddingService:
+    """Cùng interface với ``EmbeddingService`` nhưng encode trên model server."""
+
+    def __init__(self, client: ModelServerClient | str | Path = MODEL_SERVER_SOCKET) -> None:
+        self.client = client if isinstance(client, ModelServerClient) else ModelServerClient(client)
+        info = self.client.call("info")
+        if not info.get("embedding"):
+            raise RuntimeError("Model server does not serve embeddings")
+        self.model_name = info.get("model_name")
+        self.device = "remote"
+        self._dimension = info.get("dimension")
+
+    def encode(
+        self,
+        texts: Union[str, List[str]],
+        normalize_embeddings: bool = True,
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            raise ValueError("Texts list cannot be empty")
+        with span("embedding_encode", remote=True):
+            return self.client.call(
+                "encode", list(texts), {"normalize_embeddings": normalize_embeddings}
+            )
+
+    def encode_single(self, text: str, normalize_embeddings: bool = True) -> np.ndarray:
+        return self.encode(text, normalize_embeddings=normalize_embeddings)[0]
+
+    def get_embedding_dimension(self) -> int:
+        return int(self._dimension)
+
+
+class RemoteSentimentService:
+    """Cùng interface với ``SentimentService`` nhưng chạy FinBERT trên model server."""
+
+    def __init__(self, client: ModelServerClient | str | Path = MODEL_SERVER_SOCKET) -> None:
+        self.client = client if isinstance(client, ModelServerClient) else ModelServerClient(client)
+        if not self.client.call("info").get("sentiment"):
+            raise RuntimeError("Model server does not serve sentiment")
+
+    def analyze(self, texts: Sequence[str]) -> List[Dict[str, float | str]]:
+        texts = list(texts)
+        for text in texts:
+            if not isinstance(text, str):
+                raise TypeError("Each item in texts must be a string")
+        if not texts:
+            return []
+        with span("sentiment_analyze", remote=True):
+            return self.client.call("analyze", texts, {})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load BGE-M3 + FinBERT once and serve batched encode/analyze over a Unix socket."
+    )
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET, required=not MODEL_SERVER_SOCKET)
+    parser.add_argument("--max-batch", type=int, default=MODEL_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MODEL_SERVER_MAX_WAIT_MS)
+    parser.add_argument("--no-sentiment", action="store_true", help="Chỉ phục vụ embedding.")
+    args = parser.parse_args()
+
+    configure_logging()
+    from src.embedding_service import EmbeddingService
+
+    sentiment_service = None
+    if not args.no_sentiment:
+        if FINBERT_MODEL_PATH.exists():
+            from src.sentiment_service import SentimentService
+
+            sentiment_service = SentimentService()
+        else:
+            logger.warning("FinBERT model not found at %s; serving embeddings only", FINBERT_MODEL_PATH)
+
+    server = ModelServer(
+        EmbeddingService(),
+        sentiment_service,
+        address=args.socket,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
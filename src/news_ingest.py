@@ -0,0 +1,357 @@
+"""Streaming ingestion: raw news files → ready-to-serve index artifacts.
+
+Pipeline (mỗi stage một thread, nối bằng queue có giới hạn để có backpressure):
+
+    read + validate + dedupe  →  embed  →  FinBERT sentiment  →  writer
+
+Output là một file ``news.idx`` trong ``output_dir`` theo format của
+``src.index_format`` (header tự mô tả + metadata dạng cột + block vectors),
+được ghi atomic nên app process chỉ cần mmap kết quả đã hoàn chỉnh. Khi có
+FinBERT, writer còn gom sentiment theo (ticker, ngày) vào
+``sentiment_series.npz`` (xem ``src.sentiment_series``).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import NEWS_ARTIFACTS_DIR, NEWS_RAW_DIR
+from src.index_format import write_index
+from src.sentiment_series import SERIES_FILE, SentimentSeries
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "news.idx"
+
+RAW_PATTERNS = ("*.json", "*.jsonl", "*.ndjson")
+READ_CHUNK_SIZE = 1 << 16
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%d-%m-%Y", "%b %d, %Y", "%d %b %Y", "%B %d, %Y")
+_SEPARATORS = " \t\r\n,[]"
+
+
+class RecordError(ValueError):
+    """Bản ghi không hợp lệ (thiếu field, date sai...)."""
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    read: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    written: int = 0
+    seconds: float = 0.0
+    reject_reasons: Counter = field(default_factory=Counter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["reject_reasons"] = dict(self.reject_reasons)
+        return data
+
+
+# --------------------------------------------------------------------- reading
+def iter_json_records(path: str | Path, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Stream từng JSON value top-level từ một file, không đọc cả file vào RAM.
+
+    Hỗ trợ JSON array (``[{...}, {...}]``), JSON Lines và các object nối
+    tiếp nhau; dùng ``JSONDecoder.raw_decode`` trên buffer trượt.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    with Path(path).open("r", encoding="utf-8") as f:
+        while True:
+            while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+                pos += 1
+            if pos >= len(buffer):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer, pos = chunk, 0
+                continue
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise RecordError(f"Truncated or malformed JSON in {path} at char {pos}")
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield obj
+            pos = end
+            if pos > chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+
+def normalize_date(value: Any) -> str:
+    """Chuẩn hoá về ``YYYY-MM-DD``; nhận ISO datetime, vài format phổ biến và epoch."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000 if value > 1e11 else value  # epoch ms hoặc s
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+    if not isinstance(value, str) or not value.strip():
+        raise RecordError("missing_date")
+    text = value.strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise RecordError("invalid_date")
+
+
+def _clean_text(value: Any) -> str:
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def normalize_record(obj: Any) -> Dict[str, Any]:
+    """Validate + chuẩn hoá một bản ghi raw thành schema của ``NewsItem``."""
+    if not isinstance(obj, dict):
+        raise RecordError("not_an_object")
+
+    title = _clean_text(obj.get("title"))
+    content = _clean_text(obj.get("content") or obj.get("body") or obj.get("summary"))
+    if not content:
+        raise RecordError("missing_content")
+    ticker = _clean_text(obj.get("ticker") or obj.get("symbol")).lstrip("$").upper()
+    if not ticker:
+        raise RecordError("missing_ticker")
+    date = normalize_date(obj.get("date") or obj.get("published_at"))
+
+    article_id = _clean_text(obj.get("id"))
+    if not article_id:
+        digest = hashlib.sha1(f"{ticker}|{date}|{title}|{content}".encode("utf-8"))
+        article_id = f"n_{digest.hexdigest()[:12]}"
+
+    record: Dict[str, Any] = {
+        "id": article_id,
+        "title": title or content[:120],
+        "content": content,
+        "date": date,
+        "ticker": ticker,
+    }
+    source = _clean_text(obj.get("source"))
+    if source:
+        record["source"] = source
+    return record
+
+
+def content_fingerprint(record: Dict[str, Any]) -> str:
+    text = f"{record['title']}\n{record['content']}".casefold()
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def iter_raw_files(raw_dir: str | Path, patterns: Iterable[str] = RAW_PATTERNS) -> List[Path]:
+    raw_dir = Path(raw_dir)
+    files = {p for pattern in patterns for p in raw_dir.glob(pattern) if p.is_file()}
+    return sorted(files)
+
+
+# -------------------------------------------------------------------- pipeline
+_DONE = object()
+
+
+class _StageFailed:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def _put(q: "queue.Queue[Any]", item: Any, cancel: threading.Event) -> None:
+    while not cancel.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q: "queue.Queue[Any]", cancel: threading.Event) -> Any:
+    while not cancel.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _run_stage(
+    fn: Any,
+    inbox: Optional["queue.Queue[Any]"],
+    outbox: "queue.Queue[Any]",
+    cancel: threading.Event,
+) -> None:
+    """Chạy một stage: đọc inbox (nếu có), đẩy kết quả sang outbox, truyền lỗi xuống dưới."""
+    try:
+        if inbox is None:
+            for item in fn():
+                _put(outbox, item, cancel)
+        else:
+            while True:
+                item = _get(inbox, cancel)
+                if item is _DONE or isinstance(item, _StageFailed):
+                    _put(outbox, item, cancel)
+                    return
+                _put(outbox, fn(item), cancel)
+        _put(outbox, _DONE, cancel)
+    except BaseException as e:  # noqa: BLE001 - chuyển lỗi cho writer re-raise
+        _put(outbox, _StageFailed(e), cancel)
+
+
+def ingest_news(
+    embed_service: Any,
+    sentiment_service: Any = None,
+    raw_dir: str | Path = NEWS_RAW_DIR,
+    output_dir: str | Path = NEWS_ARTIFACTS_DIR,
+    batch_size: int = 64,
+    queue_size: int = 4,
+) -> IngestStats:
+    """
+    Chạy pipeline ingest và ghi ``output_dir/news.idx``.
+
+    Args:
+        embed_service: Có ``encode(texts) -> np.ndarray`` (đã normalize)
+        sentiment_service: Có ``analyze(texts)``; None → bỏ qua sentiment
+        batch_size: Số bài mỗi batch embed / FinBERT
+        queue_size: Số batch tối đa chờ giữa hai stage
+
+    Returns:
+        IngestStats
+    """
+    started = time.perf_counter()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stats = IngestStats()
+    cancel = threading.Event()
+    to_embed: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+    to_score: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+    to_write: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+
+    def read_batches() -> Iterator[List[Dict[str, Any]]]:
+        seen_ids: set[str] = set()
+        seen_content: set[str] = set()
+        batch: List[Dict[str, Any]] = []
+        for path in iter_raw_files(raw_dir):
+            stats.files += 1
+            try:
+                for obj in iter_json_records(path):
+                    stats.read += 1
+                    try:
+                        record = normalize_record(obj)
+                    except RecordError as e:
+                        stats.rejected += 1
+                        stats.reject_reasons[str(e)] += 1
+                        continue
+                    fingerprint = content_fingerprint(record)
+                    if record["id"] in seen_ids or fingerprint in seen_content:
+                        stats.duplicates += 1
+                        continue
+                    seen_ids.add(record["id"])
+                    seen_content.add(fingerprint)
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            except RecordError as e:
+                logger.warning("%s", e)
+                stats.reject_reasons["malformed_file"] += 1
+        if batch:
+            yield batch
+
+    def embed(batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        vectors = embed_service.encode([r["content"] for r in batch])
+        return batch, np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def score(item: Tuple[List[Dict[str, Any]], np.ndarray]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        batch, vectors = item
+        if sentiment_service is not None:
+            results = sentiment_service.analyze([r["content"] for r in batch])
+            for record, result in zip(batch, results):
+                record["sentiment"] = {"label": result["label"], "score": float(result["score"])}
+        return batch, vectors
+
+    threads = [
+        threading.Thread(target=_run_stage, args=(read_batches, None, to_embed, cancel), daemon=True),
+        threading.Thread(target=_run_stage, args=(embed, to_embed, to_score, cancel), daemon=True),
+        threading.Thread(target=_run_stage, args=(score, to_score, to_write, cancel), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Vectors được spool ra file tạm theo từng batch, metadata giữ trong RAM
+    # (nhỏ hơn nhiều so với vectors), rồi ghi một lần thành file index.
+    tmp_vectors = output_dir / f"{INDEX_FILE}.vectors.tmp"
+    records: List[Dict[str, Any]] = []
+    version = hashlib.sha1()
+    dim: Optional[int] = None
+    try:
+        with tmp_vectors.open("wb") as vec:
+            while True:
+                item = _get(to_write, cancel)
+                if item is _DONE:
+                    break
+                if isinstance(item, _StageFailed):
+                    raise item.error
+                batch, vectors = item
+                if dim is None:
+                    dim = int(vectors.shape[1])
+                elif vectors.shape[1] != dim:
+                    raise ValueError(f"Embedding dimension changed: {vectors.shape[1]} != {dim}")
+                for record in batch:
+                    version.update(json.dumps(record, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+                records.extend(batch)
+                vec.write(vectors.tobytes())
+                stats.written += len(batch)
+
+        stats.seconds = round(time.perf_counter() - started, 3)
+        shape = (len(records), dim or 0)
+        vectors = (
+            np.memmap(tmp_vectors, dtype=np.float32, mode="r", shape=shape)
+            if records
+            else np.zeros(shape, dtype=np.float32)
+        )
+        write_index(
+            output_dir / INDEX_FILE,
+            records,
+            vectors,
+            model=getattr(embed_service, "model_name", "unknown"),
+            version=version.hexdigest()[:16],
+            extra={"sentiment": sentiment_service is not None, "ingest": stats.to_dict()},
+        )
+        del vectors
+        series_path = output_dir / SERIES_FILE
+        if sentiment_service is not None:
+            SentimentSeries.from_records(
+                (
+                    (r["ticker"], r["date"], r["sentiment"]["label"], r["sentiment"]["score"])
+                    for r in records
+                    if r.get("sentiment")
+                ),
+                version=version.hexdigest()[:16],
+            ).save(series_path)
+        else:
+            # Series cũ không còn khớp với index mới.
+            series_path.unlink(missing_ok=True)
+    except BaseException:
+        cancel.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join(timeout=1)
+        tmp_vectors.unlink(missing_ok=True)
+
+    return stats
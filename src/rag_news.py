@@ -1,20 +1,36 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
+import operator
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple, overload
 
 import numpy as np
 
 from src.config import (
     DEBUG,
+    NEWS_ARTIFACTS_DIR,
     NEWS_INDEX_FILE,
+    NEWS_INDEX_REBUILD_ON_MISMATCH,
+    NEWS_INDEX_VERIFY,
     RAG_SIMILARITY_THRESHOLD,
+    SENTIMENT_TREND_ENABLED,
     TOP_K_RESULTS,
 )
 from src.embedding_service import EmbeddingService
+from src.index_format import (
+    IndexFormatError,
+    ModelMismatchError,
+    NewsIndex,
+    read_index,
+    rebuild_index,
+)
+from src.news_ingest import INDEX_FILE
+from src.sentiment_series import SERIES_FILE, SentimentSeries, SentimentTrend
+from src.utils.logging_utils import span
 
 
 @dataclass(slots=True)
@@ -26,30 +42,91 @@ class NewsItem:
     content: str
     date: str
     ticker: str
+    sentiment: Optional[Dict[str, Any]] = None  # FinBERT tính sẵn lúc ingest
+
+
+class IndexedNews(Sequence[NewsItem]):
+    """Các ``NewsItem`` của ``news.idx``, dựng từ cột mmap khi được truy cập.
+
+    RAM lúc khởi động không tăng theo số tin; mỗi hit chỉ decode một dòng.
+    """
+
+    def __init__(self, index: NewsIndex) -> None:
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._index.rows
+
+    @overload
+    def __getitem__(self, i: int) -> NewsItem: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[NewsItem]: ...
+
+    def __getitem__(self, i: int | slice) -> NewsItem | List[NewsItem]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("news index out of range")
+        obj = self._index.record(i)
+        return NewsItem(
+            id=obj["id"],
+            title=obj["title"],
+            content=obj["content"],
+            date=obj["date"],
+            ticker=obj["ticker"],
+            sentiment=obj.get("sentiment"),
+        )
 
 
 class NewsRAG:
-    """Simple JSONL-based news retriever using dense embeddings."""
+    """Simple JSONL-based news retriever using dense embeddings.
+
+    Nếu có ``news.idx`` từ ``scripts/ingest_news.py`` (mặc định trong thư mục
+    ``index/`` cạnh ``index_path``), embeddings được memory-map thay vì encode
+    lại toàn bộ tin mỗi lần khởi động; metadata cũng đọc lazy từ mmap
+    (``IndexedNews``). Index build bằng model khác sẽ được
+    rebuild (hoặc từ chối nếu tắt ``NEWS_INDEX_REBUILD_ON_MISMATCH``).
+    ``sentiment_series.npz`` cùng thư mục (nếu khớp version index) cho phép
+    trả xu hướng sentiment theo ticker mà không chạy lại FinBERT.
+    """
 
     def __init__(
         self,
         embed_service: EmbeddingService,
         index_path: str | Path = NEWS_INDEX_FILE,
         similarity_threshold: float = RAG_SIMILARITY_THRESHOLD,
+        artifacts_dir: str | Path | None = None,
     ) -> None:
         self.embed_service = embed_service
         self.logger = logging.getLogger(__name__)
         self.index_path = Path(index_path)
+        self.artifacts_dir = (
+            Path(artifacts_dir)
+            if artifacts_dir is not None
+            else self.index_path.parent / NEWS_ARTIFACTS_DIR.name
+        )
         self.similarity_threshold = similarity_threshold
-        self.news: List[NewsItem] = []
+        self.news: Sequence[NewsItem] = []
+        self._tickers: Sequence[str] = []  # lọc ticker mà không dựng NewsItem
         self.embeddings: np.ndarray | None = None
+        self.version = "empty"
+        self.sentiment_series: SentimentSeries | None = None
         self._load()
+        self._load_sentiment_series()
 
     def _load(self) -> None:
-        """Load news và embeddings từ file JSONL (mỗi dòng 1 object)."""
+        """Load artifacts đã ingest nếu có, không thì đọc + encode file JSONL."""
+        if self._load_artifacts():
+            return
+        self._tickers = []
         if not self.index_path.exists():
             self.news = []
             self.embeddings = None
+            self.version = "empty"
             return
 
         with self.index_path.open("r", encoding="utf-8") as f:
@@ -58,6 +135,7 @@ class NewsRAG:
         if not raw:
             self.news = []
             self.embeddings = None
+            self.version = "empty"
             return
 
         if raw.startswith("["):
@@ -83,7 +161,10 @@ class NewsRAG:
             texts.append(item.content)
 
         self.news = news
+        self._tickers = [item.ticker for item in news]
         self.embeddings = self.embed_service.encode(texts) if texts else None
+        # Snapshot version: đổi nội dung file → version mới (invalidate cache).
+        self.version = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
         if DEBUG:
             self.logger.info(
                 "NewsRAG loaded %s articles (embeddings ready=%s)",
@@ -91,9 +172,77 @@ class NewsRAG:
                 self.embeddings is not None,
             )
 
+    def _expected_dimension(self) -> Optional[int]:
+        get_dim = getattr(self.embed_service, "get_embedding_dimension", None)
+        return int(get_dim()) if callable(get_dim) else None
+
+    def _load_artifacts(self) -> bool:
+        path = self.artifacts_dir / INDEX_FILE
+        if not path.exists():
+            return False
+        model = getattr(self.embed_service, "model_name", None)
+        try:
+            index = read_index(
+                path, model=model, dim=self._expected_dimension(), verify=NEWS_INDEX_VERIFY
+            )
+        except ModelMismatchError:
+            if not NEWS_INDEX_REBUILD_ON_MISMATCH:
+                raise
+            index = rebuild_index(path, self.embed_service)
+        except IndexFormatError as e:
+            self.logger.warning("Ignoring news index %s: %s", path, e)
+            return False
+        if self.index_path.exists() and self.index_path.stat().st_mtime > path.stat().st_mtime:
+            self.logger.warning(
+                "News index %s is older than %s; serving the index, "
+                "re-run scripts/ingest_news.py to pick up the newer news",
+                path,
+                self.index_path,
+            )
+
+        self.news = IndexedNews(index)
+        self._tickers = index.columns["ticker"]
+        self.embeddings = index.vectors if index.rows else None
+        self.version = index.version
+        if DEBUG:
+            self.logger.info(
+                "NewsRAG memory-mapped %s articles from %s (model=%s)",
+                len(self.news),
+                path,
+                index.model,
+            )
+        return True
+
+    def _load_sentiment_series(self) -> None:
+        """Series build lúc ingest; thiếu / lệch version → build lại từ sentiment trong RAM."""
+        self.sentiment_series = None
+        if not SENTIMENT_TREND_ENABLED:
+            return
+        path = self.artifacts_dir / SERIES_FILE
+        if path.exists():
+            try:
+                series = SentimentSeries.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.warning("Ignoring sentiment series %s: %s", path, e)
+            else:
+                if series.version == self.version:
+                    self.sentiment_series = series
+                    return
+        series = SentimentSeries.from_news(self.news, version=self.version)
+        self.sentiment_series = series if len(series) else None
+
+    def sentiment_trend(
+        self, ticker: str, time_range: Optional[str] = None
+    ) -> Optional[SentimentTrend]:
+        """Xu hướng sentiment của ``ticker`` trong ``time_range`` (None nếu không có dữ liệu)."""
+        if self.sentiment_series is None or not ticker:
+            return None
+        return self.sentiment_series.trend(ticker, time_range)
+
     def reload(self) -> None:
         """Cho phép refresh dữ liệu tin tức từ file."""
         self._load()
+        self._load_sentiment_series()
 
     def search(
         self,
@@ -102,6 +251,24 @@ class NewsRAG:
         top_k: int = TOP_K_RESULTS,
     ) -> List[NewsItem]:
         """Tìm các bản tin phù hợp nhất với query và ticker (nếu cung cấp)."""
+        return [item for item, _ in self.search_scored(query, ticker, top_k)]
+
+    def search_scored(
+        self,
+        query: str,
+        ticker: Optional[str] = None,
+        top_k: int = TOP_K_RESULTS,
+    ) -> List[Tuple[NewsItem, float]]:
+        """Như `search` nhưng kèm cosine similarity của từng bản tin."""
+        with span("rag_search"):
+            return self._search(query, ticker, top_k)
+
+    def _search(
+        self,
+        query: str,
+        ticker: Optional[str],
+        top_k: int,
+    ) -> List[Tuple[NewsItem, float]]:
         if not query.strip():
             if DEBUG:
                 self.logger.info("NewsRAG search aborted: empty query.")
@@ -116,9 +283,63 @@ class NewsRAG:
 
         q_emb = self.embed_service.encode([query])[0]
         sims = self.embeddings @ q_emb  # cosine similarity vì đã normalize
+        results = self._rank(sims, ticker, top_k)
 
+        if DEBUG:
+            self.logger.info(
+                "NewsRAG search '%s' (ticker=%s) -> %s results (threshold=%.2f)",
+                query,
+                ticker,
+                len(results),
+                self.similarity_threshold,
+            )
+
+        return results
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        tickers: Sequence[Optional[str]] | None = None,
+        top_k: int = TOP_K_RESULTS,
+    ) -> List[List[NewsItem]]:
+        """Search nhiều query với một lần encode batch (dùng cho batch job)."""
+        return [
+            [item for item, _ in scored]
+            for scored in self.search_many_scored(queries, tickers, top_k)
+        ]
+
+    def search_many_scored(
+        self,
+        queries: Sequence[str],
+        tickers: Sequence[Optional[str]] | None = None,
+        top_k: int = TOP_K_RESULTS,
+    ) -> List[List[Tuple[NewsItem, float]]]:
+        """Như `search_many` nhưng kèm cosine similarity của từng bản tin."""
+        tickers = list(tickers) if tickers is not None else [None] * len(queries)
+        if len(tickers) != len(queries):
+            raise ValueError("queries and tickers must have the same length")
+
+        results: List[List[Tuple[NewsItem, float]]] = [[] for _ in queries]
+        if self.embeddings is None or not self.news:
+            return results
+
+        active = [i for i, q in enumerate(queries) if q.strip()]
+        if not active:
+            return results
+
+        with span("rag_search_many"):
+            q_embs = self.embed_service.encode([queries[i] for i in active])
+            sims_matrix = self.embeddings @ q_embs.T  # (n_docs, n_queries)
+            for col, i in enumerate(active):
+                results[i] = self._rank(sims_matrix[:, col], tickers[i], top_k)
+
+        return results
+
+    def _rank(
+        self, sims: np.ndarray, ticker: Optional[str], top_k: int
+    ) -> List[Tuple[NewsItem, float]]:
         ordered_idxs = np.argsort(-sims)
-        results: List[NewsItem] = []
+        results: List[Tuple[NewsItem, float]] = []
         ticker_lower = ticker.lower() if ticker else None
 
         for idx in ordered_idxs:
@@ -126,23 +347,13 @@ class NewsRAG:
             if sim < self.similarity_threshold:
                 break
 
-            item = self.news[idx]
-            if ticker_lower and item.ticker.lower() != ticker_lower:
+            if ticker_lower and self._tickers[idx].lower() != ticker_lower:
                 continue
 
-            results.append(item)
+            results.append((self.news[idx], float(sim)))
             if len(results) >= top_k:
                 break
 
-        if DEBUG:
-            self.logger.info(
-                "NewsRAG search '%s' (ticker=%s) -> %s results (threshold=%.2f)",
-                query,
-                ticker,
-                len(results),
-                self.similarity_threshold,
-            )
-
         return results
 
     def set_similarity_threshold(self, threshold: float) -> None:
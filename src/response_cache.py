@@ -0,0 +1,174 @@
+"""Persistent TTL + size-bounded cache cho các response tốn kém (LLM, ...)."""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.config import LLM_CACHE_FILE, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hóa text để các cách gõ giống nhau cho cùng một key."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split()).casefold()
+
+
+def make_key(*parts: Any) -> str:
+    """Tạo key ổn định (sha256) từ các thành phần JSON-serializable."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_llm_key(
+    messages: List[Dict], model: str, temperature: float
+) -> str:
+    """Key cho một LLM call: prompt đã chuẩn hóa + model + temperature."""
+    normalized = [
+        (m.get("role", ""), normalize_text(str(m.get("content", ""))))
+        for m in messages
+    ]
+    return make_key("llm", normalized, model, round(float(temperature), 4))
+
+
+class ResponseCache:
+    """SQLite-backed key/value cache with TTL expiry and LRU eviction.
+
+    The database is opened lazily on first use so constructing the cache is
+    free, and SQLite's own locking makes it safe to share between processes.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = LLM_CACHE_FILE,
+        namespace: str = "llm",
+        ttl: float = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.path = Path(path)
+        self.namespace = namespace
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=5.0, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_accessed"
+                " ON cache (namespace, accessed_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Trả về value còn hạn hoặc None."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM cache"
+                " WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl > 0 and now - created_at > self.ttl:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                conn.commit()
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE cache SET accessed_at = ?"
+                " WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Lưu value và evict các entry cũ nhất nếu vượt quá max_entries."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache"
+                " (namespace, key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, now, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.ttl),
+            )
+        if self.max_entries <= 0:
+            return
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE rowid IN ("
+                " SELECT rowid FROM cache WHERE namespace = ?"
+                " ORDER BY accessed_at ASC LIMIT ?)",
+                (self.namespace, overflow),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ?", (self.namespace,)
+            )
+            conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
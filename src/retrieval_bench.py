@@ -0,0 +1,520 @@
+"""Benchmark retrieval: corpus tổng hợp, embedder giả lập và đo ``NewsRAG``.
+
+Chạy offline, tái lập được (cùng seed → cùng corpus, cùng query, cùng vector):
+
+* ``generate_corpus`` sinh N tin (1k → 10M) với phân bố ticker lệch kiểu Zipf
+  (vài mã "hot" chiếm phần lớn tin) và ngày lệch về gần hiện tại;
+* ``StubEmbedder`` thay BGE-M3: bag-of-words băm, mỗi token một vector ngẫu
+  nhiên cố định theo crc32 → cosine phản ánh độ trùng từ, không cần model;
+* mỗi (size, index mode) đo thời gian load, RSS, latency search p50/p99,
+  recall@k so với tìm kiếm exact và độ đúng topic của kết quả.
+
+Index mode: ``jsonl`` (đọc ``news_index.jsonl`` và encode lúc khởi động) và
+``idx`` (memory-map ``news.idx`` đã ingest). Kết quả ghi ra JSON để so sánh
+giữa các release (``--compare``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import APP_VERSION, PROJECT_ROOT
+from src.index_format import IndexWriter
+from src.news_ingest import INDEX_FILE
+
+INDEX_MODES = ("jsonl", "idx")
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / "reports" / "bench"
+CHUNK_ROWS = 50_000
+
+TOPICS: Dict[str, Tuple[str, ...]] = {
+    "earnings": ("earnings", "revenue", "profit", "quarterly", "eps", "beat"),
+    "guidance": ("guidance", "outlook", "forecast", "raises", "cuts", "fiscal"),
+    "dividend": ("dividend", "payout", "yield", "buyback", "shareholders", "distribution"),
+    "merger": ("merger", "acquisition", "deal", "takeover", "bid", "combine"),
+    "lawsuit": ("lawsuit", "court", "settlement", "regulator", "fine", "probe"),
+    "product": ("launch", "product", "unveils", "release", "platform", "device"),
+    "leadership": ("ceo", "resigns", "appoints", "board", "executive", "succession"),
+    "debt": ("bond", "debt", "refinancing", "credit", "rating", "downgrade"),
+    "supply": ("supply", "shortage", "factory", "production", "chips", "logistics"),
+    "macro": ("inflation", "rates", "central", "bank", "tariff", "currency"),
+    "analyst": ("analyst", "upgrade", "target", "price", "overweight", "rating"),
+    "ipo": ("ipo", "listing", "offering", "valuation", "underwriters", "debut"),
+}
+FILLER = (
+    "the", "company", "said", "on", "market", "shares", "investors", "week",
+    "report", "according", "statement", "stock", "trading", "percent", "year",
+    "while", "also", "after", "expected", "update", "sources", "move", "news",
+    "session", "early", "late", "strong", "weak", "sector", "global", "local",
+)
+BASE_TICKERS = (
+    "AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "GOOGL", "META", "FPT", "VNM", "HPG",
+    "VCB", "VIC", "MWG", "JPM", "BAC", "XOM", "NFLX", "AMD", "INTC", "ORCL",
+)
+
+
+# ---------------------------------------------------------------- embedding
+class StubEmbedder:
+    """Embedder tất định thay BGE-M3: tổng vector token (băm crc32) rồi normalize."""
+
+    def __init__(self, dim: int = 64, model_name: Optional[str] = None) -> None:
+        self.dim = dim
+        self.model_name = model_name or f"stub-hash-{dim}"
+        self._ids: Dict[str, int] = {}
+        self._table = np.zeros((256, dim), dtype=np.float32)
+
+    def _token_id(self, token: str) -> int:
+        idx = self._ids.get(token)
+        if idx is None:
+            idx = len(self._ids)
+            if idx >= len(self._table):
+                self._table = np.concatenate([self._table, np.zeros_like(self._table)])
+            rng = np.random.default_rng(zlib.crc32(token.encode("utf-8")))
+            self._table[idx] = rng.standard_normal(self.dim, dtype=np.float32)
+            self._ids[token] = idx
+        return idx
+
+    def encode(self, texts: Sequence[str] | str, normalize_embeddings: bool = True, **_: Any) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = [self._token_id(tok) for tok in text.lower().split()]
+            if ids:
+                out[row] = self._table[ids].sum(axis=0)
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out /= np.where(norms == 0, 1.0, norms)
+        return out
+
+    def get_embedding_dimension(self) -> int:
+        return self.dim
+
+
+# ------------------------------------------------------------------- corpus
+def parse_size(value: str) -> int:
+    """``"10k"`` → 10_000, ``"1m"`` → 1_000_000."""
+    text = value.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if scale > 1 else text
+    rows = int(float(number) * scale)
+    if rows <= 0:
+        raise ValueError(f"Invalid corpus size: {value!r}")
+    return rows
+
+
+def make_tickers(count: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    tickers = list(BASE_TICKERS[:count])
+    seen = set(tickers)
+    while len(tickers) < count:
+        code = "".join(chr(65 + c) for c in rng.integers(0, 26, size=int(rng.integers(3, 5))))
+        if code not in seen:
+            seen.add(code)
+            tickers.append(code)
+    return tickers
+
+
+def _ticker_weights(count: int, zipf_s: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, count + 1) ** zipf_s
+    return weights / weights.sum()
+
+
+@dataclass
+class CorpusSpec:
+    rows: int
+    seed: int = 0
+    tickers: int = 500
+    zipf_s: float = 1.1  # độ lệch ticker: lớn hơn → tập trung vào ít mã hơn
+    days: int = 730
+    recency_scale: float = 120.0  # ngày; phân phối mũ của tuổi bài viết
+    end_date: str = "2025-06-30"
+
+
+def generate_corpus(
+    spec: CorpusSpec, chunk_rows: int = CHUNK_ROWS
+) -> Iterator[Tuple[List[Dict[str, str]], np.ndarray, np.ndarray]]:
+    """Sinh corpus theo chunk: (records, ticker_ids, topic_ids)."""
+    rng = np.random.default_rng(spec.seed)
+    tickers = make_tickers(spec.tickers, spec.seed)
+    weights = _ticker_weights(len(tickers), spec.zipf_s)
+    topic_names = list(TOPICS)
+    topic_weights = _ticker_weights(len(topic_names), 0.5)
+    end = date.fromisoformat(spec.end_date)
+    filler = np.array(FILLER)
+
+    for start in range(0, spec.rows, chunk_rows):
+        n = min(chunk_rows, spec.rows - start)
+        ticker_ids = rng.choice(len(tickers), size=n, p=weights).astype(np.int32)
+        topic_ids = rng.choice(len(topic_names), size=n, p=topic_weights).astype(np.int32)
+        ages = np.minimum(rng.exponential(spec.recency_scale, size=n), spec.days - 1).astype(int)
+        keyword_picks = rng.integers(0, 6, size=(n, 4))
+        filler_picks = filler[rng.integers(0, len(filler), size=(n, 8))]
+        records = []
+        for i in range(n):
+            ticker = tickers[ticker_ids[i]]
+            keywords = TOPICS[topic_names[topic_ids[i]]]
+            words = [keywords[k] for k in keyword_picks[i]]
+            records.append(
+                {
+                    "id": f"syn-{start + i:08d}",
+                    "title": f"{ticker} {words[0]} {words[1]}",
+                    "content": f"{ticker} {' '.join(words)} {' '.join(filler_picks[i])}",
+                    "date": (end - timedelta(days=int(ages[i]))).isoformat(),
+                    "ticker": ticker,
+                }
+            )
+        yield records, ticker_ids, topic_ids
+
+
+@dataclass
+class BenchQuery:
+    text: str
+    ticker: Optional[str]  # filter truyền cho search (None = chỉ có trong text)
+    ticker_id: int
+    topic_id: int
+
+
+def generate_queries(spec: CorpusSpec, count: int, filter_ratio: float = 0.5) -> List[BenchQuery]:
+    """Query theo cùng phân bố ticker với corpus; một phần có filter ticker."""
+    rng = np.random.default_rng(spec.seed + 1)
+    tickers = make_tickers(spec.tickers, spec.seed)
+    weights = _ticker_weights(len(tickers), spec.zipf_s)
+    topic_names = list(TOPICS)
+    queries = []
+    for _ in range(count):
+        ticker_id = int(rng.choice(len(tickers), p=weights))
+        topic_id = int(rng.integers(0, len(topic_names)))
+        keywords = rng.choice(TOPICS[topic_names[topic_id]], size=3, replace=False)
+        ticker = tickers[ticker_id]
+        queries.append(
+            BenchQuery(
+                text=f"{ticker} {' '.join(keywords)}",
+                ticker=ticker if rng.random() < filter_ratio else None,
+                ticker_id=ticker_id,
+                topic_id=topic_id,
+            )
+        )
+    return queries
+
+
+def build_corpus(
+    workdir: Path, spec: CorpusSpec, embedder: StubEmbedder, modes: Sequence[str]
+) -> Dict[str, Any]:
+    """Ghi corpus ra ``workdir`` cho từng index mode + vectors/labels dùng làm ground truth."""
+    workdir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    vectors_path = workdir / "vectors.f32"
+    ticker_chunks, topic_chunks = [], []
+    # Metadata idx được spool theo chunk nên RAM không tăng theo số dòng corpus.
+    writer = IndexWriter(workdir / "index" / INDEX_FILE) if "idx" in modes else None
+    jsonl = (workdir / "news_index.jsonl").open("w", encoding="utf-8") if "jsonl" in modes else None
+    try:
+        with vectors_path.open("wb") as vec:
+            for chunk, ticker_ids, topic_ids in generate_corpus(spec):
+                vec.write(embedder.encode([r["content"] for r in chunk]).tobytes())
+                ticker_chunks.append(ticker_ids)
+                topic_chunks.append(topic_ids)
+                if jsonl is not None:
+                    jsonl.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk)
+                if writer is not None:
+                    writer.append(chunk)
+        np.savez(
+            workdir / "labels.npz",
+            ticker_ids=np.concatenate(ticker_chunks),
+            topic_ids=np.concatenate(topic_chunks),
+        )
+        if writer is not None:
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(spec.rows, embedder.dim))
+            writer.finish(
+                vectors,
+                model=embedder.model_name,
+                version=f"synthetic-{spec.rows}-{spec.seed}",
+                extra={"synthetic": asdict(spec)},
+            )
+            del vectors
+    finally:
+        if jsonl is not None:
+            jsonl.close()
+        if writer is not None:
+            writer.close()
+    return {"build_seconds": round(time.perf_counter() - started, 3)}
+
+
+def exact_top_k(
+    vectors: np.ndarray,
+    ticker_ids: np.ndarray,
+    embedder: StubEmbedder,
+    queries: Sequence[BenchQuery],
+    top_k: int,
+) -> List[List[int]]:
+    """Ground truth: top-k cosine chính xác (có filter ticker, không threshold)."""
+    q_embs = embedder.encode([q.text for q in queries])
+    truth: List[List[int]] = []
+    for q, q_emb in zip(queries, q_embs):
+        sims = vectors @ q_emb
+        if q.ticker is not None:
+            sims = np.where(ticker_ids == q.ticker_id, sims, -np.inf)
+        k = min(top_k, int(np.isfinite(sims).sum()))
+        if k == 0:
+            truth.append([])
+            continue
+        part = np.argpartition(-sims, k - 1)[:k]
+        truth.append(part[np.argsort(-sims[part])].tolist())
+    return truth
+
+
+# --------------------------------------------------------------- measuring
+def rss_mb() -> float:
+    """RSS hiện tại (MB); ngoài Linux dùng peak RSS."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def run_case(
+    workdir: Path,
+    mode: str,
+    dim: int,
+    queries: Sequence[BenchQuery],
+    truth: Sequence[Sequence[int]],
+    top_k: int,
+    threshold: float,
+) -> Dict[str, Any]:
+    """Load ``NewsRAG`` ở một index mode và chạy toàn bộ query."""
+    from src.rag_news import NewsRAG
+
+    embedder = StubEmbedder(dim)
+    embedder.encode([q.text for q in queries])  # warm token table, không tính vào load
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    if mode == "jsonl":
+        rag = NewsRAG(embedder, workdir / "news_index.jsonl", threshold, artifacts_dir=workdir / "no-index")
+        index_bytes = (workdir / "news_index.jsonl").stat().st_size
+    elif mode == "idx":
+        rag = NewsRAG(embedder, workdir / "absent.jsonl", threshold, artifacts_dir=workdir / "index")
+        index_bytes = (workdir / "index" / INDEX_FILE).stat().st_size
+    else:
+        raise ValueError(f"Unknown index mode: {mode}")
+    load_seconds = time.perf_counter() - started
+    rss_after = rss_mb()
+
+    topic_ids = np.load(workdir / "labels.npz")["topic_ids"]
+    latencies = np.empty(len(queries))
+    recalls, precisions = [], []
+    for i, (query, expected) in enumerate(zip(queries, truth)):
+        t0 = time.perf_counter()
+        results = rag.search_scored(query.text, ticker=query.ticker, top_k=top_k)
+        latencies[i] = time.perf_counter() - t0
+        got = [int(item.id[4:]) for item, _ in results]  # "syn-%08d"
+        if expected:
+            recalls.append(len(set(got) & set(expected)) / len(expected))
+        if got:
+            precisions.append(float(np.mean(topic_ids[got] == query.topic_id)))
+
+    return {
+        "mode": mode,
+        "rows": len(rag.news),
+        "index_bytes": index_bytes,
+        "load_seconds": round(load_seconds, 4),
+        "rss_mb": round(rss_after, 1),
+        "rss_delta_mb": round(rss_after - rss_before, 1),
+        "search": {
+            "queries": len(queries),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+            "mean_ms": round(float(latencies.mean()) * 1000, 3),
+            "qps": round(len(queries) / float(latencies.sum()), 1) if latencies.sum() else None,
+        },
+        f"recall_at_{top_k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        f"topic_precision_at_{top_k}": round(float(np.mean(precisions)), 4) if precisions else None,
+    }
+
+
+def _case_worker(conn: Any, *args: Any) -> None:
+    try:
+        conn.send((True, run_case(*args)))
+    except BaseException as e:  # noqa: BLE001 - trả lỗi về process cha
+        conn.send((False, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def run_case_isolated(*args: Any) -> Dict[str, Any]:
+    """Chạy ``run_case`` trong process mới để số đo RAM không bị case trước ảnh hưởng."""
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_case_worker, args=(child, *args))
+    process.start()
+    child.close()
+    try:
+        ok, payload = parent.recv()
+    except EOFError:  # worker chết (vd. OOM) trước khi gửi kết quả
+        ok, payload = False, "benchmark worker exited without a result"
+    process.join()
+    if not ok:
+        raise RuntimeError(payload)
+    return payload
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(
+    sizes: Sequence[int],
+    modes: Sequence[str] = INDEX_MODES,
+    workdir: Path = DEFAULT_OUTPUT_DIR / "corpus",
+    queries: int = 200,
+    top_k: int = 5,
+    threshold: float = 0.0,
+    dim: int = 64,
+    seed: int = 0,
+    max_jsonl_rows: int = 100_000,
+    isolate: bool = True,
+    log: Any = print,
+) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    for rows in sizes:
+        spec = CorpusSpec(rows=rows, seed=seed)
+        size_modes = [m for m in modes if m != "jsonl" or rows <= max_jsonl_rows]
+        for mode in set(modes) - set(size_modes):
+            results.append({"rows": rows, "mode": mode, "skipped": f"rows > max_jsonl_rows ({max_jsonl_rows})"})
+        if not size_modes:
+            continue
+        case_dir = workdir / f"{rows}-s{seed}"
+        embedder = StubEmbedder(dim)
+        log(f"Building {rows:,} rows in {case_dir} ...")
+        build = build_corpus(case_dir, spec, embedder, size_modes)
+        bench_queries = generate_queries(spec, queries)
+        labels = np.load(case_dir / "labels.npz")
+        vectors = np.memmap(case_dir / "vectors.f32", dtype=np.float32, mode="r", shape=(rows, dim))
+        truth = exact_top_k(vectors, labels["ticker_ids"], embedder, bench_queries, top_k)
+        del vectors
+        for mode in size_modes:
+            args = (case_dir, mode, dim, bench_queries, truth, top_k, threshold)
+            result = run_case_isolated(*args) if isolate else run_case(*args)
+            result.update(build)
+            results.append(result)
+            log(
+                f"  {mode:<5} load {result['load_seconds']:.3f}s · RSS +{result['rss_delta_mb']} MB · "
+                f"p50 {result['search']['p50_ms']} ms · p99 {result['search']['p99_ms']} ms · "
+                f"recall@{top_k} {result[f'recall_at_{top_k}']}"
+            )
+    return {
+        "meta": {
+            "benchmark": "retrieval",
+            "app_version": APP_VERSION,
+            "git_revision": _git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {
+                "queries": queries, "top_k": top_k, "threshold": threshold,
+                "dim": dim, "seed": seed, "embedder": StubEmbedder(dim).model_name,
+            },
+        },
+        "results": results,
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """So sánh từng (rows, mode) với baseline; trả về các dòng mô tả thay đổi."""
+    base = {(r["rows"], r["mode"]): r for r in baseline.get("results", []) if "skipped" not in r}
+    lines = []
+    for r in current.get("results", []):
+        old = base.get((r["rows"], r["mode"]))
+        if old is None or "skipped" in r:
+            continue
+        parts = []
+        for label, new_value, old_value in (
+            ("load", r["load_seconds"], old["load_seconds"]),
+            ("rss", r["rss_delta_mb"], old["rss_delta_mb"]),
+            ("p50", r["search"]["p50_ms"], old["search"]["p50_ms"]),
+            ("p99", r["search"]["p99_ms"], old["search"]["p99_ms"]),
+        ):
+            if old_value:
+                parts.append(f"{label} {(new_value - old_value) / old_value:+.1%}")
+        lines.append(f"{r['rows']:>10,} {r['mode']:<5} " + " · ".join(parts))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark NewsRAG load/search on synthetic corpora.")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="Comma list, e.g. 1k,100k,1m,10m.")
+    parser.add_argument("--modes", default=",".join(INDEX_MODES), help="Index modes: jsonl, idx.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--threshold", type=float, default=0.0,
+        help="Similarity threshold passed to NewsRAG (stub cosines are lower than BGE-M3's).",
+    )
+    parser.add_argument("--dim", type=int, default=64, help="Stub embedding dimension.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-jsonl-rows", type=int, default=100_000,
+        help="Skip the jsonl mode above this size (it re-encodes every row at load).",
+    )
+    parser.add_argument("--workdir", default=str(DEFAULT_OUTPUT_DIR / "corpus"))
+    parser.add_argument("--output", default="", help="Result JSON (default: reports/bench/retrieval-<ts>.json).")
+    parser.add_argument("--compare", default="", help="Baseline result JSON to diff against.")
+    parser.add_argument("--in-process", action="store_true", help="Do not isolate cases in subprocesses.")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(INDEX_MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(
+        sizes=[parse_size(s) for s in args.sizes.split(",") if s.strip()],
+        modes=modes,
+        workdir=Path(args.workdir),
+        queries=args.queries,
+        top_k=args.top_k,
+        threshold=args.threshold,
+        dim=args.dim,
+        seed=args.seed,
+        max_jsonl_rows=args.max_jsonl_rows,
+        isolate=not args.in_process,
+    )
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"retrieval-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\nChanges vs {args.compare}:")
+        for line in compare_results(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
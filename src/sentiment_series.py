@@ -0,0 +1,479 @@
+"""Chuỗi sentiment theo ngày cho từng ticker, build sẵn lúc ingest.
+
+Câu hỏi kiểu "Phân tích Apple 6 tháng gần đây" là hỏi về *xu hướng*
+sentiment, không phải về 5 bài top-k. ``SentimentSeries`` gom sentiment
+FinBERT (đã tính lúc ingest) theo (ticker, ngày) và lưu thành mảng NumPy
+dạng CSR trong ``sentiment_series.npz`` cạnh ``news.idx``::
+
+    tickers   str[T]          sorted
+    offsets   int64[T + 1]    ticker t chiếm hàng offsets[t]:offsets[t+1]
+    days      int32[N]        ngày (số ngày từ 1970-01-01), tăng dần trong từng ticker
+    counts    int32[N]        số bài trong ngày
+    score_sum float64[N]      tổng confidence FinBERT
+    signed_sum float64[N]     tổng score có dấu (+ positive, - negative, 0 neutral)
+    labels    int32[N, 3]     số bài positive / negative / neutral
+
+Khi load, các cột được cộng dồn (prefix sum) một lần; truy vấn một khoảng
+ngày chỉ cần hai ``np.searchsorted`` trên lát của ticker (O(log n)) rồi
+lấy hiệu của prefix sum.
+"""
+from __future__ import annotations
+
+import calendar
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.agents.intent_extractor import LocalIntentExtractor, fold_text
+from src.config import SENTIMENT_TREND_BUCKETS, SENTIMENT_TREND_DEFAULT_RANGE
+
+logger = logging.getLogger(__name__)
+
+SERIES_FILE = "sentiment_series.npz"
+FORMAT_VERSION = 1
+LABELS = ("positive", "negative", "neutral")
+_EPOCH = date(1970, 1, 1)
+# Chênh lệch net sentiment giữa nửa đầu và nửa sau để coi là đổi hướng.
+TREND_THRESHOLD = 0.1
+
+
+def label_index(label: Any) -> int:
+    """Map nhãn FinBERT (``positive`` / ``Negative`` / ``LABEL_2``...) về 0/1/2."""
+    text = str(label or "").strip().lower()
+    if text.startswith("pos"):
+        return 0
+    if text.startswith("neg"):
+        return 1
+    return 2
+
+
+def to_day(value: Any) -> Optional[int]:
+    """``"YYYY-MM-DD..."`` / ``date`` → số ngày từ epoch; None nếu không parse được."""
+    try:
+        if isinstance(value, date):
+            return (value - _EPOCH).days
+        return (date.fromisoformat(str(value)[:10]) - _EPOCH).days
+    except ValueError:
+        return None
+
+
+def from_day(day: int) -> date:
+    return _EPOCH + timedelta(days=int(day))
+
+
+def _shift_months(d: date, months: int) -> date:
+    month_index = d.year * 12 + d.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def resolve_time_range(time_range: Optional[str], as_of: date) -> Tuple[date, date]:
+    """
+    Chuyển ``time_range`` (đã extract, vi/en, tự do) thành khoảng ngày [start, end].
+
+    Dùng lại bộ nhận diện của ``LocalIntentExtractor`` để chuẩn hoá ("6 tháng"
+    → "6 months", "từ đầu năm" → "YTD", "Q2"...). Không nhận diện được →
+    ``SENTIMENT_TREND_DEFAULT_RANGE``.
+    """
+    normalized = (
+        LocalIntentExtractor.extract_time_range(fold_text(time_range)) if time_range else None
+    ) or LocalIntentExtractor.extract_time_range(fold_text(SENTIMENT_TREND_DEFAULT_RANGE))
+
+    if normalized == "YTD":
+        return date(as_of.year, 1, 1), as_of
+    if normalized and normalized.startswith("Q") and normalized[1:].isdigit():
+        quarter = int(normalized[1:])
+        year = as_of.year if quarter <= (as_of.month - 1) // 3 + 1 else as_of.year - 1
+        start = date(year, 3 * quarter - 2, 1)
+        end_month = 3 * quarter
+        end = date(year, end_month, calendar.monthrange(year, end_month)[1])
+        return start, min(end, as_of)
+    if normalized:
+        n_text, unit = normalized.split(" ", 1)
+        n = int(n_text)
+        unit = unit.rstrip("s")
+        if unit == "day":
+            start = as_of - timedelta(days=n)
+        elif unit == "week":
+            start = as_of - timedelta(weeks=n)
+        elif unit == "month":
+            start = _shift_months(as_of, n)
+        elif unit == "quarter":
+            start = _shift_months(as_of, 3 * n)
+        else:
+            start = _shift_months(as_of, 12 * n)
+        return start + timedelta(days=1), as_of
+    return as_of - timedelta(days=89), as_of
+
+
+@dataclass(slots=True)
+class TrendBucket:
+    start: str
+    end: str
+    articles: int
+    net: Optional[float]  # (positive - negative) / articles
+
+
+@dataclass(slots=True)
+class SentimentTrend:
+    """Tổng hợp sentiment của một ticker trong một khoảng ngày."""
+
+    ticker: str
+    start: str
+    end: str
+    time_range: Optional[str]
+    articles: int
+    days_with_news: int
+    mean_score: Optional[float]  # confidence FinBERT trung bình
+    mean_signed_score: Optional[float]  # trung bình score có dấu, trong [-1, 1]
+    labels: Dict[str, int] = field(default_factory=dict)
+    buckets: List[TrendBucket] = field(default_factory=list)
+    direction: str = "flat"  # improving / deteriorating / stable / flat (thiếu dữ liệu)
+
+    @property
+    def net(self) -> Optional[float]:
+        if not self.articles:
+            return None
+        return (self.labels.get("positive", 0) - self.labels.get("negative", 0)) / self.articles
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ticker": self.ticker,
+            "start": self.start,
+            "end": self.end,
+            "time_range": self.time_range,
+            "articles": self.articles,
+            "days_with_news": self.days_with_news,
+            "mean_score": self.mean_score,
+            "mean_signed_score": self.mean_signed_score,
+            "net": self.net,
+            "labels": dict(self.labels),
+            "buckets": [
+                {"start": b.start, "end": b.end, "articles": b.articles, "net": b.net}
+                for b in self.buckets
+            ],
+            "direction": self.direction,
+        }
+
+    def describe(self, lang: str) -> str:
+        """Vài dòng mô tả xu hướng, dùng trong prompt và summary template."""
+        vi = lang == "vi"
+        if not self.articles:
+            return (
+                f"Không có tin nào về {self.ticker} từ {self.start} đến {self.end}."
+                if vi
+                else f"No {self.ticker} news between {self.start} and {self.end}."
+            )
+        share = {k: 100.0 * v / self.articles for k, v in self.labels.items()}
+        names = (
+            {"positive": "tích cực", "negative": "tiêu cực", "neutral": "trung lập"}
+            if vi
+            else {label: label for label in LABELS}
+        )
+        distribution = ", ".join(f"{names[k]} {share.get(k, 0.0):.0f}%" for k in LABELS)
+        periods = "; ".join(
+            f"{b.start}: {b.net:+.2f} ({b.articles})" for b in self.buckets if b.net is not None
+        )
+        directions = (
+            {"improving": "cải thiện", "deteriorating": "xấu đi", "stable": "ổn định", "flat": "chưa đủ dữ liệu"}
+            if vi
+            else {"improving": "improving", "deteriorating": "deteriorating", "stable": "stable", "flat": "not enough data"}
+        )
+        if vi:
+            lines = [
+                f"Xu hướng cảm xúc {self.ticker} từ {self.start} đến {self.end}: "
+                f"{self.articles} tin trong {self.days_with_news} ngày; {distribution}.",
+                f"Chỉ số ròng (tích cực - tiêu cực): {self.net:+.2f}; "
+                f"độ tin cậy FinBERT trung bình {self.mean_score:.2f}.",
+            ]
+            if periods:
+                lines.append(f"Theo giai đoạn (ngày bắt đầu: chỉ số ròng (số tin)): {periods}.")
+            lines.append(f"Hướng: {directions[self.direction]}.")
+        else:
+            lines = [
+                f"{self.ticker} sentiment trend from {self.start} to {self.end}: "
+                f"{self.articles} articles over {self.days_with_news} days; {distribution}.",
+                f"Net sentiment (positive - negative): {self.net:+.2f}; "
+                f"mean FinBERT confidence {self.mean_score:.2f}.",
+            ]
+            if periods:
+                lines.append(f"By period (start: net (articles)): {periods}.")
+            lines.append(f"Direction: {directions[self.direction]}.")
+        return "\n".join(lines)
+
+
+class SentimentSeries:
+    """Chuỗi sentiment theo ngày cho mọi ticker, truy vấn khoảng ngày O(log n)."""
+
+    def __init__(
+        self,
+        tickers: Sequence[str],
+        offsets: np.ndarray,
+        days: np.ndarray,
+        counts: np.ndarray,
+        score_sum: np.ndarray,
+        signed_sum: np.ndarray,
+        labels: np.ndarray,
+        version: str = "",
+    ) -> None:
+        self.tickers = [str(t) for t in tickers]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.score_sum = np.asarray(score_sum, dtype=np.float64)
+        self.signed_sum = np.asarray(signed_sum, dtype=np.float64)
+        self.labels = np.asarray(labels, dtype=np.int32).reshape(-1, len(LABELS))
+        self.version = version
+        self._positions = {t: i for i, t in enumerate(self.tickers)}
+        # Prefix sum (có số 0 đầu): tổng hàng [i, j) = cum[j] - cum[i].
+        self._cum_counts = np.concatenate(([0], np.cumsum(self.counts, dtype=np.int64)))
+        self._cum_score = np.concatenate(([0.0], np.cumsum(self.score_sum)))
+        self._cum_signed = np.concatenate(([0.0], np.cumsum(self.signed_sum)))
+        self._cum_labels = np.vstack(
+            [np.zeros((1, len(LABELS)), dtype=np.int64), np.cumsum(self.labels, axis=0, dtype=np.int64)]
+        )
+        self.as_of: Optional[date] = from_day(int(self.days.max())) if len(self.days) else None
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __contains__(self, ticker: object) -> bool:
+        return isinstance(ticker, str) and ticker.upper() in self._positions
+
+    # ------------------------------------------------------------------ build
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[Tuple[str, Any, Any, Any]],
+        version: str = "",
+    ) -> "SentimentSeries":
+        """Build từ các bộ ``(ticker, date, label, score)``; bỏ qua date không hợp lệ."""
+        tickers: List[str] = []
+        days: List[int] = []
+        labels: List[int] = []
+        scores: List[float] = []
+        for ticker, day_value, label, score in records:
+            day = to_day(day_value)
+            if day is None or not ticker:
+                continue
+            tickers.append(str(ticker).upper())
+            days.append(day)
+            labels.append(label_index(label))
+            scores.append(float(score) if score is not None else 0.0)
+
+        if not days:
+            empty = np.zeros(0, dtype=np.int32)
+            return cls(
+                [], np.zeros(1, dtype=np.int64), empty, empty,
+                np.zeros(0), np.zeros(0), np.zeros((0, len(LABELS)), dtype=np.int32), version,
+            )
+
+        names, codes = np.unique(np.asarray(tickers), return_inverse=True)
+        day_arr = np.asarray(days, dtype=np.int32)
+        label_arr = np.asarray(labels, dtype=np.int8)
+        score_arr = np.asarray(scores, dtype=np.float64)
+        sign = np.array([1.0, -1.0, 0.0])[label_arr]
+
+        order = np.lexsort((day_arr, codes))
+        codes, day_arr = codes[order], day_arr[order]
+        label_arr, score_arr, sign = label_arr[order], score_arr[order], sign[order]
+
+        # Đầu mỗi nhóm (ticker, ngày) sau khi sort.
+        new_group = np.ones(len(day_arr), dtype=bool)
+        new_group[1:] = (codes[1:] != codes[:-1]) | (day_arr[1:] != day_arr[:-1])
+        starts = np.flatnonzero(new_group)
+
+        one_hot = np.zeros((len(day_arr), len(LABELS)), dtype=np.int32)
+        one_hot[np.arange(len(day_arr)), label_arr] = 1
+        group_codes = codes[starts]
+        offsets = np.searchsorted(group_codes, np.arange(len(names) + 1), side="left")
+
+        return cls(
+            names.tolist(),
+            offsets,
+            day_arr[starts],
+            np.diff(np.append(starts, len(day_arr))).astype(np.int32),
+            np.add.reduceat(score_arr, starts),
+            np.add.reduceat(score_arr * sign, starts),
+            np.add.reduceat(one_hot, starts, axis=0),
+            version,
+        )
+
+    @classmethod
+    def from_news(cls, news: Iterable[Any], version: str = "") -> "SentimentSeries":
+        """Build từ ``NewsItem`` có ``sentiment`` tính sẵn (bỏ qua tin chưa có)."""
+        return cls.from_records(
+            (
+                (n.ticker, n.date, n.sentiment.get("label"), n.sentiment.get("score"))
+                for n in news
+                if n.sentiment
+            ),
+            version=version,
+        )
+
+    # -------------------------------------------------------------- persist
+    def save(self, path: str | Path) -> None:
+        """Ghi ``.npz`` (atomic qua file tạm + ``os.replace``)."""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(
+                f,
+                format_version=np.int32(FORMAT_VERSION),
+                version=np.array(self.version),
+                tickers=np.array(self.tickers, dtype=str),
+                offsets=self.offsets,
+                days=self.days,
+                counts=self.counts,
+                score_sum=self.score_sum,
+                signed_sum=self.signed_sum,
+                labels=self.labels,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "SentimentSeries":
+        with np.load(Path(path), allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported sentiment series format: {int(data['format_version'])}")
+            return cls(
+                data["tickers"].tolist(),
+                data["offsets"],
+                data["days"],
+                data["counts"],
+                data["score_sum"],
+                data["signed_sum"],
+                data["labels"],
+                version=str(data["version"]),
+            )
+
+    # ---------------------------------------------------------------- query
+    def _bounds(self, ticker: str, start_day: int, end_day: int) -> Tuple[int, int]:
+        position = self._positions.get(ticker.upper())
+        if position is None:
+            return 0, 0
+        lo, hi = int(self.offsets[position]), int(self.offsets[position + 1])
+        days = self.days[lo:hi]
+        return (
+            lo + int(np.searchsorted(days, start_day, side="left")),
+            lo + int(np.searchsorted(days, end_day, side="right")),
+        )
+
+    def window(self, ticker: str, start: date, end: date) -> Dict[str, Any]:
+        """Tổng hợp thô cho [start, end] (hai lần binary search + hiệu prefix sum)."""
+        i, j = self._bounds(ticker, to_day(start) or 0, to_day(end) or 0)
+        labels = self._cum_labels[j] - self._cum_labels[i]
+        return {
+            "articles": int(self._cum_counts[j] - self._cum_counts[i]),
+            "days_with_news": j - i,
+            "score_sum": float(self._cum_score[j] - self._cum_score[i]),
+            "signed_sum": float(self._cum_signed[j] - self._cum_signed[i]),
+            "labels": {name: int(n) for name, n in zip(LABELS, labels)},
+        }
+
+    def daily(self, ticker: str, start: date, end: date) -> Dict[str, np.ndarray]:
+        """Các hàng theo ngày trong [start, end] (view, không copy)."""
+        i, j = self._bounds(ticker, to_day(start) or 0, to_day(end) or 0)
+        return {
+            "days": self.days[i:j],
+            "counts": self.counts[i:j],
+            "score_sum": self.score_sum[i:j],
+            "labels": self.labels[i:j],
+        }
+
+    def trend(
+        self,
+        ticker: str,
+        time_range: Optional[str] = None,
+        as_of: Optional[date] = None,
+        buckets: int = SENTIMENT_TREND_BUCKETS,
+    ) -> Optional[SentimentTrend]:
+        """
+        Xu hướng sentiment của ``ticker`` trong ``time_range``.
+
+        Mốc ``as_of`` mặc định là ngày mới nhất có trong series (index là
+        snapshot lúc ingest). Trả None nếu ticker không có trong series.
+        """
+        ticker = ticker.upper()
+        if ticker not in self._positions or self.as_of is None:
+            return None
+        as_of = as_of or self.as_of
+        start, end = resolve_time_range(time_range, as_of)
+        total = self.window(ticker, start, end)
+
+        # Ranh giới các bucket đều nhau: một searchsorted cho cả mảng ranh giới.
+        start_day, end_day = to_day(start) or 0, to_day(end) or 0
+        n_buckets = max(1, min(buckets, (end_day - start_day + 1) // 7 or 1))
+        edges = np.linspace(start_day, end_day + 1, n_buckets + 1).round().astype(np.int64)
+        position = self._positions[ticker]
+        lo, hi = int(self.offsets[position]), int(self.offsets[position + 1])
+        cuts = lo + np.searchsorted(self.days[lo:hi], edges, side="left")
+        counts = np.diff(self._cum_counts[cuts])
+        labels = np.diff(self._cum_labels[cuts], axis=0)
+        nets = [
+            (float(pos - neg) / n) if n else None
+            for (pos, neg, _), n in zip(labels.tolist(), counts.tolist())
+        ]
+        trend_buckets = [
+            TrendBucket(
+                start=from_day(int(edges[k])).isoformat(),
+                end=from_day(int(edges[k + 1]) - 1).isoformat(),
+                articles=int(counts[k]),
+                net=None if nets[k] is None else round(nets[k], 4),
+            )
+            for k in range(n_buckets)
+        ]
+
+        articles = total["articles"]
+        return SentimentTrend(
+            ticker=ticker,
+            start=start.isoformat(),
+            end=end.isoformat(),
+            time_range=time_range,
+            articles=articles,
+            days_with_news=total["days_with_news"],
+            mean_score=round(total["score_sum"] / articles, 4) if articles else None,
+            mean_signed_score=round(total["signed_sum"] / articles, 4) if articles else None,
+            labels=total["labels"],
+            buckets=trend_buckets,
+            direction=self._direction(cuts, n_buckets),
+        )
+
+    def _direction(self, cuts: np.ndarray, n_buckets: int) -> str:
+        """So sánh net sentiment nửa đầu và nửa sau của khoảng thời gian."""
+        if n_buckets < 2:
+            return "flat"
+        middle = n_buckets // 2
+        halves = []
+        for i, j in ((cuts[0], cuts[middle]), (cuts[middle], cuts[-1])):
+            n = int(self._cum_counts[j] - self._cum_counts[i])
+            pos, neg, _ = (self._cum_labels[j] - self._cum_labels[i]).tolist()
+            halves.append((pos - neg) / n if n else None)
+        if halves[0] is None or halves[1] is None:
+            return "flat"
+        delta = halves[1] - halves[0]
+        if delta > TREND_THRESHOLD:
+            return "improving"
+        if delta < -TREND_THRESHOLD:
+            return "deteriorating"
+        return "stable"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tickers": len(self.tickers),
+            "rows": len(self.days),
+            "articles": int(self._cum_counts[-1]),
+            "nbytes": int(
+                self.offsets.nbytes + self.days.nbytes + self.counts.nbytes
+                + self.score_sum.nbytes + self.signed_sum.nbytes + self.labels.nbytes
+            ),
+            "as_of": self.as_of.isoformat() if self.as_of else None,
+        }
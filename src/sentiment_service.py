@@ -7,17 +7,26 @@ from typing import Dict, Iterable, List, Sequence
 import torch
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
-from src.config import FINBERT_DEVICE, FINBERT_MAX_LENGTH, FINBERT_MODEL_PATH
+from src.config import (
+    FINBERT_BATCH_SIZE,
+    FINBERT_DEVICE,
+    FINBERT_MAX_LENGTH,
+    FINBERT_MODEL_PATH,
+    INFERENCE_RUNTIME_ENABLED,
+)
+from src.inference_runtime import get_runtime
+from src.utils.logging_utils import span
 
 
 class SentimentService:
-    """Load a locally fine-tuned FinBERT model and run single-pass inference."""
+    """Load a locally fine-tuned FinBERT model and run batched inference."""
 
     def __init__(
         self,
         model_dir: str | Path | None = None,
         device: str | torch.device | None = None,
         max_length: int | None = None,
+        batch_size: int | None = None,
     ) -> None:
         model_path = Path(model_dir or FINBERT_MODEL_PATH)
         if not model_path.exists():
@@ -25,6 +34,7 @@ class SentimentService:
 
         self.device = torch.device(device or FINBERT_DEVICE)
         self.max_length = max_length or FINBERT_MAX_LENGTH
+        self.batch_size = max(1, batch_size or FINBERT_BATCH_SIZE)
 
         self.tokenizer = AutoTokenizer.from_pretrained(str(model_path))
         self.model = AutoModelForSequenceClassification.from_pretrained(str(model_path))
@@ -39,18 +49,35 @@ class SentimentService:
             num_labels = int(getattr(self.model.config, "num_labels", 0))
             self.id2label = {idx: f"LABEL_{idx}" for idx in range(num_labels)}
 
+        # Trên CPU, FinBERT chạy trên executor riêng để không tranh core với BGE-M3.
+        self.runtime = (
+            get_runtime("sentiment")
+            if INFERENCE_RUNTIME_ENABLED and self.device.type == "cpu"
+            else None
+        )
+
     def analyze(self, texts: Sequence[str]) -> List[Dict[str, float | str]]:
         """Return FinBERT sentiment label + score for each input text."""
         if not isinstance(texts, Iterable):
             raise TypeError("texts must be an iterable of strings")
 
-        results: List[Dict[str, float | str]] = []
+        with span("sentiment_analyze"):
+            if self.runtime is None:
+                return self._analyze(texts)
+            return self.runtime.call(self._analyze, texts)
+
+    def _analyze(self, texts: Sequence[str]) -> List[Dict[str, float | str]]:
+        texts = list(texts)
         for text in texts:
             if not isinstance(text, str):
                 raise TypeError("Each item in texts must be a string")
 
+        # Padding theo batch: một forward pass cho mỗi FINBERT_BATCH_SIZE text.
+        results: List[Dict[str, float | str]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
             inputs = self.tokenizer(
-                text,
+                batch,
                 return_tensors="pt",
                 truncation=True,
                 padding=True,
@@ -60,20 +87,19 @@ class SentimentService:
 
             with torch.no_grad():
                 outputs = self.model(**inputs)
-                probs = torch.softmax(outputs.logits, dim=-1)[0].cpu()
-
-            pred_id = torch.argmax(probs).item()
-            label = self.id2label.get(pred_id, str(pred_id))
-            score = float(probs[pred_id].item())
-
-            results.append(
-                {
-                    "text": text,
-                    "label": label,
-                    "score": score,
-                }
-            )
+                probs = torch.softmax(outputs.logits, dim=-1).cpu()
 
-        return results
+            for text, row in zip(batch, probs):
+                pred_id = torch.argmax(row).item()
+                label = self.id2label.get(pred_id, str(pred_id))
+                score = float(row[pred_id].item())
 
+                results.append(
+                    {
+                        "text": text,
+                        "label": label,
+                        "score": score,
+                    }
+                )
 
+        return results
@@ -0,0 +1,375 @@
+"""Append-only journaled session log với snapshot + compaction nền."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from src.config import (
+    MAX_SESSION_HISTORY,
+    MAX_SESSIONS,
+    SESSION_COMPACT_INTERVAL,
+    SESSION_COMPACT_MIN_ENTRIES,
+    SESSION_JOURNAL_FSYNC,
+    SESSION_TIMEOUT,
+    SESSIONS_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# (file tag, offset, length): "S" = snapshot, "J" = journal
+Entry = Tuple[str, int, int]
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class JournalSessionStore:
+    """File-based session store where each update is one O(1) append.
+
+    Layout (both JSON Lines):
+
+    * ``sessions.journal.jsonl`` — one record per ``update_session``:
+      ``{"n": seq, "id": session_id, "t": time, "m": [[role, content], ...], "s": summary}``
+      or a tombstone ``{"n": seq, "id": session_id, "d": 1}`` for evicted sessions
+    * ``sessions.snapshot.jsonl`` — header ``{"last_seq": N}`` then one merged
+      record per session, written by compaction via atomic rename.
+
+    An in-memory index maps session id → byte offsets, so ``get_session`` only
+    reads that session's lines. Journal records with ``n <= last_seq`` are
+    already folded into the snapshot and are skipped on load, which keeps a
+    crash between the snapshot rename and the journal rewrite harmless.
+    TTL/LRU eviction and the history cap follow ``SessionStore``.
+
+    Single-process only: the index and ``seq`` live in this process, and
+    compaction swaps the journal file under its own append handle. The store
+    therefore holds an exclusive ``fcntl`` lock on ``sessions.journal.lock``
+    until ``close()``, and refuses to open a directory another process already
+    owns. Deployments with several workers should use the ``json`` or
+    ``sqlite`` backend.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = SESSIONS_DIR,
+        compact_min_entries: int = SESSION_COMPACT_MIN_ENTRIES,
+        fsync: bool = SESSION_JOURNAL_FSYNC,
+        timeout: float = SESSION_TIMEOUT,
+        max_sessions: int = MAX_SESSIONS,
+        max_history: int = MAX_SESSION_HISTORY,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.directory / "sessions.snapshot.jsonl"
+        self.journal_path = self.directory / "sessions.journal.jsonl"
+        self.lock_path = self.directory / "sessions.journal.lock"
+        self.compact_min_entries = int(compact_min_entries)
+        self.fsync = fsync
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._index: Dict[str, List[Entry]] = {}
+        self._last_access: Dict[str, float] = {}
+        self._seq = 0
+        self._journal_entries = 0
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+        self._owner_lock = self._acquire_owner_lock()
+        try:
+            self._load()
+            self._journal = self.journal_path.open("ab")
+        except BaseException:
+            self._owner_lock.close()
+            raise
+
+    def _acquire_owner_lock(self) -> Any:
+        """Lock độc quyền, không chờ, giữ suốt vòng đời store (no-op nếu không có ``fcntl``)."""
+        lock_file = self.lock_path.open("a")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Session journal in {self.directory} is already open in another process; "
+                "the journal backend is single-process only, use SESSION_BACKEND=sqlite "
+                "or json for multiple workers"
+            ) from None
+        return lock_file
+
+    # ------------------------------------------------------------------ load
+    def _load(self) -> None:
+        now = time.time()
+        last_seq = 0
+        if self.snapshot_path.exists():
+            with self.snapshot_path.open("rb") as f:
+                offset = 0
+                for line in f:
+                    length = len(line)
+                    record = json.loads(line)
+                    if "last_seq" in record:
+                        last_seq = int(record["last_seq"])
+                    else:
+                        self._index[record["id"]] = [("S", offset, length)]
+                        self._last_access[record["id"]] = record.get("t", now)
+                    offset += length
+        self._seq = last_seq
+
+        if not self.journal_path.exists():
+            return
+        good_end = 0
+        with self.journal_path.open("rb") as f:
+            offset = 0
+            for line in f:
+                length = len(line)
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("partial record")
+                    record = json.loads(line)
+                except ValueError:
+                    # Record cuối bị ghi dở khi crash → bỏ phần đuôi.
+                    logger.warning("Truncating torn journal tail at byte %s", offset)
+                    break
+                good_end = offset + length
+                seq = int(record["n"])
+                if seq > last_seq:
+                    session_id = record["id"]
+                    if record.get("d"):
+                        self._index.pop(session_id, None)
+                        self._last_access.pop(session_id, None)
+                    else:
+                        self._index.setdefault(session_id, []).append(("J", offset, length))
+                        self._last_access[session_id] = record.get("t", now)
+                    self._journal_entries += 1
+                    self._seq = max(self._seq, seq)
+                offset += length
+        if good_end < self.journal_path.stat().st_size:
+            with self.journal_path.open("r+b") as f:
+                f.truncate(good_end)
+
+    def _read_entries(self, entries: List[Entry]) -> Dict[str, Any]:
+        history: List[Dict[str, str]] = []
+        summary = ""
+        handles: Dict[str, Any] = {}
+        try:
+            for tag, offset, length in entries:
+                if tag not in handles:
+                    path = self.snapshot_path if tag == "S" else self.journal_path
+                    handles[tag] = path.open("rb")
+                fh = handles[tag]
+                fh.seek(offset)
+                record = json.loads(fh.read(length))
+                history.extend({"role": r, "content": c} for r, c in record.get("m", []))
+                if record.get("s") is not None:
+                    summary = record["s"]
+        finally:
+            for fh in handles.values():
+                fh.close()
+        if self.max_history > 0:
+            history = history[-self.max_history :]
+        return {"history": history, "summary": summary}
+
+    # ------------------------------------------------------------------- API
+    def _expired(self, session_id: str, now: float) -> bool:
+        last_access = self._last_access.get(session_id)
+        return self.timeout > 0 and last_access is not None and now - last_access > self.timeout
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._index.get(session_id, []))
+            if not entries or self._expired(session_id, time.time()):
+                return {"history": [], "summary": ""}
+            return self._read_entries(entries)
+
+    def update_session(
+        self,
+        session_id: str,
+        user_msg: str,
+        assistant_msg: str,
+        summary: str | None = None,
+    ) -> None:
+        self._append(
+            session_id,
+            [["user", user_msg], ["assistant", assistant_msg]],
+            summary,
+        )
+
+    def _write(self, record: Dict[str, Any]) -> Entry:
+        self._seq += 1
+        data = _encode({"n": self._seq, **record})
+        offset = self._journal.tell()
+        self._journal.write(data)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_entries += 1
+        return ("J", offset, len(data))
+
+    def _append(
+        self, session_id: str, messages: List[List[str]], summary: str | None
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            if self._expired(session_id, now):
+                self._drop(session_id)
+            record: Dict[str, Any] = {"id": session_id, "t": now, "m": messages}
+            if summary is not None:
+                record["s"] = summary
+            self._index.setdefault(session_id, []).append(self._write(record))
+            self._last_access[session_id] = now
+            self._evict_locked(now)
+
+    def _drop(self, session_id: str) -> None:
+        self._write({"id": session_id, "d": 1})
+        self._index.pop(session_id, None)
+        self._last_access.pop(session_id, None)
+
+    def _evict_locked(self, now: float) -> int:
+        victims = [sid for sid in self._index if self._expired(sid, now)]
+        if self.max_sessions > 0:
+            live = len(self._index) - len(victims)
+            if live > self.max_sessions:
+                expired = set(victims)
+                by_access = sorted(
+                    (sid for sid in self._index if sid not in expired),
+                    key=lambda sid: self._last_access.get(sid, now),
+                )
+                victims.extend(by_access[: live - self.max_sessions])
+        for session_id in victims:
+            self._drop(session_id)
+        return len(victims)
+
+    def sweep(self) -> int:
+        """Ghi tombstone cho session hết hạn / vượt ``max_sessions``; trả về số session đã xoá."""
+        with self._lock:
+            return self._evict_locked(time.time())
+
+    def import_json(self, json_path: str | Path) -> int:
+        """Import ``sessions.json`` cũ (bỏ qua session đã có); trả về số session."""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        content = json_path.read_text(encoding="utf-8").strip()
+        if not content:
+            return 0
+        imported = 0
+        for session_id, session in json.loads(content).items():
+            if session_id in self._index:
+                continue
+            messages = [
+                [m.get("role", ""), m.get("content", "")]
+                for m in session.get("history", [])
+            ]
+            self._append(session_id, messages, session.get("summary") or "")
+            imported += 1
+        return imported
+
+    # ------------------------------------------------------------ compaction
+    def compact(self) -> bool:
+        """
+        Gộp snapshot + journal thành snapshot mới (atomic rename).
+
+        Ghi vẫn tiếp tục trong lúc build snapshot; chỉ bước swap file cần lock.
+
+        Returns:
+            bool: True nếu đã compact
+        """
+        with self._compact_lock:
+            with self._lock:
+                if self._journal_entries == 0:
+                    return False
+                self._journal.flush()
+                cut_seq = self._seq
+                cut_offset = self._journal.tell()
+                index = {sid: list(entries) for sid, entries in self._index.items()}
+                last_access = dict(self._last_access)
+
+            # Build snapshot mới ngoài lock (file chỉ append nên offset cũ vẫn đúng).
+            tmp_snapshot = self.snapshot_path.with_suffix(".jsonl.tmp")
+            new_index: Dict[str, List[Entry]] = {}
+            with tmp_snapshot.open("wb") as out:
+                out.write(_encode({"last_seq": cut_seq}))
+                for session_id, entries in index.items():
+                    merged = self._read_entries(entries)
+                    data = _encode(
+                        {
+                            "id": session_id,
+                            "m": [[m["role"], m["content"]] for m in merged["history"]],
+                            "s": merged["summary"],
+                            "t": last_access.get(session_id),
+                        }
+                    )
+                    new_index[session_id] = [("S", out.tell(), len(data))]
+                    out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+
+            with self._lock:
+                os.replace(tmp_snapshot, self.snapshot_path)
+
+                # Journal mới chỉ giữ các record ghi sau thời điểm cắt.
+                self._journal.flush()
+                tmp_journal = self.journal_path.with_suffix(".jsonl.tmp")
+                tail_entries = 0
+                with self.journal_path.open("rb") as src, tmp_journal.open("wb") as dst:
+                    src.seek(cut_offset)
+                    for line in src:
+                        record = json.loads(line)
+                        if record.get("d"):
+                            new_index.pop(record["id"], None)
+                        else:
+                            new_index.setdefault(record["id"], []).append(
+                                ("J", dst.tell(), len(line))
+                            )
+                        dst.write(line)
+                        tail_entries += 1
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                self._journal.close()
+                os.replace(tmp_journal, self.journal_path)
+                self._journal = self.journal_path.open("ab")
+                self._index = new_index
+                self._journal_entries = tail_entries
+            return True
+
+    def start_compactor(self, interval: float = SESSION_COMPACT_INTERVAL) -> None:
+        """Chạy compaction định kỳ trên daemon thread khi journal đủ dài."""
+        if self._compactor is not None:
+            return
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                if self._journal_entries >= self.compact_min_entries:
+                    try:
+                        self.compact()
+                    except Exception:
+                        logger.exception("Session journal compaction failed")
+
+        self._compactor = threading.Thread(
+            target=loop, name="session-journal-compactor", daemon=True
+        )
+        self._compactor.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+        with self._lock:
+            self._journal.close()
+            if not self._owner_lock.closed:
+                self._owner_lock.close()  # đóng fd cũng nhả flock
@@ -1,28 +1,103 @@
 """Simple JSON-backed session persistence."""
 from __future__ import annotations
 
+import atexit
 import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from src.config import SESSIONS_FILE
+try:  # POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from src.config import (
+    MAX_SESSION_HISTORY,
+    MAX_SESSIONS,
+    SESSION_BACKEND,
+    SESSION_FLUSH_INTERVAL,
+    SESSION_SWEEP_INTERVAL,
+    SESSION_TIMEOUT,
+    SESSIONS_DB_FILE,
+    SESSIONS_DIR,
+    SESSIONS_FILE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def empty_session() -> Dict[str, Any]:
+    return {"history": [], "summary": ""}
 
 
 class SessionStore:
-    """Persist conversational sessions in a single JSON file on disk."""
+    """Persist conversational sessions in a single JSON file on disk.
+
+    Sessions idle longer than ``timeout`` seconds expire, at most
+    ``max_sessions`` are kept (least recently used evicted first) and each
+    history is capped at ``max_history`` messages. A value <= 0 disables
+    the corresponding limit.
 
-    def __init__(self, path: str | Path = SESSIONS_FILE) -> None:
+    Reads are served from an in-memory copy that is only re-parsed when the
+    file changes on disk. With ``flush_interval`` > 0 updates are buffered and
+    written in one batch per interval (write-behind); 0 writes through on
+    every update. Each flush re-reads the file under an exclusive ``fcntl``
+    lock and replays the buffered messages on top, so several worker
+    processes can share the file without losing each other's updates.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = SESSIONS_FILE,
+        timeout: float = SESSION_TIMEOUT,
+        max_sessions: int = MAX_SESSIONS,
+        max_history: int = MAX_SESSION_HISTORY,
+        flush_interval: float = SESSION_FLUSH_INTERVAL,
+    ) -> None:
         self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.flush_interval = flush_interval
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        self._ensure_file()
+
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._signature: Optional[tuple] = None
+        # (session_id, messages, summary, timestamp) chưa ghi xuống đĩa
+        self._pending: List[Tuple[str, List[Dict[str, str]], Optional[str], float]] = []
+        self._timer: Optional[threading.Timer] = None
+
+        with self._file_lock():
+            self._ensure_file()
+        if self.flush_interval > 0:
+            atexit.register(self.flush)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Advisory lock liên process; no-op trên nền tảng không có ``fcntl``."""
+        if fcntl is None:
+            yield
+            return
+        with self.lock_path.open("a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
     def _ensure_file(self) -> None:
         if not self.path.exists() or self.path.stat().st_size == 0:
             self._write_empty()
 
     def _write_empty(self) -> None:
-        with self.path.open("w", encoding="utf-8") as f:
-            json.dump({}, f, ensure_ascii=False, indent=2)
+        self._save_all({})
 
     def _load_all(self) -> Dict[str, Any]:
         try:
@@ -43,12 +118,79 @@ class SessionStore:
             return {}
 
     def _save_all(self, data: Dict[str, Any]) -> None:
-        with self.path.open("w", encoding="utf-8") as f:
+        # Ghi file tạm rồi rename để reader ở process khác không đọc phải file dở.
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _stat_signature(self) -> Optional[tuple]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self) -> None:
+        """Parse lại file chỉ khi nó đã bị process khác thay đổi."""
+        signature = self._stat_signature()
+        if signature is None or signature != self._signature:
+            self._cache = self._load_all()
+            self._signature = self._stat_signature()
+
+    def _expired(self, session: Dict[str, Any], now: float) -> bool:
+        last_access = session.get("last_access")
+        return (
+            self.timeout > 0
+            and last_access is not None
+            and now - last_access > self.timeout
+        )
+
+    def _apply(
+        self,
+        data: Dict[str, Any],
+        session_id: str,
+        messages: List[Dict[str, str]],
+        summary: Optional[str],
+        now: float,
+    ) -> None:
+        session = data.get(session_id)
+        if session is None or self._expired(session, now):
+            session = empty_session()
+        history = session["history"] + messages
+        if self.max_history > 0:
+            history = history[-self.max_history :]
+        data[session_id] = {
+            **session,
+            "history": history,
+            "summary": summary if summary is not None else session["summary"],
+            "last_access": now,
+        }
+
+    def _evict(self, data: Dict[str, Any], now: float) -> int:
+        """Xoá session hết hạn rồi cắt LRU về ``max_sessions``; trả về số session bị xoá."""
+        before = len(data)
+        for session_id in [sid for sid, s in data.items() if self._expired(s, now)]:
+            del data[session_id]
+        if self.max_sessions > 0 and len(data) > self.max_sessions:
+            by_access = sorted(data, key=lambda sid: data[sid].get("last_access", now))
+            for session_id in by_access[: len(data) - self.max_sessions]:
+                del data[session_id]
+        return before - len(data)
 
     def get_session(self, session_id: str) -> Dict[str, Any]:
-        data = self._load_all()
-        return data.get(session_id, {"history": [], "summary": ""})
+        with self._lock:
+            self._refresh()
+            view: Dict[str, Any] = {}
+            if session_id in self._cache:
+                view[session_id] = self._cache[session_id]
+            for sid, messages, summary, ts in self._pending:
+                if sid == session_id:
+                    self._apply(view, sid, messages, summary, ts)
+        session = view.get(session_id)
+        if session is None or self._expired(session, time.time()):
+            return empty_session()
+        return {"history": list(session["history"]), "summary": session["summary"]}
 
     def update_session(
         self,
@@ -57,13 +199,134 @@ class SessionStore:
         assistant_msg: str,
         summary: str | None = None,
     ) -> None:
-        data = self._load_all()
-        session = data.get(session_id, {"history": [], "summary": ""})
-        session["history"].append({"role": "user", "content": user_msg})
-        session["history"].append({"role": "assistant", "content": assistant_msg})
-        if summary is not None:
-            session["summary"] = summary
-        data[session_id] = session
-        self._save_all(data)
+        messages = [
+            {"role": "user", "content": user_msg},
+            {"role": "assistant", "content": assistant_msg},
+        ]
+        with self._lock:
+            self._pending.append((session_id, messages, summary, time.time()))
+            if self.flush_interval <= 0:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_from_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            try:
+                self._flush_locked()
+            except Exception:
+                logger.exception("Session flush failed; will retry on next update")
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        with self._file_lock():
+            # Luôn đọc lại dưới lock để merge với update của process khác.
+            data = self._load_all()
+            for session_id, messages, summary, ts in self._pending:
+                self._apply(data, session_id, messages, summary, ts)
+            self._evict(data, time.time())
+            self._save_all(data)
+            self._cache = data
+            self._signature = self._stat_signature()
+        self._pending.clear()
+
+    def flush(self) -> None:
+        """Ghi ngay các update đang buffer xuống đĩa."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush_locked()
+
+    def sweep(self) -> int:
+        """
+        Dọn session hết hạn / vượt ``max_sessions``.
+
+        Session cũ chưa có ``last_access`` được gán thời điểm hiện tại,
+        tức là có thêm một chu kỳ ``timeout`` trước khi bị xoá.
+
+        Returns:
+            int: Số session đã xoá
+        """
+        with self._lock:
+            self._flush_locked()
+            with self._file_lock():
+                now = time.time()
+                data = self._load_all()
+                stamped = 0
+                for session in data.values():
+                    if "last_access" not in session:
+                        session["last_access"] = now
+                        stamped += 1
+                evicted = self._evict(data, now)
+                if evicted or stamped:
+                    self._save_all(data)
+                self._cache = data
+                self._signature = self._stat_signature()
+        return evicted
+
+    def close(self) -> None:
+        self.flush()
+
+
+def create_session_store(backend: str = SESSION_BACKEND):
+    """
+    Tạo session store theo ``SESSION_BACKEND``.
+
+    Với backend ``sqlite``/``journal``, lần đầu tạo store sẽ tự migrate
+    ``sessions.json`` cũ. Backend ``journal`` chạy compaction nền và chỉ dùng
+    được cho một process (process thứ hai mở cùng thư mục sẽ bị từ chối).
+    """
+    backend = backend.lower()
+    if backend == "json":
+        return SessionStore()
+    if backend == "sqlite":
+        from src.session_store_sqlite import SqliteSessionStore
+
+        is_new = not SESSIONS_DB_FILE.exists()
+        store = SqliteSessionStore(SESSIONS_DB_FILE)
+        if is_new:
+            store.import_json(SESSIONS_FILE)
+        return store
+    if backend == "journal":
+        from src.session_journal import JournalSessionStore
+
+        store = JournalSessionStore(SESSIONS_DIR)
+        if not store.snapshot_path.exists() and store.journal_path.stat().st_size == 0:
+            store.import_json(SESSIONS_FILE)
+        store.start_compactor()
+        return store
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+
+def start_session_sweeper(
+    store: Any, interval: float = SESSION_SWEEP_INTERVAL
+) -> Optional[threading.Thread]:
+    """
+    Chạy ``store.sweep()`` định kỳ trên daemon thread.
+
+    Returns:
+        Thread đang chạy, hoặc None nếu store không hỗ trợ ``sweep``
+        hoặc ``interval`` <= 0
+    """
+    sweep = getattr(store, "sweep", None)
+    if sweep is None or interval <= 0:
+        return None
 
+    def loop() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                evicted = sweep()
+                if evicted:
+                    logger.info("Session sweeper evicted %s sessions", evicted)
+            except Exception:
+                logger.exception("Session sweep failed")
 
+    thread = threading.Thread(target=loop, name="session-sweeper", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,223 @@
+"""SQLite (WAL) session persistence: one row per message, indexed by session."""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from src.config import MAX_SESSION_HISTORY, MAX_SESSIONS, SESSION_TIMEOUT, SESSIONS_DB_FILE
+
+
+class SqliteSessionStore:
+    """Same ``get_session``/``update_session`` API as ``SessionStore``, backed by SQLite.
+
+    Each update is a single short transaction that appends two rows, so cost
+    no longer grows with the history of every user, and SQLite's locking lets
+    several Streamlit processes write concurrently without losing messages.
+    ``updated_at`` doubles as the last-access time for TTL/LRU eviction.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = SESSIONS_DB_FILE,
+        timeout: float = SESSION_TIMEOUT,
+        max_sessions: int = MAX_SESSIONS,
+        max_history: int = MAX_SESSION_HISTORY,
+    ) -> None:
+        self.path = Path(path)
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path),
+            timeout=10.0,
+            check_same_thread=False,
+            isolation_level=None,  # tự quản lý transaction
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL
+                        REFERENCES sessions (session_id) ON DELETE CASCADE,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_messages_session
+                    ON messages (session_id, id);
+                CREATE INDEX IF NOT EXISTS idx_sessions_updated
+                    ON sessions (updated_at);
+                """
+            )
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, updated_at FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None or (self.timeout > 0 and time.time() - row[1] > self.timeout):
+                return {"history": [], "summary": ""}
+            messages = self._conn.execute(
+                "SELECT role, content FROM messages"
+                " WHERE session_id = ? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        return {
+            "history": [{"role": role, "content": content} for role, content in messages],
+            "summary": row[0],
+        }
+
+    def update_session(
+        self,
+        session_id: str,
+        user_msg: str,
+        assistant_msg: str,
+        summary: str | None = None,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.timeout > 0:
+                    # Session hết hạn bắt đầu lại từ đầu (messages xoá theo cascade).
+                    self._conn.execute(
+                        "DELETE FROM sessions WHERE session_id = ? AND updated_at < ?",
+                        (session_id, now - self.timeout),
+                    )
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, summary, created_at, updated_at)"
+                    " VALUES (?, '', ?, ?)"
+                    " ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                    (session_id, now, now),
+                )
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    [
+                        (session_id, "user", user_msg, now),
+                        (session_id, "assistant", assistant_msg, now),
+                    ],
+                )
+                if summary is not None:
+                    self._conn.execute(
+                        "UPDATE sessions SET summary = ? WHERE session_id = ?",
+                        (summary, session_id),
+                    )
+                if self.max_history > 0:
+                    self._conn.execute(
+                        "DELETE FROM messages WHERE session_id = ? AND id NOT IN"
+                        " (SELECT id FROM messages WHERE session_id = ?"
+                        " ORDER BY id DESC LIMIT ?)",
+                        (session_id, session_id, self.max_history),
+                    )
+                self._evict_locked(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict_locked(self, now: float) -> int:
+        evicted = 0
+        if self.timeout > 0:
+            evicted += self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (now - self.timeout,)
+            ).rowcount
+        if self.max_sessions > 0:
+            evicted += self._conn.execute(
+                "DELETE FROM sessions WHERE session_id NOT IN"
+                " (SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+                (self.max_sessions,),
+            ).rowcount
+        return evicted
+
+    def sweep(self) -> int:
+        """Xoá session hết hạn / vượt ``max_sessions``; trả về số session đã xoá."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                evicted = self._evict_locked(time.time())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def import_json(self, json_path: str | Path) -> int:
+        """
+        Migrate sessions từ file ``sessions.json`` cũ.
+
+        Session đã có trong DB được bỏ qua nên có thể chạy lại nhiều lần.
+        Giữ ``last_access`` của từng session (thiếu thì lấy thời điểm hiện tại,
+        như ``SessionStore.sweep``), bỏ session đã hết hạn, cắt history còn
+        ``max_history`` tin cuối rồi evict theo ``max_sessions`` một lần.
+
+        Returns:
+            int: Số session đã import
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        content = json_path.read_text(encoding="utf-8").strip()
+        if not content:
+            return 0
+        data: Dict[str, Any] = json.loads(content)
+
+        imported = 0
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for session_id, session in data.items():
+                    last_access = float(session.get("last_access") or now)
+                    if self.timeout > 0 and now - last_access > self.timeout:
+                        continue
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO sessions"
+                        " (session_id, summary, created_at, updated_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (session_id, session.get("summary") or "", last_access, last_access),
+                    )
+                    if cursor.rowcount == 0:
+                        continue
+                    history = session.get("history", [])
+                    if self.max_history > 0:
+                        history = history[-self.max_history :]
+                    self._conn.executemany(
+                        "INSERT INTO messages (session_id, role, content, created_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        [
+                            (session_id, msg.get("role", ""), msg.get("content", ""), last_access)
+                            for msg in history
+                        ],
+                    )
+                    imported += 1
+                self._evict_locked(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return imported
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,93 @@
+"""Event loop sống suốt process trên background thread (cho Streamlit / code sync)."""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """Một ``asyncio`` loop chạy ``run_forever`` trên daemon thread.
+
+    Code sync (Streamlit script rerun) gửi coroutine vào qua ``run``/``submit``
+    thay vì ``asyncio.run``, nên loop, default executor và mọi tài nguyên async
+    gắn với loop (connection pool, batcher, lock) được giữ ấm giữa các request.
+    """
+
+    def __init__(
+        self, name: str = "app-event-loop", max_workers: Optional[int] = None
+    ) -> None:
+        self.name = name
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=f"{name}-worker"
+            )
+        )
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._started.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            try:
+                pending = asyncio.all_tasks(self._loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    self._loop.run_until_complete(
+                        asyncio.gather(*pending, return_exceptions=True)
+                    )
+                self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+                self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            finally:
+                self._loop.close()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._loop.is_closed()
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """Lên lịch coroutine trên loop nền; trả về future thread-safe."""
+        if not self.running:
+            coro.close()
+            raise RuntimeError(f"{self.name} is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        Chạy coroutine trên loop nền và chờ kết quả (blocking).
+
+        Timeout → coroutine bị cancel và ``TimeoutError`` được raise.
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("BackgroundLoop.run() called from its own loop thread")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Cancel task còn lại, dừng loop và join thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        except RuntimeError:  # loop vừa đóng ở thread nền
+            return
+        self._thread.join(timeout)
@@ -0,0 +1,42 @@
+"""Deadline end-to-end cho một request, chia nhỏ cho từng stage."""
+from __future__ import annotations
+
+import time
+
+
+class Deadline:
+    """Absolute deadline trên ``time.monotonic()``."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float) -> None:
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + max(0.0, float(seconds)))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def budget(self, fraction: float = 1.0, reserve: float = 0.0) -> float:
+        """
+        Thời gian dành cho một stage.
+
+        Args:
+            fraction: Tỉ lệ thời gian còn lại dành cho stage
+            reserve: Số giây phải chừa lại cho các stage phía sau
+
+        Returns:
+            float: Số giây (>= 0); 0 nghĩa là nên bỏ qua stage
+        """
+        remaining = self.remaining()
+        return max(0.0, min(remaining * fraction, remaining - reserve))
+
+    def child(self, seconds: float) -> "Deadline":
+        """Deadline con không vượt quá deadline hiện tại."""
+        return Deadline(min(self.expires_at, time.monotonic() + max(0.0, seconds)))
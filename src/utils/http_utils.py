@@ -0,0 +1,192 @@
+"""Minimal HTTP/1.1 trên asyncio streams (stdlib only): parse request, JSON / chunked response."""
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+MAX_HEADER_LINES = 100
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+class HTTPError(Exception):
+    """Lỗi trả về client dưới dạng ``{"error": message}`` với status tương ứng."""
+
+    def __init__(
+        self,
+        status: int,
+        message: str | None = None,
+        headers: Mapping[str, str] | None = None,
+    ) -> None:
+        self.status = int(status)
+        self.message = message or HTTPStatus(self.status).phrase
+        self.headers = dict(headers or {})
+        super().__init__(self.message)
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b""
+    version: str = "HTTP/1.1"
+    _json: Any = field(default=None, repr=False)
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Any:
+        """Body dạng JSON; body rỗng → ``{}``."""
+        if self._json is None:
+            if not self.body.strip():
+                self._json = {}
+            else:
+                try:
+                    self._json = json.loads(self.body)
+                except ValueError as e:
+                    raise HTTPError(400, f"Invalid JSON body: {e}") from e
+        return self._json
+
+
+async def read_request(
+    reader: asyncio.StreamReader, max_body: int
+) -> Optional[Request]:
+    """
+    Đọc một request từ connection.
+
+    Returns:
+        Request, hoặc None nếu client đã đóng connection
+
+    Raises:
+        HTTPError: Request sai cú pháp (400) hoặc body quá lớn (413)
+    """
+    try:
+        request_line = await reader.readline()
+    except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+        return None
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").strip().split()
+    if len(parts) != 3:
+        raise HTTPError(400, "Malformed request line")
+    method, target, version = parts
+
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(400, "Malformed header")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(431)
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError as e:
+        raise HTTPError(400, "Invalid Content-Length") from e
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > max_body:
+        raise HTTPError(413, f"Body exceeds {max_body} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    url = urlsplit(target)
+    return Request(
+        method=method.upper(),
+        path=url.path or "/",
+        query=dict(parse_qsl(url.query)),
+        headers=headers,
+        body=body,
+        version=version.upper(),
+    )
+
+
+def _head(
+    status: int,
+    content_type: str,
+    keep_alive: bool,
+    headers: Mapping[str, str] | None,
+    content_length: int | None,
+) -> bytes:
+    lines = [
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        f"Content-Type: {content_type}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if content_length is None:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {content_length}")
+    lines.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes,
+    content_type: str = "text/plain; charset=utf-8",
+    keep_alive: bool = True,
+    headers: Mapping[str, str] | None = None,
+) -> None:
+    writer.write(_head(status, content_type, keep_alive, headers, len(body)) + body)
+    await writer.drain()
+
+
+async def write_json(
+    writer: asyncio.StreamWriter,
+    status: int,
+    payload: Any,
+    keep_alive: bool = True,
+    headers: Mapping[str, str] | None = None,
+) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await write_response(writer, status, body, JSON_CONTENT_TYPE, keep_alive, headers)
+
+
+class ChunkedResponse:
+    """Response ``Transfer-Encoding: chunked``; mỗi ``send_json`` là một dòng NDJSON."""
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+
+    @classmethod
+    async def start(
+        cls,
+        writer: asyncio.StreamWriter,
+        status: int = 200,
+        content_type: str = NDJSON_CONTENT_TYPE,
+        keep_alive: bool = True,
+        headers: Mapping[str, str] | None = None,
+    ) -> "ChunkedResponse":
+        writer.write(_head(status, content_type, keep_alive, headers, None))
+        await writer.drain()
+        return cls(writer)
+
+    async def send(self, data: bytes) -> None:
+        if not data:
+            return
+        self.writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        await self.writer.drain()
+
+    async def send_json(self, payload: Any) -> None:
+        await self.send((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async def close(self) -> None:
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
@@ -0,0 +1,308 @@
+"""Instrumentation: span timers, counters/gauges/latency summaries, Prometheus + JSON export."""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Mapping, Tuple
+
+from src.config import LOG_LEVEL, METRICS_ENABLED, METRICS_JSON_LOGS, METRICS_WINDOW
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+trace_logger = logging.getLogger("src.trace")
+
+
+def _label_key(labels: Mapping[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class _Summary:
+    """Count/sum toàn cục + cửa sổ mẫu gần nhất để tính quantile."""
+
+    __slots__ = ("count", "total", "window")
+
+    def __init__(self, window: int) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.window: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.window.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.window)
+        return {q: _quantile(ordered, q) for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """Thread-safe registry cho counters, gauges và latency summaries."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, _Summary]] = {}
+        self._collectors: Dict[str, Callable[[], Mapping[str, object]]] = {}
+
+    def inc(self, name: str, amount: float = 1.0, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            family[key] = family.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: object) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            family = self._gauges.setdefault(name, {})
+            family[key] = family.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            family = self._summaries.setdefault(name, {})
+            summary = family.get(key)
+            if summary is None:
+                summary = family[key] = _Summary(self.window)
+            summary.observe(value)
+
+    def register_collector(
+        self, name: str, collect: Callable[[], Mapping[str, object]]
+    ) -> None:
+        """Đăng ký hàm trả về dict số liệu (vd ``cache.stats``) để export dạng gauge."""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def unregister_collector(self, name: str) -> None:
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def _collected(self) -> Dict[str, float]:
+        with self._lock:
+            collectors = list(self._collectors.items())
+        values: Dict[str, float] = {}
+        for prefix, collect in collectors:
+            try:
+                stats = collect()
+            except Exception:  # collector lỗi không được làm hỏng export
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[f"{prefix}_{key}"] = float(value)
+        return values
+
+    def snapshot(self) -> Dict[str, object]:
+        """Dump toàn bộ metrics dạng dict JSON-serializable."""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(k), "value": v} for k, v in fam.items()]
+                for name, fam in self._counters.items()
+            }
+            gauges = {
+                name: [{"labels": dict(k), "value": v} for k, v in fam.items()]
+                for name, fam in self._gauges.items()
+            }
+            summaries = {
+                name: [
+                    {
+                        "labels": dict(k),
+                        "count": s.count,
+                        "sum": s.total,
+                        **{f"p{int(q * 100)}": v for q, v in s.quantiles().items()},
+                    }
+                    for k, s in fam.items()
+                ]
+                for name, fam in self._summaries.items()
+            }
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "summaries": summaries,
+            "collected": self._collected(),
+        }
+
+    def render_prometheus(self) -> str:
+        """Export theo Prometheus text exposition format (v0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, fam in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name}_total counter")
+                for key, value in fam.items():
+                    lines.append(f"{name}_total{_format_labels(key)} {value:g}")
+            for name, fam in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in fam.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, fam in sorted(self._summaries.items()):
+                lines.append(f"# TYPE {name} summary")
+                for key, summary in fam.items():
+                    for q, value in summary.quantiles().items():
+                        labels = _format_labels(key, [("quantile", f"{q:g}")])
+                        lines.append(f"{name}{labels} {value:.6f}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {summary.total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {summary.count}")
+
+        for name, value in sorted(self._collected().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+metrics = MetricsRegistry()
+
+_enabled = METRICS_ENABLED
+_json_logs = METRICS_JSON_LOGS
+
+
+def set_enabled(enabled: bool, json_logs: bool | None = None) -> None:
+    """Bật/tắt instrumentation lúc runtime (vd trong test hoặc CLI)."""
+    global _enabled, _json_logs
+    _enabled = bool(enabled)
+    if json_logs is not None:
+        _json_logs = bool(json_logs)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: object) -> bool:
+        return False
+
+    def set(self, **labels: object) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Đo thời gian một block, cập nhật in-flight gauge và latency summary."""
+
+    __slots__ = ("name", "labels", "_start")
+
+    def __init__(self, name: str, labels: Dict[str, object]) -> None:
+        self.name = name
+        self.labels = labels
+        self._start = 0.0
+
+    def set(self, **labels: object) -> None:
+        """Bổ sung label biết được giữa chừng (vd ``outcome``) cho log JSON."""
+        self.labels.update(labels)
+
+    def __enter__(self) -> "_Span":
+        metrics.add_gauge(f"{self.name}_in_flight", 1)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self._start
+        metrics.add_gauge(f"{self.name}_in_flight", -1)
+        metrics.observe(f"{self.name}_seconds", elapsed, **self.labels)
+        if exc_type is not None:
+            metrics.inc(f"{self.name}_errors", **self.labels)
+        if _json_logs:
+            trace_logger.info(
+                json.dumps(
+                    {
+                        "span": self.name,
+                        "duration_ms": round(elapsed * 1000, 3),
+                        "error": exc_type.__name__ if exc_type else None,
+                        **{k: str(v) for k, v in self.labels.items()},
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return False
+
+
+def span(name: str, **labels: object) -> _Span | _NoopSpan:
+    """
+    Context manager đo latency của một stage.
+
+    Label chỉ nên là giá trị có cardinality thấp (stage, outcome, ...).
+    Khi instrumentation tắt, trả về một no-op span dùng chung.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, labels)
+
+
+def count(name: str, amount: float = 1.0, **labels: object) -> None:
+    """Tăng counter nếu instrumentation đang bật."""
+    if _enabled:
+        metrics.inc(name, amount, **labels)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log record thành một dòng JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        try:
+            payload = json.loads(message)
+            if not isinstance(payload, dict):
+                payload = {"message": payload}
+        except (ValueError, TypeError):
+            payload = {"message": message}
+        payload.setdefault("level", record.levelname)
+        payload.setdefault("logger", record.name)
+        payload.setdefault("ts", round(record.created, 3))
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def configure_logging(level: str = LOG_LEVEL, json_format: bool = False) -> None:
+    """Cấu hình root logger (text hoặc JSON một dòng/record)."""
+    handler = logging.StreamHandler()
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
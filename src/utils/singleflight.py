@@ -0,0 +1,93 @@
+"""Gộp các lời gọi giống hệt nhau đang chạy đồng thời (single-flight)."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Let the first caller for a key do the work and fan the result out.
+
+    Pending calls are tracked with ``concurrent.futures.Future`` objects so
+    callers can wait from any thread or event loop (Streamlit runs every
+    session in its own thread with its own ``asyncio.run`` loop).
+
+    Future dùng chung chỉ do worker chạy ``fn`` hoàn tất: nó được đánh dấu
+    RUNNING ngay khi tạo (không ``cancel()`` được) và mọi caller, kể cả
+    leader, chờ qua ``asyncio.shield``. Một caller bị huỷ / timeout chỉ
+    ngừng chờ, không ảnh hưởng các caller khác cùng key.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            fut = Future()
+            fut.set_running_or_notify_cancel()
+            self._inflight[key] = fut
+            self.leaders += 1
+            return fut, True
+
+    def _finish(self, key: Hashable, fut: Future, result: Any, error: BaseException | None) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Chạy ``fn`` (sync) một lần cho mỗi key đang in-flight."""
+        fut, leader = self._join(key)
+        if not leader:
+            return fut.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, fut, None, e)
+            raise
+        self._finish(key, fut, result, None)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Như ``do`` nhưng chạy ``fn`` trong worker thread và await kết quả."""
+        fut, leader = self._join(key)
+        if leader:
+            # Worker thuộc về SingleFlight: leader bị huỷ thì ``fn`` vẫn chạy
+            # xong và hoàn tất future cho các follower.
+            context = contextvars.copy_context()
+            asyncio.get_running_loop().run_in_executor(
+                None, context.run, self._run, key, fut, fn
+            )
+        return await asyncio.shield(asyncio.wrap_future(fut))
+
+    def _run(self, key: Hashable, fut: Future, fn: Callable[[], T]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, fut, None, e)
+        else:
+            self._finish(key, fut, result, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "inflight": inflight,
+        }
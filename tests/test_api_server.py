@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Tuple
+
+import pytest
+
+from src.agents.orchestrator_agent import ArticleResult, OrchestratorResult
+from src.api_server import APIServer
+from src.rag_news import NewsItem
+
+ITEM = NewsItem(id="n1", title="Tesla", content="Tesla beats", date="2025-01-01", ticker="TSLA")
+
+
+class FakeOrchestrator:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def handle_detailed(self, session_id, question, deadline=None, ticker=None):
+        await asyncio.sleep(self.delay)
+        return OrchestratorResult(
+            summary=f"answer: {question}",
+            language="en",
+            ticker=ticker,
+            articles=[ArticleResult(ITEM, 0.9, {"label": "positive", "score": 0.8})],
+            timings={"total": 1.0},
+        )
+
+
+def make_deps(delay: float = 0.0) -> Dict[str, Any]:
+    return {
+        "orchestrator": FakeOrchestrator(delay),
+        "rag": SimpleNamespace(news=[ITEM]),
+        "retrieval": SimpleNamespace(
+            get_relevant_news_scored=lambda query, ticker=None, top_k=5: [(ITEM, 0.9)]
+        ),
+        "sentiment": SimpleNamespace(
+            analyze=lambda texts: [{"text": t, "label": "neutral", "score": 0.5} for t in texts]
+        ),
+    }
+
+
+async def request(
+    port: int, method: str, path: str, payload: Any = None
+) -> Tuple[int, Dict[str, str], bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    if isinstance(payload, bytes):
+        body = payload
+    else:
+        body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, rest = raw.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:])}
+    if headers.get("transfer-encoding") == "chunked":
+        body_out = b""
+        while rest:
+            size_line, _, rest = rest.partition(b"\r\n")
+            size = int(size_line, 16)
+            if size == 0:
+                break
+            body_out += rest[:size]
+            rest = rest[size + 2:]
+        rest = body_out
+    return status, headers, rest
+
+
+@pytest.mark.asyncio
+async def test_endpoints_and_readiness():
+    release = threading.Event()
+
+    def factory():
+        release.wait(5)
+        return make_deps()
+
+    server = APIServer(factory, host="127.0.0.1", port=0, heartbeat_interval=0.01)
+    await server.start()
+    try:
+        assert (await request(server.port, "GET", "/healthz"))[0] == 200
+        status, _, body = await request(server.port, "GET", "/readyz")
+        assert status == 503 and json.loads(body)["status"] == "starting"
+        assert (await request(server.port, "POST", "/ask", {"question": "hi"}))[0] == 503
+
+        release.set()
+        for _ in range(100):
+            if server.ready:
+                break
+            await asyncio.sleep(0.01)
+        assert (await request(server.port, "GET", "/readyz"))[0] == 200
+
+        status, _, body = await request(
+            server.port, "POST", "/ask", {"question": "Tesla?", "ticker": "TSLA", "session_id": "s1"}
+        )
+        data = json.loads(body)
+        assert status == 200 and data["summary"] == "answer: Tesla?"
+        assert data["session_id"] == "s1" and data["articles"][0]["id"] == "n1"
+
+        status, headers, body = await request(
+            server.port, "POST", "/ask", {"question": "Tesla?", "stream": True}
+        )
+        events = [json.loads(line)["event"] for line in body.decode().splitlines()]
+        assert headers["content-type"] == "application/x-ndjson"
+        assert events[0] == "accepted" and events[-3:] == ["articles", "summary", "done"]
+
+        status, _, body = await request(server.port, "POST", "/search", {"query": "Tesla", "top_k": 3})
+        assert status == 200 and json.loads(body)["results"][0]["score"] == 0.9
+        status, _, body = await request(server.port, "POST", "/sentiment", {"texts": ["ok"]})
+        assert json.loads(body) == {"results": [{"label": "neutral", "score": 0.5}]}
+
+        assert (await request(server.port, "POST", "/ask", {}))[0] == 400
+        # JSON hợp lệ nhưng không phải object → 400, không phải 500.
+        for path in ("/ask", "/search", "/sentiment"):
+            for raw in (b"[1]", b"null"):
+                status, _, body = await request(server.port, "POST", path, raw)
+                assert status == 400, (path, raw)
+                assert "JSON object" in body.decode()
+        for path, payload in (
+            ("/ask", {"question": "Tesla?", "ticker": ["TSLA"]}),
+            ("/search", {"query": "Tesla", "ticker": 1}),
+        ):
+            status, _, body = await request(server.port, "POST", path, payload)
+            assert status == 400 and "'ticker' must be a string" in body.decode()
+        assert (await request(server.port, "GET", "/ask"))[0] == 405
+        assert (await request(server.port, "GET", "/nope"))[0] == 404
+        status, _, body = await request(server.port, "GET", "/metrics")
+        assert status == 200
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_rejects_when_queue_is_full():
+    server = APIServer(
+        lambda: make_deps(delay=0.2), host="127.0.0.1", port=0, max_concurrency=1, max_queue=0
+    )
+    await server.start()
+    try:
+        while not server.ready:
+            await asyncio.sleep(0.01)
+        first = asyncio.create_task(request(server.port, "POST", "/ask", {"question": "a"}))
+        await asyncio.sleep(0.05)
+        status, headers, _ = await request(server.port, "POST", "/ask", {"question": "b"})
+        assert status == 503 and headers["retry-after"] == "1"
+        assert (await first)[0] == 200
+    finally:
+        await server.close()
@@ -18,8 +18,12 @@ def test_init_dependencies_wires_services(monkeypatch):
             self.news = [object()]
 
     class FakeSessionStore:
-        def __init__(self):
-            created["session"] = self
+        pass
+
+    def fake_create_session_store(backend):
+        created["session_backend"] = backend
+        created["session"] = FakeSessionStore()
+        return created["session"]
 
     class FakeSentiment:
         pass
@@ -40,7 +44,7 @@ def test_init_dependencies_wires_services(monkeypatch):
 
     monkeypatch.setattr(app, "EmbeddingService", FakeEmbeddingService)
     monkeypatch.setattr(app, "NewsRAG", FakeRAG)
-    monkeypatch.setattr(app, "SessionStore", FakeSessionStore)
+    monkeypatch.setattr(app, "create_session_store", fake_create_session_store)
     monkeypatch.setattr(app, "SentimentService", FakeSentiment)
     monkeypatch.setattr(app, "RetrievalAgent", FakeRetrievalAgent)
     monkeypatch.setattr(app, "SummarizerAgent", FakeSummarizer)
@@ -51,4 +55,58 @@ def test_init_dependencies_wires_services(monkeypatch):
 
     assert "orchestrator" in deps
     assert created["orchestrator_args"]["session_store"] is created["session"]
-
+    assert created["session_backend"] == app.SESSION_BACKEND
+
+
+
+def _app_script():
+    # Chạy trong AppTest: thay dependency thật bằng fake rồi chạy main() thật.
+    import asyncio as _asyncio
+    import threading as _threading
+    from types import SimpleNamespace as _NS
+
+    import streamlit as _st
+
+    from src import app as _app
+    from src.agents.orchestrator_agent import OrchestratorResult as _Result
+    from src.utils.async_runner import BackgroundLoop
+
+    class Orchestrator:
+        async def handle_detailed(self, session_id, prompt, deadline=None, ticker=None):
+            await _asyncio.sleep(0)
+            thread = _threading.current_thread().name
+            return _Result(summary=f"{session_id}|{prompt}|{ticker}|{thread}", language="en")
+
+    if "fake_deps" not in _st.session_state:
+        _st.session_state["fake_deps"] = {
+            "orchestrator": Orchestrator(),
+            "rag": _NS(
+                news=[],
+                similarity_threshold=0.5,
+                set_similarity_threshold=lambda value: None,
+            ),
+            "intent_extractor": _NS(stats=lambda: {"fast_path_rate": 1.0}),
+            "event_loop": BackgroundLoop(),
+        }
+        _st.session_state["session_id"] = "session-from-script"
+    deps = _st.session_state["fake_deps"]
+    _app.init_dependencies = lambda: deps
+    _app.main()
+
+
+def test_submit_runs_orchestrator_on_background_loop_with_script_session():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(_app_script, default_timeout=30).run()
+    assert not at.exception
+
+    at.text_area[0].input("Tesla?")
+    at.sidebar.text_input[0].input("TSLA")
+    next(b for b in at.button if b.label == "Phân tích").click().run()
+
+    assert not at.exception
+    answers = [m.value for m in at.markdown if "|" in m.value]
+    session_id, prompt, ticker, thread = answers[0].split("|")
+    assert (session_id, prompt, ticker) == ("session-from-script", "Tesla?", "TSLA")
+    assert thread == "app-event-loop"  # coroutine chạy trên BackgroundLoop
+    at.session_state["fake_deps"]["event_loop"].close()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from src.utils.async_runner import BackgroundLoop
+
+
+def test_background_loop_persists_across_submissions():
+    runner = BackgroundLoop(name="test-loop")
+    try:
+        async def loop_state():
+            await asyncio.sleep(0)
+            return asyncio.get_running_loop(), threading.current_thread().name
+
+        loop1, thread1 = runner.run(loop_state())
+        loop2, thread2 = runner.run(loop_state())
+        assert loop1 is loop2 is runner.loop
+        assert thread1 == thread2 == "test-loop"
+
+        # Tài nguyên gắn với loop (Lock, Queue) dùng lại được giữa các lần gọi.
+        lock_holder = {}
+
+        async def use_lock():
+            lock = lock_holder.setdefault("lock", asyncio.Lock())
+            async with lock:
+                return await asyncio.to_thread(threading.current_thread)
+
+        worker1 = runner.run(use_lock())
+        worker2 = runner.run(use_lock())
+        assert worker1.name.startswith("test-loop-worker")
+        assert worker2.name.startswith("test-loop-worker")
+
+        async def boom():
+            raise ValueError("bad")
+
+        with pytest.raises(ValueError):
+            runner.run(boom())
+        with pytest.raises(concurrent.futures.TimeoutError):
+            runner.run(asyncio.sleep(5), timeout=0.05)
+    finally:
+        runner.close()
+
+    assert not runner.running
+    with pytest.raises(RuntimeError):
+        runner.run(asyncio.sleep(0))
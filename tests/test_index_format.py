@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.index_format import (
+    IndexFormatError,
+    IndexWriter,
+    ModelMismatchError,
+    read_header,
+    read_index,
+    rebuild_index,
+    write_index,
+)
+
+RECORDS = [
+    {"id": "n1", "title": "Tesla", "content": "Tesla tăng trưởng", "date": "2025-01-01",
+     "ticker": "TSLA", "source": "Reuters", "sentiment": {"label": "positive", "score": 0.75}},
+    {"id": "n2", "title": "Apple", "content": "Apple grows", "date": "2025-01-02", "ticker": "AAPL"},
+]
+
+
+def _write(path: Path) -> np.ndarray:
+    vectors = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+    write_index(path, RECORDS, vectors, model="model-a", version="v1")
+    return vectors
+
+
+def test_round_trip_is_zero_copy_and_self_describing(tmp_path: Path):
+    path = tmp_path / "news.idx"
+    vectors = _write(path)
+
+    header = read_header(path)
+    assert (header["format_version"], header["model"], header["dim"], header["rows"]) == (1, "model-a", 3, 2)
+
+    index = read_index(path, model="model-a", dim=3)
+    np.testing.assert_array_equal(index.vectors, vectors)
+    assert not index.vectors.flags.owndata and not index.vectors.flags.writeable
+    assert index.vectors.ctypes.data % 64 == 0
+    assert index.records() == RECORDS
+    assert index.version == "v1"
+
+
+def test_chunked_writer_matches_write_index_and_cleans_spool(tmp_path: Path):
+    records = RECORDS * 3
+    vectors = np.arange(len(records) * 3, dtype=np.float32).reshape(len(records), 3)
+    write_index(tmp_path / "full.idx", records, vectors, model="model-a", version="v1")
+
+    with IndexWriter(tmp_path / "chunked.idx") as writer:
+        for start in range(0, len(records), 4):
+            writer.append(records[start:start + 4])
+        writer.append([])
+        header = writer.finish(vectors, model="model-a", version="v1")
+
+    full = read_header(tmp_path / "full.idx")
+    assert {k: header[k] for k in ("columns", "crc32", "rows")} == {k: full[k] for k in ("columns", "crc32", "rows")}
+    index = read_index(tmp_path / "chunked.idx")
+    assert index.records() == records
+    np.testing.assert_array_equal(index.vectors, vectors)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["chunked.idx", "full.idx"]
+
+    with IndexWriter(tmp_path / "bad.idx") as writer:
+        writer.append(records)
+        with pytest.raises(ValueError, match="does not match"):
+            writer.finish(vectors[:2], model="model-a", version="v1")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["chunked.idx", "full.idx"]
+
+
+def test_rejects_mismatch_and_corruption(tmp_path: Path):
+    path = tmp_path / "news.idx"
+    _write(path)
+
+    with pytest.raises(ModelMismatchError):
+        read_index(path, model="model-b")
+    with pytest.raises(ModelMismatchError):
+        read_index(path, dim=1024)
+
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF  # lật một byte trong block vectors
+    path.write_bytes(bytes(data))
+    with pytest.raises(IndexFormatError, match="checksum"):
+        read_index(path)
+    read_index(path, verify=False)  # bỏ qua crc vẫn đọc được
+
+    path.write_bytes(bytes(data[:-10]))
+    with pytest.raises(IndexFormatError, match="truncated"):
+        read_index(path, verify=False)
+    path.write_bytes(b"not an index")
+    with pytest.raises(IndexFormatError, match="magic"):
+        read_index(path)
+
+
+def test_rebuild_reencodes_with_current_model(tmp_path: Path):
+    path = tmp_path / "news.idx"
+    _write(path)
+
+    class NewEmbedder:
+        model_name = "model-b"
+
+        def encode(self, texts):
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    index = rebuild_index(path, NewEmbedder())
+    assert (index.model, index.vectors.shape, index.version) == ("model-b", (2, 4), "v1")
+    assert index.records() == RECORDS
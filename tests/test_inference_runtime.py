@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+import threading
+
+import pytest
+import torch
+
+from src.inference_runtime import ModelRuntime, parse_cpu_list, plan_allocation
+
+
+def test_parse_cpu_list_accepts_taskset_syntax():
+    assert parse_cpu_list("0-3,6") == [0, 1, 2, 3, 6]
+    assert parse_cpu_list(" 2, 1,1 ") == [1, 2]
+    assert parse_cpu_list("") == []
+    with pytest.raises(ValueError):
+        parse_cpu_list("3-1")
+
+
+def test_plan_allocation_splits_cores_between_models():
+    cpus = list(range(8))
+    plan = plan_allocation({"embedding": (0, ""), "sentiment": (0, "")}, cpus)
+    assert plan["embedding"] == {"threads": 4, "cores": None}
+    assert plan["sentiment"] == {"threads": 4, "cores": None}
+
+    plan = plan_allocation({"embedding": (0, "0-5"), "sentiment": (3, "6,7,42")}, cpus)
+    assert plan["embedding"] == {"threads": 6, "cores": [0, 1, 2, 3, 4, 5]}
+    # core ngoài tập khả dụng bị bỏ; thread cấu hình rõ được giữ nguyên
+    assert plan["sentiment"] == {"threads": 3, "cores": [6, 7]}
+
+    plan = plan_allocation({"embedding": (0, ""), "sentiment": (0, "")}, [0])
+    assert plan["embedding"]["threads"] == plan["sentiment"]["threads"] == 1
+
+
+def test_model_runtime_runs_on_its_own_sized_worker():
+    cores = sorted(os.sched_getaffinity(0))[:1] if hasattr(os, "sched_getaffinity") else None
+    runtime = ModelRuntime("test", threads=1, cores=cores)
+    try:
+        def probe():
+            affinity = sorted(os.sched_getaffinity(0)) if cores else None
+            return threading.current_thread().name, torch.get_num_threads(), affinity
+
+        name, threads, affinity = runtime.call(probe)
+        assert name.startswith("inference-test")
+        assert threads == 1
+        assert affinity == cores
+
+        # Gọi lồng nhau từ chính worker chạy luôn thay vì deadlock.
+        assert runtime.call(lambda: runtime.call(lambda: 42)) == 42
+
+        with pytest.raises(ZeroDivisionError):
+            runtime.call(lambda: 1 / 0)
+        stats = runtime.stats()
+        assert stats["calls"] == 3
+        assert stats["queued"] == 0
+        assert stats["workers"] == 1
+    finally:
+        runtime.shutdown()
+
+
+def test_runtimes_keep_their_own_thread_counts_when_initialised_interleaved():
+    first = ModelRuntime("first", threads=2)
+    second = ModelRuntime("second", threads=3)
+    try:
+        # Worker của ``first`` khởi tạo trước, rồi ``second`` khởi tạo trước
+        # khi ``first`` chạy op song song nào.
+        first.call(lambda: None)
+        second.call(lambda: None)
+
+        def probe():
+            x = torch.ones(64, 64)
+            (x @ x).sum()
+            return torch.get_num_threads()
+
+        assert first.call(probe) == 2
+        assert second.call(probe) == 3
+    finally:
+        first.shutdown()
+        second.shutdown()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from src.agents.intent_extractor import LocalIntentExtractor
+
+
+def test_local_extractor_resolves_aliases_tickers_and_time_phrases():
+    extractor = LocalIntentExtractor(tickers=["TSLA", "AAPL", "MSFT", "AMZN"])
+
+    vi = extractor.extract("Phân tích Tesla 6 tháng gần đây")
+    assert vi.confident
+    assert (vi.company, vi.time_range) == ("TSLA", "6 months")
+
+    en = extractor.extract("How has $aapl done year to date?")
+    assert (en.company, en.time_range) == ("AAPL", "YTD")
+
+    quarter = extractor.extract("Amazon Web Services kết quả quý 2")
+    assert (quarter.company, quarter.time_range) == ("AMZN", "Q2")
+
+    # Câu so sánh trả về mọi công ty theo thứ tự xuất hiện.
+    compare = extractor.extract("So sánh Tesla và Apple")
+    assert compare.confident and compare.companies == ["TSLA", "AAPL"]
+
+    # So sánh mà chỉ giải được một công ty → nhường cho LLM.
+    partial_vi = extractor.extract("So sánh Tesla và Rivian")
+    assert not partial_vi.confident and partial_vi.companies == ["TSLA"]
+    partial_en = extractor.extract("Compare Apple with Xiaomi")
+    assert not partial_en.confident and partial_en.companies == ["AAPL"]
+    assert not extractor.extract("tesla vs rivian").confident
+    assert not extractor.extract("Rivian and Tesla outlook").confident
+    # Tên viết hoa chưa biết giữa câu, không cần cue so sánh.
+    assert not extractor.extract("Tesla bị Rivian cạnh tranh ra sao?").confident
+
+    # Tên do LLM trả về được map lại qua alias / ticker đã biết.
+    assert [extractor.resolve_name(n) for n in ("Tesla", "Apple Inc.", "msft", "Rivian")] == [
+        "TSLA", "AAPL", "MSFT", None,
+    ]
+
+    # Không có công ty → nhường cho LLM.
+    assert not extractor.extract("Thị trường hôm nay thế nào?").confident
+
+    stats = extractor.stats()
+    assert stats["fast_path_hits"] == 4
+    assert stats["llm_fallbacks"] == 6
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import src.agents.language_agent as module
+from src.agents.language_agent import LanguageAgent, heuristic_language
+
+
+def test_heuristics_decide_clear_cases_without_langdetect(monkeypatch):
+    def fail(_text):
+        raise AssertionError("langdetect should not be called")
+
+    monkeypatch.setattr(module, "detect", fail)
+    module._detect_cached.cache_clear()
+    agent = LanguageAgent()
+
+    assert agent.detect("Tin tức mới nhất về cổ phiếu Apple") == "vi"
+    assert agent.detect("Phân tích tâm lý thị trường của VNM") == "vi"
+    assert agent.detect("What is the latest news about Tesla?") == "en"
+    assert agent.detect("tom tat tin tuc ve co phieu FPT") == "vi"
+    assert agent.detect("12345 !!!") == "en"
+    assert agent.detect("Anything", user_preference="vi") == "vi"
+    assert agent.stats()["fast_path_rate"] == 1.0
+
+
+def test_ambiguous_text_falls_back_to_cached_detector(monkeypatch):
+    calls = []
+
+    def fake_detect(text):
+        calls.append(text)
+        return "vi"
+
+    monkeypatch.setattr(module, "detect", fake_detect)
+    module._detect_cached.cache_clear()
+    agent = LanguageAgent()
+
+    assert heuristic_language("Apple Tesla Nvidia") is None
+    assert agent.detect("Apple   Tesla Nvidia") == "vi"
+    assert agent.detect("Apple Tesla Nvidia ") == "vi"
+    assert calls == ["Apple Tesla Nvidia"]
+    assert agent.stats()["langdetect_fallbacks"] == 2
@@ -26,7 +26,9 @@ def test_call_llm_success(monkeypatch):
             },
         )
 
-    monkeypatch.setattr(llm_client.requests, "post", fake_post)
+    monkeypatch.setattr(
+        llm_client, "_get_http_session", lambda: SimpleNamespace(post=fake_post)
+    )
 
     response = llm_client.call_llm([{"role": "user", "content": "Ping"}])
 
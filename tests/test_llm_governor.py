@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from src import llm_client
+from src.llm_governor import CircuitOpenError, LLMGovernor, TokenBucket
+
+
+def test_backoff_is_jittered_and_capped():
+    governor = LLMGovernor(backoff_base=1.0, backoff_max=4.0)
+
+    delays = [governor.backoff_delay(attempt) for attempt in range(6)]
+
+    assert all(0.0 <= d <= 4.0 for d in delays)
+    assert governor.stats()["retries"] == 6
+
+
+def test_token_bucket_times_out_when_budget_exhausted():
+    bucket = TokenBucket(rate_per_minute=60)
+    bucket.acquire(60)
+
+    with pytest.raises(TimeoutError):
+        bucket.acquire(30, timeout=0.1)
+
+
+def test_call_llm_opens_circuit_and_fails_fast(monkeypatch):
+    governor = LLMGovernor(failure_threshold=2, reset_timeout=60, backoff_max=0)
+    monkeypatch.setattr(llm_client, "get_llm_governor", lambda: governor)
+    monkeypatch.setattr(llm_client, "LLM_API_URL", "https://fake-llm")
+    monkeypatch.setattr(llm_client, "LLM_MODEL_NAME", "mock-model")
+    posts = []
+
+    def failing_post(*args, **kwargs):
+        posts.append(1)
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    monkeypatch.setattr(
+        llm_client, "_get_http_session", lambda: SimpleNamespace(post=failing_post)
+    )
+
+    with pytest.raises(CircuitOpenError):
+        llm_client.call_llm([{"role": "user", "content": "Ping"}])
+
+    assert len(posts) == 2
+    with pytest.raises(CircuitOpenError):
+        llm_client.call_llm([{"role": "user", "content": "Ping"}])
+    assert len(posts) == 2
+
+    stats = governor.stats()
+    assert stats["circuit_state"] == "open"
+    assert stats["circuit_opened"] == 1
+    assert stats["circuit_rejections"] == 2
+
+
+def test_throttling_and_client_errors_do_not_count_as_success(monkeypatch):
+    governor = LLMGovernor(failure_threshold=2, reset_timeout=60, backoff_max=0)
+    monkeypatch.setattr(llm_client, "get_llm_governor", lambda: governor)
+    monkeypatch.setattr(llm_client, "LLM_API_URL", "https://fake-llm")
+    monkeypatch.setattr(llm_client, "LLM_MODEL_NAME", "mock-model")
+    monkeypatch.setattr(llm_client, "MAX_RETRIES", 5)
+    statuses = [500, 429, 500, 429, 400]
+
+    def post(*args, **kwargs):
+        response = requests.Response()
+        response.status_code = statuses.pop(0)
+        return response
+
+    monkeypatch.setattr(llm_client, "_get_http_session", lambda: SimpleNamespace(post=post))
+
+    # 5xx xen kẽ 429 vẫn mở breaker (429 không reset chuỗi lỗi).
+    with pytest.raises(CircuitOpenError):
+        llm_client.call_llm([{"role": "user", "content": "Ping"}])
+    assert statuses == [429, 400]
+
+    stats = governor.stats()
+    assert (stats["successes"], stats["failures"], stats["throttled"]) == (0, 2, 1)
+    assert stats["circuit_state"] == "open"
+
+    governor.breaker.record_success()  # đóng breaker để thử nhánh 4xx
+    statuses[:] = [400]
+    with pytest.raises(requests.RequestException, match="HTTP error 400"):
+        llm_client.call_llm([{"role": "user", "content": "Ping"}])
+    stats = governor.stats()
+    assert (stats["successes"], stats["client_errors"]) == (0, 1)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from src import llm_client
+from src.load_generator import (
+    build_app_dependencies,
+    build_stub_dependencies,
+    orchestrator_sender,
+    run_load,
+    summarize_load,
+)
+from src.mock_llm_server import MockLLMConfig, MockLLMServer
+
+
+@pytest.mark.asyncio
+async def test_run_load_reports_throughput_errors_and_stages():
+    calls = []
+
+    async def send(session_id, question):
+        calls.append(session_id)
+        n = len(calls)
+        await asyncio.sleep(0.01)
+        if n % 4 == 0:
+            raise TimeoutError()
+        return {"timings": {"retrieve": 2.0, "total": 10.0}, "degraded": n % 2 == 1}
+
+    result = await run_load(send, ["q"], rps=100, duration=0.2, arrival="constant", users=3)
+    summary = summarize_load(result)
+
+    assert summary["requests"] == 20
+    assert summary["failed"] == 5
+    assert summary["completed"] == 15
+    assert summary["errors"] == {"TimeoutError": 5}
+    assert summary["dropped"] == 0
+    assert summary["stages_ms"]["retrieve"]["p50"] == 2.0
+    assert summary["latency_ms"]["p99"] >= summary["latency_ms"]["p50"] > 0
+    assert set(calls) == {"load-0", "load-1", "load-2"}
+
+
+@pytest.mark.asyncio
+async def test_run_load_drops_requests_beyond_max_in_flight():
+    async def slow(session_id, question):
+        await asyncio.sleep(0.3)
+        return {}
+
+    result = await run_load(slow, ["q"], rps=100, duration=0.1, max_in_flight=2, arrival="constant")
+    summary = summarize_load(result)
+    assert summary["completed"] == 2
+    assert summary["dropped"] == summary["requests"] - 2 > 0
+    assert summary["error_rate"] > 0.5
+
+
+@pytest.mark.asyncio
+async def test_load_against_stub_orchestrator_and_mock_llm(tmp_path, monkeypatch):
+    news = tmp_path / "news.jsonl"
+    news.write_text(
+        "\n".join(
+            json.dumps({"id": f"n{i}", "title": f"{t} update", "content": f"{t} earnings beat {i}",
+                        "date": "2025-01-0%d" % (i + 1), "ticker": t})
+            for i, t in enumerate(["AAPL", "TSLA", "AAPL", "NVDA"])
+        ),
+        encoding="utf-8",
+    )
+    server = MockLLMServer(MockLLMConfig(latency_ms=5, jitter_ms=0, tokens_per_second=0))
+    await server.start()
+    monkeypatch.setattr(llm_client, "LLM_API_URL", f"{server.url}/v1/chat/completions")
+    monkeypatch.setattr(llm_client, "LLM_MODEL_NAME", "mock-llm")
+    try:
+        deps = build_stub_dependencies(news, tmp_path / "work")
+        send = orchestrator_sender(deps["orchestrator"], deadline=10)
+        result = await run_load(
+            send, ["Tin tức về AAPL?", "What about TSLA?"], rps=20, duration=0.3, arrival="constant"
+        )
+    finally:
+        await server.close()
+
+    summary = summarize_load(result)
+    assert summary["failed"] == 0
+    assert summary["completed"] == summary["requests"] > 0
+    assert {"retrieve_refine", "summarize", "total"} <= set(summary["stages_ms"])
+    assert server.stats()["requests"] >= summary["completed"]  # summary qua mock LLM
+
+
+@pytest.mark.parametrize("mock_llm", [True, False])
+def test_app_dependencies_drop_persistent_caches_with_mock_llm(monkeypatch, mock_llm):
+    from types import SimpleNamespace
+
+    import src.app
+
+    orchestrator = SimpleNamespace(llm_cache="llm-cache", answer_cache="answer-cache")
+    monkeypatch.setattr(src.app, "init_dependencies", lambda: {"orchestrator": orchestrator})
+
+    build_app_dependencies(mock_llm=mock_llm)
+
+    cached = (orchestrator.llm_cache, orchestrator.answer_cache)
+    assert cached == ((None, None) if mock_llm else ("llm-cache", "answer-cache"))
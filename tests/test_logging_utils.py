@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+import logging
+
+import pytest
+
+from src.utils import logging_utils
+from src.utils.logging_utils import metrics, span
+
+
+@pytest.fixture(autouse=True)
+def restore_metrics_flags(monkeypatch):
+    # monkeypatch khôi phục cờ toàn cục sau mỗi test, kể cả khi test gọi set_enabled.
+    monkeypatch.setattr(logging_utils, "_enabled", logging_utils._enabled)
+    monkeypatch.setattr(logging_utils, "_json_logs", logging_utils._json_logs)
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    logging_utils.set_enabled(True, json_logs=True)
+    try:
+        yield metrics
+    finally:
+        metrics.reset()
+
+
+@pytest.fixture
+def demo_collector():
+    metrics.register_collector("demo_cache", lambda: {"hit_rate": 0.5, "state": "x"})
+    try:
+        yield
+    finally:
+        metrics.unregister_collector("demo_cache")
+
+
+def test_span_is_noop_when_disabled():
+    logging_utils.set_enabled(False)
+    assert span("anything") is span("other")
+
+
+def test_span_records_latency_and_exports_prometheus(enabled_metrics, demo_collector, caplog):
+
+    with caplog.at_level(logging.INFO, logger="src.trace"):
+        for _ in range(3):
+            with span("orchestrator_stage", stage="extract"):
+                pass
+        with pytest.raises(RuntimeError):
+            with span("orchestrator_stage", stage="summarize"):
+                raise RuntimeError("boom")
+
+    text = metrics.render_prometheus()
+    assert 'orchestrator_stage_seconds{stage="extract",quantile="0.99"}' in text
+    assert 'orchestrator_stage_seconds_count{stage="extract"} 3' in text
+    assert 'orchestrator_stage_errors_total{stage="summarize"} 1' in text
+    assert "orchestrator_stage_in_flight 0" in text
+    assert "demo_cache_hit_rate 0.5" in text
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["span"] == "orchestrator_stage"
+    assert record["error"] == "RuntimeError"
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+import requests
+
+from src import llm_client
+from src.mock_llm_server import MockLLMConfig, MockLLMServer
+
+
+def post(url, payload):
+    response = requests.post(url, json=payload, timeout=5)
+    return response.status_code, response.headers, response.json()
+
+
+CHAT = {"model": "m", "messages": [{"role": "user", "content": "Summarize TSLA"}], "max_tokens": 10}
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_speaks_every_provider_shape():
+    server = MockLLMServer(MockLLMConfig(latency_ms=0, jitter_ms=0, tokens_per_second=0, seed=1))
+    await server.start()
+    try:
+        for path, key in (
+            ("/v1/chat/completions", "choices"),
+            ("/v1/messages", "content"),
+            ("/api/generate", "response"),
+        ):
+            status, _, data = await asyncio.to_thread(post, server.url + path, CHAT)
+            assert status == 200
+            assert key in data
+            text = llm_client._extract_content(data)
+            assert len(text.split()) == 10  # max_tokens được tôn trọng
+
+        extract = {
+            "messages": [
+                {"role": "user", "content": "User query:\nTin về NVDA?\n\nExtract:\n... Return strict JSON like"}
+            ]
+        }
+        _, _, data = await asyncio.to_thread(post, server.url + "/v1/chat/completions", extract)
+        assert json.loads(llm_client._extract_content(data)) == {"companies": ["NVDA"], "time_range": None}
+        assert server.stats()["statuses"] == {"200": 4}
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_injects_errors_and_reconfigures():
+    server = MockLLMServer(MockLLMConfig(latency_ms=0, jitter_ms=0, error_rate=1.0))
+    await server.start()
+    try:
+        status, _, data = await asyncio.to_thread(post, server.url + "/v1/chat/completions", CHAT)
+        assert status == 500
+        assert "Injected" in data["error"]["message"]
+
+        status, _, config = await asyncio.to_thread(
+            post, server.url + "/admin/config", {"error_rate": 0, "rate_limit_rate": 1}
+        )
+        assert status == 200 and config["rate_limit_rate"] == 1.0
+        status, headers, _ = await asyncio.to_thread(post, server.url + "/v1/chat/completions", CHAT)
+        assert status == 429
+        assert headers["Retry-After"] == "1"
+
+        status, _, _ = await asyncio.to_thread(post, server.url + "/admin/config", {"bogus": 1})
+        assert status == 400
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_mock_llm_applies_latency_and_token_rate():
+    server = MockLLMServer(
+        MockLLMConfig(latency_ms=100, jitter_ms=0, tokens_per_second=100, response_tokens=20)
+    )
+    await server.start()
+    try:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        status, _, _ = await asyncio.to_thread(post, server.url + "/v1/chat/completions", CHAT)
+        assert status == 200
+        assert loop.time() - start >= 0.2  # 100 ms + 10 token / 100 tok/s
+    finally:
+        await server.close()
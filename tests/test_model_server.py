@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.model_server import (
+    ModelServer,
+    ModelServerClient,
+    RemoteEmbeddingService,
+    RemoteSentimentService,
+)
+
+
+class FakeEmbedding:
+    model_name = "fake-embed"
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, normalize_embeddings=True):
+        time.sleep(0.01)  # để các request đồng thời kịp gộp batch
+        self.batches.append(len(texts))
+        vectors = np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+    def get_embedding_dimension(self):
+        return 3
+
+
+class FakeSentiment:
+    def analyze(self, texts):
+        if any(t == "boom" for t in texts):
+            raise RuntimeError("model exploded")
+        return [{"text": t, "label": "positive", "score": 0.9} for t in texts]
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = ModelServer(
+        FakeEmbedding(),
+        FakeSentiment(),
+        address=tmp_path / "models.sock",
+        authkey="secret",
+        max_batch=64,
+        max_wait_ms=20,
+    )
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    assert srv.ready.wait(5)
+    yield srv
+    srv.close()
+    thread.join(timeout=5)
+
+
+def test_remote_services_match_local_interfaces(server):
+    client = ModelServerClient(server.address, authkey="secret")
+    embed = RemoteEmbeddingService(client)
+    sentiment = RemoteSentimentService(client)
+
+    assert embed.model_name == "fake-embed"
+    assert embed.get_embedding_dimension() == 3
+    vectors = embed.encode(["ab", "abcd"])
+    assert vectors.shape == (2, 3)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    raw = embed.encode("abc", normalize_embeddings=False)
+    assert raw[0, 0] == pytest.approx(3.0)
+    assert embed.encode_single("ab").shape == (3,)
+    with pytest.raises(ValueError):
+        embed.encode([])
+
+    results = sentiment.analyze(["tốt", "xấu"])
+    assert [r["text"] for r in results] == ["tốt", "xấu"]
+    assert sentiment.analyze([]) == []
+
+    with pytest.raises(RuntimeError, match="model exploded"):
+        sentiment.analyze(["boom"])
+    # Connection vẫn dùng được sau khi model lỗi.
+    assert sentiment.analyze(["ok"])[0]["label"] == "positive"
+    client.close()
+
+
+def test_concurrent_clients_share_batches(server):
+    embed = RemoteEmbeddingService(ModelServerClient(server.address, authkey="secret"))
+
+    def one(i):
+        text = "x" * (i + 1)
+        return i, embed.encode([text], normalize_embeddings=False)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(one, range(32)))
+
+    for i, vectors in results:
+        assert vectors.shape == (1, 3)
+        assert vectors[0, 0] == pytest.approx(i + 1)  # không bị lẫn kết quả giữa các request
+    batches = server.embed_service.batches
+    assert sum(batches) == 32
+    assert len(batches) < 32
+    assert server.stats()["encode"]["requests"] == 32
+
+
+def test_wrong_authkey_is_rejected(server):
+    from multiprocessing import AuthenticationError
+
+    with pytest.raises(AuthenticationError):
+        ModelServerClient(server.address, authkey="wrong").call("info")
+
+
+def test_server_without_sentiment_refuses_remote_sentiment(tmp_path):
+    srv = ModelServer(FakeEmbedding(), None, address=tmp_path / "embed.sock", authkey="secret")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    assert srv.ready.wait(5)
+    try:
+        with pytest.raises(RuntimeError):
+            RemoteSentimentService(ModelServerClient(srv.address, authkey="secret"))
+    finally:
+        srv.close()
+        thread.join(timeout=5)
+
+
+def test_refuses_to_run_without_authkey(tmp_path):
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        ModelServer(FakeEmbedding(), None, address=tmp_path / "models.sock", authkey="")
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        ModelServerClient(tmp_path / "models.sock", authkey=None)
+
+
+def test_socket_is_private_from_the_moment_it_is_bound(tmp_path, monkeypatch):
+    import os
+    import stat
+
+    monkeypatch.setattr(os, "chmod", lambda *args, **kwargs: None)  # chỉ còn umask bảo vệ
+    before = os.umask(0o022)
+    srv = ModelServer(FakeEmbedding(), None, address=tmp_path / "models.sock", authkey="secret")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert srv.ready.wait(5)
+        assert stat.S_IMODE(os.stat(srv.address).st_mode) & 0o077 == 0
+        assert os.umask(0o022) == 0o022  # umask của process được trả lại
+    finally:
+        srv.close()
+        thread.join(timeout=5)
+        os.umask(before)
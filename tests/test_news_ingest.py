@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+from src.index_format import ModelMismatchError, StringColumn, read_index
+from src.news_ingest import (
+    INDEX_FILE,
+    RecordError,
+    ingest_news,
+    iter_json_records,
+    normalize_record,
+)
+from src.rag_news import IndexedNews, NewsRAG
+from src.sentiment_series import SERIES_FILE, SentimentSeries
+
+
+class DummyEmbeddingService:
+    model_name = "dummy-2d"
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts: List[str], **kwargs):
+        self.calls += 1
+        return np.vstack(
+            [[1.0, 0.0] if "Tesla" in t else [0.0, 1.0] for t in texts]
+        ).astype(np.float32)
+
+
+class DummySentimentService:
+    def analyze(self, texts):
+        return [{"text": t, "label": "positive", "score": 0.9} for t in texts]
+
+
+def test_iter_json_records_streams_arrays_and_jsonl(tmp_path: Path):
+    array_file = tmp_path / "a.json"
+    array_file.write_text(json.dumps([{"id": i, "x": "y" * 50} for i in range(20)]))
+    lines_file = tmp_path / "b.jsonl"
+    lines_file.write_text('{"id": 1}\n\n{"id": 2}\n')
+
+    assert [r["id"] for r in iter_json_records(array_file, chunk_size=16)] == list(range(20))
+    assert [r["id"] for r in iter_json_records(lines_file)] == [1, 2]
+
+    broken = tmp_path / "c.json"
+    broken.write_text('[{"id": 1}, {"id": ')
+    with pytest.raises(RecordError):
+        list(iter_json_records(broken))
+
+
+def test_normalize_record_validates_fields():
+    record = normalize_record(
+        {"title": " Tesla  up ", "content": "Tesla rallies", "date": "15/07/2025", "ticker": "$tsla"}
+    )
+    assert record["ticker"] == "TSLA"
+    assert record["date"] == "2025-07-15"
+    assert record["title"] == "Tesla up"
+    assert record["id"].startswith("n_")
+
+    with pytest.raises(RecordError, match="invalid_date"):
+        normalize_record({"content": "x", "ticker": "A", "date": "yesterday"})
+    with pytest.raises(RecordError, match="missing_ticker"):
+        normalize_record({"content": "x", "date": "2025-01-01"})
+
+
+def test_ingest_writes_artifacts_that_newsrag_memory_maps(tmp_path: Path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "tsla.json").write_text(
+        json.dumps(
+            [
+                {"id": "n1", "title": "Tesla", "content": "Tesla beats", "date": "2025-01-01", "ticker": "tsla"},
+                {"id": "n2", "title": "dup id", "content": "other", "date": "2025-01-01", "ticker": "TSLA"},
+                {"id": "n9", "title": "bad", "content": "x", "date": "??", "ticker": "TSLA"},
+            ]
+        )
+    )
+    (raw / "aapl.jsonl").write_text(
+        '{"id": "n2", "title": "Apple", "content": "Apple grows", "date": "2025-01-02", "ticker": "AAPL"}\n'
+        '{"id": "n3", "title": "Tesla", "content": "Tesla  beats", "date": "2025-01-03T09:00:00Z", "ticker": "TSLA"}\n'
+    )
+    index_dir = tmp_path / "index"
+
+    stats = ingest_news(
+        DummyEmbeddingService(),
+        DummySentimentService(),
+        raw_dir=raw,
+        output_dir=index_dir,
+        batch_size=1,
+        queue_size=1,
+    )
+    assert (stats.files, stats.read, stats.written) == (2, 5, 2)
+    assert stats.duplicates == 2  # trùng id + trùng nội dung
+    assert stats.reject_reasons == {"invalid_date": 1}
+
+    index = read_index(index_dir / INDEX_FILE, model="dummy-2d")
+    assert index.vectors.shape == (2, 2) and index.rows == 2
+    assert index.header["extra"]["ingest"]["written"] == 2
+    with pytest.raises(ModelMismatchError):
+        read_index(index_dir / INDEX_FILE, model="other-model")
+
+    embedder = DummyEmbeddingService()
+    rag = NewsRAG(embedder, index_path=tmp_path / "news_index.jsonl", similarity_threshold=0.1)
+    assert embedder.calls == 0  # không encode lại corpus
+    assert not rag.embeddings.flags.owndata  # view trên mmap
+    assert rag.version == index.version
+    (item,) = rag.search("Tesla", top_k=3)
+    assert item.id == "n3" and item.date == "2025-01-03"
+    assert item.sentiment == {"label": "positive", "score": 0.9}
+    # Metadata cũng lazy trên mmap: không dựng list record lúc load.
+    assert isinstance(index.columns["content"], StringColumn)
+    assert isinstance(rag.news, IndexedNews) and len(rag.news) == 2
+    assert [n.id for n in rag.news] == ["n2", "n3"]
+    assert [n.id for n in rag.search("Apple", ticker="AAPL", top_k=3)] == ["n2"]
+
+    series = SentimentSeries.load(index_dir / SERIES_FILE)
+    assert series.version == index.version
+    assert rag.sentiment_series is not None and rag.sentiment_series.version == index.version
+    trend = rag.sentiment_trend("TSLA", "1 week")
+    assert trend.articles == 1 and trend.labels["positive"] == 1
+
+
+def test_newsrag_warns_when_jsonl_is_newer_than_index(tmp_path: Path, caplog):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "tsla.jsonl").write_text(
+        '{"id": "n1", "title": "Tesla", "content": "Tesla beats", "date": "2025-01-01", "ticker": "TSLA"}\n'
+    )
+    ingest_news(DummyEmbeddingService(), None, raw_dir=raw, output_dir=tmp_path / "index")
+    jsonl = tmp_path / "news_index.jsonl"
+    jsonl.write_text(
+        '{"id": "n2", "title": "Apple", "content": "Apple grows", "date": "2025-01-02", "ticker": "AAPL"}\n'
+    )
+    newer = (tmp_path / "index" / INDEX_FILE).stat().st_mtime + 60
+    os.utime(jsonl, (newer, newer))
+
+    with caplog.at_level(logging.WARNING, logger="src.rag_news"):
+        rag = NewsRAG(DummyEmbeddingService(), index_path=jsonl, similarity_threshold=0.1)
+
+    assert [n.id for n in rag.news] == ["n1"]  # vẫn phục vụ index
+    assert "is older than" in caplog.text
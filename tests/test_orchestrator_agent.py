@@ -16,20 +16,23 @@ class DummyLanguageAgent:
 
 
 class DummyRetrievalAgent:
-    def get_relevant_news(self, *args, **kwargs):
+    def get_relevant_news_scored(self, *args, **kwargs):
         return [
-            NewsItem(
-                id="n1",
-                title="Tesla hits target",
-                content="Tesla delivered vehicles",
-                date="2025-01-01",
-                ticker="TSLA",
+            (
+                NewsItem(
+                    id="n1",
+                    title="Tesla hits target",
+                    content="Tesla delivered vehicles",
+                    date="2025-01-01",
+                    ticker="TSLA",
+                ),
+                0.9,
             )
         ]
 
 
 class DummySummarizerAgent:
-    async def summarize_news_and_sentiment(self, news, sentiments, lang):
+    async def summarize_news_and_sentiment(self, news, sentiments, lang, deadline=None, trends=(), compare=()):
         return "Summary ready"
 
 
@@ -45,7 +48,7 @@ async def test_orchestrator_pipeline(monkeypatch, tmp_path):
 
     monkeypatch.setattr(
         "src.agents.orchestrator_agent.call_llm",
-        lambda messages: '{"company": "TSLA", "time_range": "Q1"}',
+        lambda messages, **kwargs: '{"company": "TSLA", "time_range": "Q1"}',
     )
 
     orchestrator = OrchestratorAgent(
@@ -62,3 +65,448 @@ async def test_orchestrator_pipeline(monkeypatch, tmp_path):
     history = store.get_session("session-1")["history"]
     assert history[-1]["role"] == "assistant"
 
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_extraction_uses_llm_cache(monkeypatch, tmp_path):
+    from src.response_cache import ResponseCache
+
+    calls = []
+
+    def fake_call_llm(messages, **kwargs):
+        calls.append(messages)
+        return '{"company": "TSLA", "time_range": "6 months"}'
+
+    monkeypatch.setattr("src.agents.orchestrator_agent.call_llm", fake_call_llm)
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=DummyRetrievalAgent(),
+        summarizer_agent=DummySummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+        llm_cache=ResponseCache(path=tmp_path / "cache.sqlite3"),
+    )
+
+    first = await orchestrator._extract_companies_and_range("Phân tích Tesla 6 tháng")
+    second = await orchestrator._extract_companies_and_range("phân tích tesla  6 tháng")
+
+    assert first == second == (["TSLA"], "6 months")
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_fast_path_skips_llm(monkeypatch, tmp_path):
+    from src.agents.intent_extractor import LocalIntentExtractor
+
+    def fail_call_llm(messages, **kwargs):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr("src.agents.orchestrator_agent.call_llm", fail_call_llm)
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=DummyRetrievalAgent(),
+        summarizer_agent=DummySummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA"]),
+    )
+
+    assert await orchestrator._extract_companies_and_range(
+        "Phân tích TSLA 1 năm"
+    ) == (["TSLA"], "1 year")
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_speculative_retrieval_is_refined_by_ticker(
+    monkeypatch, tmp_path
+):
+    calls = []
+
+    def make_item(idx, ticker):
+        return NewsItem(
+            id=f"n{idx}",
+            title=f"{ticker} news {idx}",
+            content="content",
+            date="2025-01-01",
+            ticker=ticker,
+        )
+
+    class RecordingRetrievalAgent:
+        def get_relevant_news_scored(self, query, ticker=None, top_k=None):
+            calls.append((query, ticker, top_k))
+            if ticker is None:
+                # Cửa sổ đầu cơ bị lấp đầy, chỉ có 1 tin TSLA.
+                items = [make_item(0, "TSLA")] + [
+                    make_item(i, "AAPL") for i in range(1, top_k)
+                ]
+            else:
+                items = [make_item(100 + i, ticker) for i in range(top_k)]
+            return [(item, 0.8) for item in items]
+
+    monkeypatch.setattr(
+        "src.agents.orchestrator_agent.call_llm",
+        lambda messages, **kwargs: '{"company": "TSLA", "time_range": "Q1"}',
+    )
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=RecordingRetrievalAgent(),
+        summarizer_agent=DummySummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+    )
+
+    await orchestrator.handle("session-1", "Tell me about Tesla")
+
+    assert calls[0] == ("Tell me about Tesla", None, 20)
+    assert calls[1] == ("TSLA Tell me about Tesla", "TSLA", 5)
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_degrades_when_deadline_is_short(monkeypatch, tmp_path):
+    from src.agents.summarizer_agent import SummarizerAgent
+
+    def fail_call_llm(messages, **kwargs):
+        raise AssertionError("LLM should not be called without budget")
+
+    monkeypatch.setattr("src.agents.orchestrator_agent.call_llm", fail_call_llm)
+    monkeypatch.setattr("src.agents.summarizer_agent.call_llm", fail_call_llm)
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=DummyRetrievalAgent(),
+        summarizer_agent=SummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+    )
+
+    result = await orchestrator.handle("session-1", "Tell me about Tesla", deadline=0.5)
+
+    assert result.startswith("Quick digest of 1 relevant news items")
+    assert "Tesla hits target" in result
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", ["throttled", "exhausted", "circuit"])
+async def test_summary_degrades_to_template_on_any_llm_request_error(monkeypatch, tmp_path, error):
+    import requests
+
+    from src.agents.intent_extractor import LocalIntentExtractor
+    from src.agents.summarizer_agent import SummarizerAgent
+    from src.llm_governor import CircuitOpenError, LLMThrottledError
+
+    exc = {
+        "throttled": LLMThrottledError("LLM rate limit"),
+        "exhausted": requests.RequestException("LLM API call failed after 3 attempts"),
+        "circuit": CircuitOpenError("open"),
+    }[error]
+
+    def failing_call_llm(messages, **kwargs):
+        raise exc
+
+    monkeypatch.setattr("src.agents.summarizer_agent.call_llm", failing_call_llm)
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=DummyRetrievalAgent(),
+        summarizer_agent=SummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA"]),
+    )
+
+    result = await orchestrator.handle("session-1", "Tell me about Tesla")
+
+    assert result.startswith("Quick digest of 1 relevant news items")
+    assert "Tesla hits target" in result
+
+
+@pytest.mark.asyncio
+async def test_handle_many_batches_retrieval_and_sentiment(monkeypatch, tmp_path):
+    from src.agents.intent_extractor import LocalIntentExtractor
+
+    retrieval_calls = []
+    sentiment_calls = []
+
+    class BatchRetrievalAgent:
+        def get_relevant_news_many(self, queries, tickers, top_k):
+            retrieval_calls.append(list(tickers))
+            return [
+                [
+                    NewsItem(
+                        id=f"{ticker}-1",
+                        title=f"{ticker} headline",
+                        content=f"{ticker} content",
+                        date="2025-01-01",
+                        ticker=ticker,
+                    )
+                ]
+                for ticker in tickers
+            ]
+
+    class CountingSentimentService:
+        def analyze(self, texts):
+            sentiment_calls.append(list(texts))
+            return [{"label": "positive", "score": 0.8} for _ in texts]
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=BatchRetrievalAgent(),
+        summarizer_agent=DummySummarizerAgent(),
+        sentiment_service=CountingSentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA", "AAPL"]),
+    )
+
+    results = [
+        r
+        async for r in orchestrator.handle_many(
+            ["Tesla 6 months", "Apple YTD", "TSLA news"], concurrency=2
+        )
+    ]
+
+    assert sorted(r["index"] for r in results) == [0, 1, 2]
+    assert all(r["summary"] == "Summary ready" for r in results)
+    assert retrieval_calls == [["TSLA", "AAPL", "TSLA"]]
+    # Một lần FinBERT cho 2 tin duy nhất.
+    assert sentiment_calls == [["TSLA content", "AAPL content"]]
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_hits_and_invalidates_on_index_version(monkeypatch, tmp_path):
+    from src.agents.intent_extractor import LocalIntentExtractor
+    from src.response_cache import ResponseCache
+
+    summaries = []
+    searches = []
+
+    class VersionedRetrievalAgent(DummyRetrievalAgent):
+        version = "v1"
+
+        def index_version(self):
+            return self.version
+
+        def get_relevant_news_scored(self, *args, **kwargs):
+            searches.append(args)
+            return super().get_relevant_news_scored(*args, **kwargs)
+
+    class CountingSummarizer:
+        async def summarize_news_and_sentiment(self, news, sentiments, lang, deadline=None, trends=(), compare=()):
+            summaries.append(lang)
+            return f"Summary #{len(summaries)}"
+
+    retrieval = VersionedRetrievalAgent()
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=retrieval,
+        summarizer_agent=CountingSummarizer(),
+        sentiment_service=DummySentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA"]),
+        answer_cache=ResponseCache(path=tmp_path / "answers.sqlite3", namespace="answers"),
+    )
+
+    first = await orchestrator.handle("s1", "Tesla 6 months")
+    assert len(searches) == 1
+    second = await orchestrator.handle("s2", "tesla  6 MONTHS")
+    assert len(searches) == 1  # cache hit không chạy search đầu cơ
+    retrieval.version = "v2"
+    third = await orchestrator.handle("s3", "Tesla 6 months")
+
+    assert first == second == "Summary #1"
+    assert third == "Summary #2"
+    # Cache hit vẫn ghi lịch sử hội thoại.
+    assert len(orchestrator.session_store.get_session("s2")["history"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_handle_detailed_returns_structured_result(monkeypatch, tmp_path):
+    from src.response_cache import ResponseCache
+
+    monkeypatch.setattr(
+        "src.agents.orchestrator_agent.call_llm",
+        lambda messages, **kwargs: '{"company": "TSLA", "time_range": "Q1"}',
+    )
+
+    class VersionedRetrievalAgent(DummyRetrievalAgent):
+        def index_version(self):
+            return "v1"
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=VersionedRetrievalAgent(),
+        summarizer_agent=DummySummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+        answer_cache=ResponseCache(path=tmp_path / "answers.sqlite3", namespace="answers"),
+    )
+
+    result = await orchestrator.handle_detailed("s1", "Tell me about Tesla")
+
+    assert result.summary == "Summary ready"
+    assert (result.ticker, result.time_range, result.cached) == ("TSLA", "Q1", False)
+    assert result.articles[0].item.id == "n1"
+    assert result.articles[0].score == 0.9
+    assert result.articles[0].sentiment["label"] == "positive"
+    assert {"extract", "sentiment", "summarize", "total"} <= set(result.timings)
+
+    again = await orchestrator.handle_detailed("s1", "Tell me about Tesla")
+    assert again.cached
+    assert again.to_dict()["articles"] == result.to_dict()["articles"]
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_passes_precomputed_trend_to_summarizer(tmp_path):
+    from src.agents.intent_extractor import LocalIntentExtractor
+    from src.sentiment_series import SentimentSeries
+
+    series = SentimentSeries.from_records(
+        [("TSLA", "2025-01-01", "positive", 0.9), ("TSLA", "2024-12-20", "negative", 0.7)]
+    )
+    received = {}
+
+    class TrendRetrievalAgent(DummyRetrievalAgent):
+        def sentiment_trend(self, ticker, time_range=None):
+            received["query"] = (ticker, time_range)
+            return series.trend(ticker, time_range)
+
+    class TrendSummarizer:
+        async def summarize_news_and_sentiment(self, news, sentiments, lang, deadline=None, trends=(), compare=()):
+            received["trends"] = trends
+            return "Summary ready"
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=TrendRetrievalAgent(),
+        summarizer_agent=TrendSummarizer(),
+        sentiment_service=DummySentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA"]),
+    )
+
+    result = await orchestrator.handle_detailed("s1", "Tesla 1 month")
+
+    assert received["query"] == ("TSLA", "1 month")
+    (trend,) = received["trends"]
+    assert trend.articles == 2
+    assert result.trends[0]["labels"] == {"positive": 1, "negative": 1, "neutral": 0}
+    assert "trend" in result.timings
+
+
+def test_structured_response_accepts_companies_list_and_legacy_company():
+    parse = OrchestratorAgent._safe_parse_structured_response
+    assert parse('{"companies": ["TSLA", "BYDDY", "TSLA"], "time_range": "1 year"}') == (
+        ["TSLA", "BYDDY"],
+        "1 year",
+    )
+    assert parse('```\n{"company": "AAPL", "time_range": ""}\n```') == (["AAPL"], None)
+    assert parse('["TSLA"]') == ([], None)
+
+
+@pytest.mark.asyncio
+async def test_comparison_fans_out_in_one_batch_and_one_prompt(monkeypatch, tmp_path):
+    from src.agents.intent_extractor import LocalIntentExtractor
+
+    search_calls = []
+    sentiment_calls = []
+    prompts = []
+
+    def make_item(ticker, idx):
+        return NewsItem(
+            id=f"{ticker}-{idx}",
+            title=f"{ticker} headline {idx}",
+            content=f"{ticker} content {idx}",
+            date="2025-01-01",
+            ticker=ticker,
+        )
+
+    class CompareRetrievalAgent:
+        def get_relevant_news_scored(self, query, ticker=None, top_k=None):
+            search_calls.append(("single", query, ticker, top_k))
+            # Cửa sổ đầu cơ đầy, chỉ có một tin TSLA và không có BYDDY.
+            items = [make_item("TSLA", 0)] + [make_item("AAPL", i) for i in range(1, top_k)]
+            return [(item, 0.8) for item in items]
+
+        def get_relevant_news_many_scored(self, queries, tickers, top_k=None):
+            search_calls.append(("many", list(queries), list(tickers), top_k))
+            return [[(make_item(t, i), 0.7) for i in range(top_k)] for t in tickers]
+
+    class CountingSentimentService:
+        def analyze(self, texts):
+            sentiment_calls.append(list(texts))
+            return [{"label": "positive", "score": 0.8} for _ in texts]
+
+    def fake_call_llm(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return "Comparison ready"
+
+    monkeypatch.setattr("src.agents.summarizer_agent.call_llm", fake_call_llm)
+    from src.agents.summarizer_agent import SummarizerAgent
+
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=CompareRetrievalAgent(),
+        summarizer_agent=SummarizerAgent(),
+        sentiment_service=CountingSentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA", "BYDDY", "AAPL"]),
+    )
+
+    result = await orchestrator.handle_detailed("s1", "So sánh Tesla và BYD")
+
+    assert result.summary == "Comparison ready"
+    assert (result.ticker, result.tickers) == ("TSLA", ["TSLA", "BYDDY"])
+    # Một search đầu cơ + một batch cho các ticker còn thiếu (3 tin mỗi ticker).
+    assert search_calls[1] == (
+        "many",
+        ["TSLA So sánh Tesla và BYD", "BYDDY So sánh Tesla và BYD"],
+        ["TSLA", "BYDDY"],
+        3,
+    )
+    assert len(search_calls) == 2
+    assert [a.item.ticker for a in result.articles] == ["TSLA"] * 3 + ["BYDDY"] * 3
+    assert len(sentiment_calls) == 1 and len(sentiment_calls[0]) == 6
+    (prompt,) = prompts
+    assert "TSLA, BYDDY" in prompt and "BYDDY · BYDDY headline 0" in prompt
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("question", "llm_companies", "expected"),
+    [
+        # Rivian không có alias/ticker trong index → chỉ còn TSLA, nhưng vẫn có tin.
+        ("So sánh Tesla và Rivian", ["Tesla", "Rivian"], ["TSLA"]),
+        ("Compare Tesla with Cupertino's iPhone maker", ["Tesla", "Apple Inc."], ["TSLA", "AAPL"]),
+    ],
+)
+async def test_llm_company_names_are_mapped_to_tickers(monkeypatch, tmp_path, question, llm_companies, expected):
+    import json
+
+    from src.agents.intent_extractor import LocalIntentExtractor
+
+    def fake_call_llm(messages, **kwargs):
+        return json.dumps({"companies": llm_companies, "time_range": None})
+
+    class MixedRetrievalAgent:
+        def get_relevant_news_scored(self, query, ticker=None, top_k=None):
+            return [
+                (NewsItem(id=f"{t}-{i}", title=f"{t} {i}", content=f"{t} {i}", date="2025-01-01", ticker=t), 0.8)
+                for t in ("TSLA", "AAPL")
+                for i in range(2)
+            ]
+
+    monkeypatch.setattr("src.agents.orchestrator_agent.call_llm", fake_call_llm)
+    orchestrator = OrchestratorAgent(
+        session_store=SessionStore(path=tmp_path / "sessions.json"),
+        language_agent=DummyLanguageAgent(),
+        retrieval_agent=MixedRetrievalAgent(),
+        summarizer_agent=DummySummarizerAgent(),
+        sentiment_service=DummySentimentService(),
+        intent_extractor=LocalIntentExtractor(tickers=["TSLA", "AAPL"]),
+    )
+
+    result = await orchestrator.handle_detailed("s1", question)
+
+    assert (result.ticker, result.tickers) == ("TSLA", expected)
+    assert [a.item.ticker for a in result.articles] == [t for t in expected for _ in range(2)]
@@ -53,3 +53,8 @@ def test_newsrag_loads_jsonl_and_searches(tmp_path: Path):
     assert len(results) == 1
     assert results[0].ticker == "TSLA"
 
+    batched = rag.search_many(
+        ["Tell me about Tesla", "", "Apple news"], [None, None, "AAPL"], top_k=1
+    )
+    assert [[n.id for n in r] for r in batched] == [["n1"], [], ["n2"]]
+
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from src.response_cache import ResponseCache, make_llm_key
+
+
+def test_response_cache_ttl_and_eviction(tmp_path, monkeypatch):
+    cache = ResponseCache(path=tmp_path / "cache.sqlite3", ttl=60, max_entries=2)
+    clock = {"now": 1000.0}
+    monkeypatch.setattr("src.response_cache.time.time", lambda: clock["now"])
+
+    cache.set("a", "1")
+    clock["now"] += 1
+    cache.set("b", "2")
+    clock["now"] += 1
+    assert cache.get("a") == "1"  # "a" trở thành mới truy cập nhất
+    clock["now"] += 1
+    cache.set("c", "3")  # evict "b" (LRU)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+    clock["now"] += 120
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_llm_key_normalizes_prompt():
+    msgs_a = [{"role": "user", "content": "Phân tích  Tesla\n6 tháng"}]
+    msgs_b = [{"role": "user", "content": "phân tích tesla 6 THÁNG "}]
+
+    assert make_llm_key(msgs_a, "m", 0.7) == make_llm_key(msgs_b, "m", 0.7)
+    assert make_llm_key(msgs_a, "m", 0.7) != make_llm_key(msgs_a, "m", 0.2)
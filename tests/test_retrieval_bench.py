@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.retrieval_bench import (
+    CorpusSpec,
+    StubEmbedder,
+    compare_results,
+    generate_corpus,
+    generate_queries,
+    parse_size,
+    run_benchmark,
+)
+
+
+def test_parse_size_accepts_suffixes():
+    assert parse_size("1k") == 1_000
+    assert parse_size("2.5M") == 2_500_000
+    assert parse_size("10_000") == 10_000
+    with pytest.raises(ValueError):
+        parse_size("0")
+
+
+def test_corpus_and_embedder_are_deterministic_and_skewed():
+    spec = CorpusSpec(rows=5_000, seed=7)
+    first = list(generate_corpus(spec, chunk_rows=2_000))
+    second = list(generate_corpus(spec, chunk_rows=2_000))
+    assert [r for chunk, _, _ in first for r in chunk] == [r for chunk, _, _ in second for r in chunk]
+
+    records = [r for chunk, _, _ in first for r in chunk]
+    assert len(records) == 5_000
+    assert len({r["id"] for r in records}) == 5_000
+    tickers = np.concatenate([t for _, t, _ in first])
+    counts = np.bincount(tickers, minlength=spec.tickers)
+    assert counts[0] > 10 * np.median(counts)  # mã "hot" chiếm nhiều tin hơn hẳn
+    dates = sorted(r["date"] for r in records)
+    assert dates[len(dates) // 2] > "2025-01-01"  # lệch về gần end_date
+
+    a, b = StubEmbedder(32), StubEmbedder(32)
+    vectors = a.encode(["AAPL earnings beat", "TSLA lawsuit court"])
+    assert np.allclose(vectors, b.encode(["AAPL earnings beat", "TSLA lawsuit court"]))
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert len(generate_queries(spec, 10)) == 10
+
+
+def test_run_benchmark_measures_every_mode(tmp_path):
+    report = run_benchmark(
+        sizes=[800, 1_500],
+        workdir=tmp_path,
+        queries=20,
+        top_k=3,
+        dim=16,
+        max_jsonl_rows=1_000,
+        isolate=False,
+        log=lambda *_: None,
+    )
+    results = {(r["rows"], r["mode"]): r for r in report["results"]}
+    assert set(results) == {(800, "jsonl"), (800, "idx"), (1_500, "jsonl"), (1_500, "idx")}
+    assert "skipped" in results[(1_500, "jsonl")]
+
+    for key in [(800, "jsonl"), (800, "idx"), (1_500, "idx")]:
+        result = results[key]
+        assert result["rows"] == key[0]
+        assert result["search"]["queries"] == 20
+        assert result["search"]["p99_ms"] >= result["search"]["p50_ms"] > 0
+        assert result["recall_at_3"] == pytest.approx(1.0, abs=0.1)  # exact search, threshold 0
+    # Hai mode trả cùng kết quả trên cùng corpus.
+    assert results[(800, "jsonl")]["recall_at_3"] == results[(800, "idx")]["recall_at_3"]
+    assert report["meta"]["params"]["embedder"] == "stub-hash-16"
+
+    lines = compare_results(report, report)
+    assert len(lines) == 3
+    assert "p50 +0.0%" in lines[0]
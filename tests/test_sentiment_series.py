@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+
+from src.agents.summarizer_agent import SummarizerAgent
+from src.rag_news import NewsItem
+from src.sentiment_series import SentimentSeries, resolve_time_range
+
+
+def _records():
+    # AAPL: tiêu cực đầu năm, tích cực về sau; TSLA chỉ có một ngày.
+    rows = []
+    for month in range(1, 7):
+        label = "negative" if month <= 3 else "positive"
+        for day in (3, 17):
+            rows.append(("aapl", f"2025-{month:02d}-{day:02d}", label, 0.8))
+    rows.append(("AAPL", "2025-06-17T10:00:00Z", "Neutral", 0.6))
+    rows.append(("TSLA", "2025-06-01", "positive", 0.9))
+    rows.append(("TSLA", "not-a-date", "positive", 0.9))
+    return rows
+
+
+def test_resolve_time_range_understands_extracted_forms():
+    as_of = date(2025, 6, 30)
+    assert resolve_time_range("6 months", as_of) == (date(2024, 12, 31), as_of)
+    assert resolve_time_range("6 tháng gần đây", as_of) == (date(2024, 12, 31), as_of)
+    assert resolve_time_range("YTD", as_of) == (date(2025, 1, 1), as_of)
+    assert resolve_time_range("Q1", as_of) == (date(2025, 1, 1), date(2025, 3, 31))
+    assert resolve_time_range("Q4", as_of) == (date(2024, 10, 1), date(2024, 12, 31))
+    assert resolve_time_range("1 week", as_of) == (date(2025, 6, 24), as_of)
+    start, end = resolve_time_range(None, as_of)  # SENTIMENT_TREND_DEFAULT_RANGE
+    assert end == as_of and start == date(2025, 3, 31)
+
+
+def test_series_aggregates_per_ticker_and_day():
+    series = SentimentSeries.from_records(_records(), version="v1")
+    assert series.tickers == ["AAPL", "TSLA"]
+    assert len(series) == 13  # 12 ngày AAPL (06-17 gộp 2 bài) + 1 ngày TSLA
+    assert series.as_of == date(2025, 6, 17)
+
+    window = series.window("aapl", date(2025, 6, 1), date(2025, 6, 30))
+    assert window["articles"] == 3 and window["days_with_news"] == 2
+    assert window["labels"] == {"positive": 2, "negative": 0, "neutral": 1}
+    assert np.isclose(window["score_sum"], 2.2)
+    assert series.window("MSFT", date(2025, 1, 1), date(2025, 12, 31))["articles"] == 0
+
+
+def test_trend_reports_direction_and_round_trips(tmp_path):
+    series = SentimentSeries.from_records(_records(), version="v1")
+    trend = series.trend("AAPL", "6 months", as_of=date(2025, 6, 30))
+    assert (trend.start, trend.end) == ("2024-12-31", "2025-06-30")
+    assert trend.articles == 13
+    assert trend.direction == "improving"
+    assert sum(b.articles for b in trend.buckets) == 13
+    assert trend.buckets[0].net == -1.0 and trend.buckets[-1].net > 0
+    assert trend.to_dict()["net"] == round((6 - 6) / 13, 4)
+    assert series.trend("MSFT") is None
+
+    path = tmp_path / "series.npz"
+    series.save(path)
+    loaded = SentimentSeries.load(path)
+    assert loaded.version == "v1" and loaded.tickers == series.tickers
+    assert loaded.trend("AAPL", "6 months", as_of=date(2025, 6, 30)).to_dict() == trend.to_dict()
+
+
+def test_from_news_skips_unscored_items_and_feeds_fallback_summary():
+    news = [
+        NewsItem("n1", "Apple up", "Apple up", "2025-06-01", "AAPL", {"label": "positive", "score": 0.9}),
+        NewsItem("n2", "Apple flat", "Apple flat", "2025-06-02", "AAPL"),
+    ]
+    series = SentimentSeries.from_news(news)
+    trend = series.trend("AAPL", "1 month")
+    assert trend.articles == 1
+
+    summary = SummarizerAgent().fallback_summary(news, [news[0].sentiment, {}], "vi", trends=[trend])
+    assert summary.startswith("Xu hướng cảm xúc AAPL")
+    assert "tích cực 100%" in summary
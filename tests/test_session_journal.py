@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from src.session_journal import JournalSessionStore
+
+
+def test_journal_store_appends_compacts_and_recovers(tmp_path):
+    legacy = tmp_path / "sessions.json"
+    legacy.write_text(
+        json.dumps(
+            {"old": {"history": [{"role": "user", "content": "Q0"}], "summary": "S0"}}
+        ),
+        encoding="utf-8",
+    )
+    store = JournalSessionStore(tmp_path)
+    assert store.import_json(legacy) == 1
+    assert store.import_json(legacy) == 0
+
+    store.update_session("old", "Q1", "A1")
+    store.update_session("new", "Hi", "Hello", summary="greeting")
+    assert [m["content"] for m in store.get_session("old")["history"]] == ["Q0", "Q1", "A1"]
+    assert store.get_session("old")["summary"] == "S0"
+
+    assert store.compact() is True
+    assert store.compact() is False  # journal rỗng
+    store.update_session("old", "Q2", "A2", summary="S2")
+
+    old = store.get_session("old")
+    assert [m["content"] for m in old["history"]] == ["Q0", "Q1", "A1", "Q2", "A2"]
+    assert old["summary"] == "S2"
+    assert store.get_session("missing") == {"history": [], "summary": ""}
+    store.close()
+
+    # Crash giữa lúc ghi: dòng cuối bị cắt dở phải được bỏ qua khi mở lại.
+    with (tmp_path / "sessions.journal.jsonl").open("ab") as f:
+        f.write(b'{"n":99,"id":"new","m":[["user"')
+    reopened = JournalSessionStore(tmp_path)
+    assert reopened.get_session("new") == {
+        "history": [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello"},
+        ],
+        "summary": "greeting",
+    }
+    assert len(reopened.get_session("old")["history"]) == 5
+    reopened.update_session("new", "Q", "A")
+    assert len(reopened.get_session("new")["history"]) == 4
+    reopened.close()
+
+
+def test_snapshot_wins_over_stale_journal_records(tmp_path):
+    store = JournalSessionStore(tmp_path)
+    store.update_session("s", "Q1", "A1")
+    journal_before = (tmp_path / "sessions.journal.jsonl").read_bytes()
+    store.compact()
+    store.close()
+
+    # Mô phỏng crash sau khi rename snapshot nhưng trước khi rewrite journal.
+    (tmp_path / "sessions.journal.jsonl").write_bytes(journal_before)
+    reopened = JournalSessionStore(tmp_path)
+    assert len(reopened.get_session("s")["history"]) == 2
+    reopened.close()
+
+
+def test_journal_store_evicts_with_tombstones(tmp_path, monkeypatch):
+    from src import session_journal as module
+
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(module.time, "time", lambda: clock["now"])
+    store = JournalSessionStore(tmp_path, timeout=60, max_sessions=2, max_history=2)
+
+    store.update_session("a", "Q1", "A1")
+    store.update_session("a", "Q2", "A2")
+    assert [m["content"] for m in store.get_session("a")["history"]] == ["Q2", "A2"]
+    clock["now"] += 10
+    store.update_session("b", "Q", "A")
+    clock["now"] += 10
+    store.update_session("c", "Q", "A")
+    assert store.get_session("a") == {"history": [], "summary": ""}
+
+    clock["now"] += 55
+    assert store.sweep() == 1
+    store.compact()
+    store.close()
+
+    reopened = JournalSessionStore(tmp_path, timeout=60, max_sessions=2)
+    assert reopened.get_session("b") == {"history": [], "summary": ""}
+    assert reopened.get_session("c")["history"]
+    reopened.close()
+
+
+def test_journal_store_refuses_a_second_process(tmp_path):
+    store = JournalSessionStore(tmp_path)
+    try:
+        with pytest.raises(RuntimeError, match="single-process"):
+            JournalSessionStore(tmp_path)
+        child = subprocess.run(
+            [sys.executable, "-c", "import sys; from src.session_journal import JournalSessionStore; "
+             "JournalSessionStore(sys.argv[1])", str(tmp_path)],
+            capture_output=True,
+            text=True,
+        )
+        assert child.returncode != 0 and "single-process" in child.stderr
+    finally:
+        store.close()
+
+    JournalSessionStore(tmp_path).close()  # close() nhả lock
@@ -20,3 +20,54 @@ def test_session_store_persists_history(tmp_path):
     assert loaded["history"][1]["content"] == "Hello"
     assert loaded["summary"] == "Summary"
 
+
+
+def test_session_store_evicts_expired_and_lru_sessions(tmp_path, monkeypatch):
+    from src import session_store as module
+
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(module.time, "time", lambda: clock["now"])
+    store = SessionStore(
+        path=tmp_path / "sessions.json",
+        timeout=60,
+        max_sessions=2,
+        max_history=4,
+        flush_interval=0,
+    )
+
+    for turn in range(3):
+        store.update_session("a", f"Q{turn}", f"A{turn}")
+    assert [m["content"] for m in store.get_session("a")["history"]] == [
+        "Q1", "A1", "Q2", "A2"
+    ]
+
+    clock["now"] += 10
+    store.update_session("b", "Q", "A")
+    clock["now"] += 10
+    store.update_session("c", "Q", "A")  # vượt max_sessions → "a" (LRU) bị xoá
+    assert store.get_session("a") == {"history": [], "summary": ""}
+    assert store.get_session("b")["history"]
+
+    clock["now"] += 55  # "b" idle 65s > timeout, "c" mới 55s
+    assert store.get_session("b") == {"history": [], "summary": ""}
+    assert store.sweep() == 1
+    assert set(store._load_all()) == {"c"}
+
+
+def test_write_behind_batches_flushes_and_merges_processes(tmp_path):
+    path = tmp_path / "sessions.json"
+    worker_a = SessionStore(path=path, flush_interval=60)
+    worker_b = SessionStore(path=path, flush_interval=60)
+
+    worker_a.update_session("s1", "Qa", "Aa")
+    # Đọc từ cache trong process, file trên đĩa chưa đổi.
+    assert worker_a.get_session("s1")["history"][0]["content"] == "Qa"
+    assert worker_b.get_session("s1") == {"history": [], "summary": ""}
+
+    worker_b.update_session("s1", "Qb", "Ab", summary="from b")
+    worker_b.flush()
+    worker_a.flush()  # merge với bản của worker_b, không ghi đè
+
+    history = [m["content"] for m in worker_b.get_session("s1")["history"]]
+    assert history == ["Qb", "Ab", "Qa", "Aa"]
+    assert worker_b.get_session("s1")["summary"] == "from b"
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+
+from src.session_store_sqlite import SqliteSessionStore
+
+
+def test_sqlite_store_persists_history_and_migrates_json(tmp_path):
+    legacy = tmp_path / "sessions.json"
+    legacy.write_text(
+        json.dumps(
+            {
+                "old": {
+                    "history": [
+                        {"role": "user", "content": "Phân tích Apple"},
+                        {"role": "assistant", "content": "Không tìm thấy"},
+                    ],
+                    "summary": "Không tìm thấy",
+                }
+            }
+        ),
+        encoding="utf-8",
+    )
+    store = SqliteSessionStore(tmp_path / "sessions.sqlite3")
+
+    assert store.import_json(legacy) == 1
+    assert store.import_json(legacy) == 0  # idempotent
+
+    store.update_session("old", "Hi", "Hello", summary="Summary")
+    store.update_session("new", "Q", "A")
+
+    old = store.get_session("old")
+    assert [m["content"] for m in old["history"]] == [
+        "Phân tích Apple",
+        "Không tìm thấy",
+        "Hi",
+        "Hello",
+    ]
+    assert old["summary"] == "Summary"
+    assert store.get_session("new")["summary"] == ""
+    assert store.get_session("missing") == {"history": [], "summary": ""}
+
+    # Dữ liệu nằm trên đĩa, mở lại (như một process khác) vẫn đọc được.
+    store.close()
+    reopened = SqliteSessionStore(tmp_path / "sessions.sqlite3")
+    assert len(reopened.get_session("new")["history"]) == 2
+
+
+def test_sqlite_store_enforces_ttl_capacity_and_history(tmp_path, monkeypatch):
+    from src import session_store_sqlite as module
+
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(module.time, "time", lambda: clock["now"])
+    store = SqliteSessionStore(
+        tmp_path / "sessions.sqlite3", timeout=60, max_sessions=2, max_history=2
+    )
+
+    store.update_session("a", "Q1", "A1")
+    store.update_session("a", "Q2", "A2")
+    assert [m["content"] for m in store.get_session("a")["history"]] == ["Q2", "A2"]
+
+    clock["now"] += 10
+    store.update_session("b", "Q", "A")
+    clock["now"] += 10
+    store.update_session("c", "Q", "A")
+    assert store.get_session("a") == {"history": [], "summary": ""}
+
+    clock["now"] += 55
+    assert store.get_session("b") == {"history": [], "summary": ""}
+    assert store.sweep() == 1
+    assert store.get_session("c")["history"]
+
+
+def test_import_json_keeps_timestamps_and_applies_limits(tmp_path, monkeypatch):
+    from src import session_store_sqlite as module
+
+    monkeypatch.setattr(module.time, "time", lambda: 1000.0)
+    history = [{"role": "user", "content": f"m{i}"} for i in range(5)]
+    legacy = tmp_path / "sessions.json"
+    legacy.write_text(
+        json.dumps(
+            {
+                "expired": {"history": history, "last_access": 900.0},
+                "oldest": {"history": history, "last_access": 950.0},
+                "recent": {"history": history, "last_access": 990.0},
+                "unstamped": {"history": history},
+            }
+        ),
+        encoding="utf-8",
+    )
+    store = SqliteSessionStore(
+        tmp_path / "sessions.sqlite3", timeout=60, max_sessions=2, max_history=2
+    )
+
+    assert store.import_json(legacy) == 3  # session hết hạn không được hồi sinh
+    assert store.get_session("expired")["history"] == []
+    assert store.get_session("oldest")["history"] == []  # LRU bị evict vì max_sessions
+    assert [m["content"] for m in store.get_session("recent")["history"]] == ["m3", "m4"]
+    assert store.get_session("unstamped")["history"]
+    updated = dict(store._conn.execute("SELECT session_id, updated_at FROM sessions"))
+    assert updated == {"recent": 990.0, "unstamped": 1000.0}
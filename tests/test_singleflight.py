@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from src.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(timeout=5)
+        return ["result"]
+
+    tasks = [
+        asyncio.create_task(flight.do_async(("search", "tesla"), work))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0.05)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert len(calls) == 1
+    assert all(r == ["result"] for r in results)
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "inflight": 0}
+
+
+def test_singleflight_propagates_errors_and_releases_key():
+    flight = SingleFlight()
+
+    def boom():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+
+    assert flight.do("k", lambda: 42) == 42
+
+
+@pytest.mark.asyncio
+async def test_singleflight_cancelled_follower_does_not_break_leader():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(timeout=5)
+        return "done"
+
+    leader = asyncio.create_task(flight.do_async("k", work))
+    await asyncio.sleep(0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(flight.do_async("k", work), timeout=0.05)
+    release.set()
+
+    assert await leader == "done"
+    assert flight.stats()["inflight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_cancelled_leader_still_serves_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "done"
+
+    leader = asyncio.create_task(flight.do_async("k", work))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(flight.do_async("k", work))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    release.set()
+
+    assert await follower == "done"
+    assert calls == [1]